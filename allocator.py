@@ -0,0 +1,498 @@
+import heapq
+import time
+
+from metrics import TimedLock
+
+# Alocador de intervalos por concessão (lease).
+#
+# Invariantes:
+#   - todo número < frontier foi testado (fronteira segura e contígua);
+#   - [frontier, next_start) está coberto por concessões ativas, intervalos
+#     concluídos acima da fronteira ou intervalos aguardando realocação;
+#   - concessões vencidas voltam para a fila de realocação e são entregues
+#     antes de qualquer intervalo novo.
+# Todas as operações são O(log n) sobre heaps.
+#
+# Roubo de trabalho: a concessão ativa de menor início é a que segura a
+# fronteira. Se ela estiver atrasada (ver lagging), steal() divide o que
+# falta testar e entrega a metade final a outro worker. A concessão
+# original encolhe (end); quem a recebeu sabe disso pela resposta do
+# heartbeat e pode parar em end, ou seguir até reach, o fim entregue a ele.
+# A conclusão cobre até onde o worker informar (ver covered_end); se cobrir
+# as concessões roubadas dela, elas são descartadas (reconciliação). Se a
+# roubada terminar antes, a sobreposição some na mescla dos intervalos
+# concluídos. O progresso dentro de uma concessão vem
+# de heartbeat() e não é persistido; a divisão, sim (registro 'split').
+#
+# Persistência: to_dict()/from_dict() dão o estado completo (para snapshots)
+# e cada operação que muda o estado é passada a on_record, ainda sob a trava
+# e numerada por seq, com as entradas necessárias para repeti-la (inclusive
+# o instante usado). As operações são determinísticas, então replay() dos
+# registros posteriores ao snapshot reconstrói o mesmo estado; registros com
+# seq já incluído no snapshot são ignorados.
+
+LEASE_TIMEOUT = 300  # segundos (mesma janela de inatividade do /status)
+STRAGGLER_SECONDS = 120  # o dobro de throughput.TARGET_LEASE_SECONDS
+MIN_STEAL_SIZE = 2000  # metade roubada mínima (throughput.MIN_RANGE_SIZE)
+
+
+class Lease:
+    __slots__ = ('lease_id', 'worker_id', 'start', 'end', 'issued_at', 'deadline',
+                 'reach', 'split_from', 'split_at', 'progress', 'heartbeat_at')
+
+    def __init__(self, lease_id, worker_id, start, end, issued_at, deadline,
+                 reach=None, split_from=None, split_at=None, progress=None, heartbeat_at=None):
+        self.lease_id = lease_id
+        self.worker_id = worker_id
+        self.start = start
+        self.end = end
+        self.issued_at = issued_at
+        self.deadline = deadline
+        self.reach = end if reach is None else reach  # fim entregue ao worker (end encolhe no roubo)
+        self.split_from = split_from  # concessão de onde esta foi roubada
+        self.split_at = split_at  # instante do último roubo desta concessão
+        self.progress = start if progress is None else progress  # testado até aqui (heartbeat)
+        self.heartbeat_at = heartbeat_at
+
+    def to_dict(self):
+        return {
+            'lease_id': self.lease_id,
+            'worker_id': self.worker_id,
+            'start': self.start,
+            'end': self.end,
+            'issued_at': self.issued_at,
+            'deadline': self.deadline,
+            'reach': self.reach,
+            'split_from': self.split_from,
+            'progress': self.progress,
+            'heartbeat_at': self.heartbeat_at
+        }
+
+
+def lagging(lease, now, lease_timeout):
+    # Sem heartbeat recente, atrasada se passou STRAGGLER_SECONDS do início
+    # previsto (concessões em lote têm o prazo escalonado) ou do último
+    # roubo; com heartbeat, se a vazão medida prevê o fim depois disso.
+    # Assim, uma concessão lenta pode ser dividida logo no início.
+    started = lease.deadline - lease_timeout
+    since = max(started, lease.split_at or started)
+    heartbeat_at = lease.heartbeat_at
+    if heartbeat_at is None or now - heartbeat_at > STRAGGLER_SECONDS or heartbeat_at <= started:
+        return now - since > STRAGGLER_SECONDS
+    rate = (lease.progress - lease.start) / (heartbeat_at - started)
+    if rate <= 0:
+        return now - since > STRAGGLER_SECONDS
+    return heartbeat_at + (lease.end - lease.progress) / rate > started + STRAGGLER_SECONDS
+
+
+def split_point(lease, size):
+    # Início da metade final do que falta testar, limitada a size números
+    # (o tamanho que o ladrão receberia); None se ficaria pequena demais
+    at = max(lease.progress + (lease.end - lease.progress) // 2, lease.end - size)
+    if lease.end - at < MIN_STEAL_SIZE:
+        return None
+    return at
+
+
+def covered_end(lease, end):
+    # Até onde vai a conclusão de uma concessão: o worker informa em end se
+    # parou no fim encolhido pelo roubo (lease.end) ou foi até reach
+    if type(end) is not int:
+        return lease.end
+    return min(max(end, lease.end), lease.reach)
+
+
+class IntervalAllocator:
+    def __init__(self, frontier=2, lease_timeout=LEASE_TIMEOUT):
+        self.frontier = frontier
+        self.next_start = frontier
+        self.lease_timeout = lease_timeout
+        self._leases = {}  # lease_id -> Lease
+        self._by_worker = {}  # worker_id -> {lease_id}
+        self._expiry = []  # heap (deadline, lease_id), remoção preguiçosa
+        self._starts = []  # heap (start, lease_id) das concessões, remoção preguiçosa
+        self._splits = {}  # lease_id -> {lease_id das concessões roubadas dela}
+        self._reclaim = []  # heap (start, end) de intervalos a realocar
+        self._reclaim_live = {}  # entradas de _reclaim ainda válidas -> (start, end) da concessão vencida
+        self._reclaim_origins = {}  # (start, end) da concessão vencida -> {entradas vivas dela}
+        self._completed = []  # heap (start, end) concluídos acima da fronteira
+        self._next_id = 1
+        self._lock = TimedLock('allocator')
+        self.issued = 0
+        self.expired = 0
+        self.reissued = 0
+        self.split = 0
+        self.reconciled = 0
+        self.seq = 0  # operações registradas
+        self.on_record = None
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'seq': self.seq,
+                'frontier': self.frontier,
+                'next_start': self.next_start,
+                'next_id': self._next_id,
+                'issued': self.issued,
+                'expired': self.expired,
+                'reissued': self.reissued,
+                'split': self.split,
+                'reconciled': self.reconciled,
+                'leases': [[l.lease_id, l.worker_id, l.start, l.end, l.issued_at, l.deadline,
+                            l.reach, l.split_from, l.split_at]
+                           for l in self._leases.values()],
+                'completed': list(self._completed),
+                'reclaim': sorted(piece + origin for piece, origin in self._reclaim_live.items())
+            }
+
+    @classmethod
+    def from_dict(cls, data, frontier=2, lease_timeout=LEASE_TIMEOUT):
+        # Sem dados (estado anterior ao snapshot do alocador), começa em frontier
+        if data is None:
+            return cls(frontier, lease_timeout)
+        allocator = cls(data['frontier'], lease_timeout)
+        allocator.next_start = data['next_start']
+        allocator._next_id = data['next_id']
+        allocator.issued = data['issued']
+        allocator.expired = data['expired']
+        allocator.reissued = data['reissued']
+        allocator.split = data.get('split', 0)
+        allocator.reconciled = data.get('reconciled', 0)
+        allocator.seq = data['seq']
+        for item in data['leases']:
+            lease = Lease(*item)
+            allocator._leases[lease.lease_id] = lease
+            allocator._by_worker.setdefault(lease.worker_id, set()).add(lease.lease_id)
+            if lease.split_from is not None:
+                allocator._splits.setdefault(lease.split_from, set()).add(lease.lease_id)
+        allocator._expiry = [(lease.deadline, lease.lease_id) for lease in allocator._leases.values()]
+        heapq.heapify(allocator._expiry)
+        allocator._starts = [(lease.start, lease.lease_id) for lease in allocator._leases.values()]
+        heapq.heapify(allocator._starts)
+        allocator._completed = [tuple(item) for item in data['completed']]
+        heapq.heapify(allocator._completed)
+        # Snapshots antigos não têm a concessão de origem: vale o próprio intervalo
+        for item in data['reclaim']:
+            piece = tuple(item[:2])
+            allocator._reclaim.append(piece)
+            allocator._live_reclaim_locked(piece, tuple(item[2:]) or piece)
+        heapq.heapify(allocator._reclaim)
+        return allocator
+
+    def replay(self, record):
+        # Repete uma operação registrada por on_record
+        if record['seq'] <= self.seq:
+            return
+        self.seq = record['seq'] - 1
+        kind = record['type']
+        if kind == 'lease':
+            self.lease_many(record['worker'], record['size'], record['count'], record['now'], record['stagger'])
+        elif kind == 'complete':
+            self.complete_many(record['worker'], [tuple(item) for item in record['ranges']])
+        elif kind == 'release':
+            self.release(record['lease_id'])
+        elif kind == 'expire':
+            self.expire(record['now'])
+        elif kind == 'split':
+            with self._lock:
+                self._split_locked(self._leases[record['lease_id']], record['at'], record['worker'], record['now'])
+
+    def lease(self, worker_id, size, now=None):
+        return self.lease_many(worker_id, size, 1, now)[0]
+
+    def lease_many(self, worker_id, size, count, now=None, stagger=0):
+        # Várias concessões com uma única aquisição da trava. O cliente as
+        # processa em sequência, então o prazo da i-ésima é estendido em
+        # i * stagger segundos.
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire_locked(now)
+            leases = [self._lease_locked(worker_id, size, now, i * stagger) for i in range(count)]
+            self._record_locked({'type': 'lease', 'worker': worker_id, 'size': size, 'count': count,
+                                 'now': now, 'stagger': stagger})
+            return leases
+
+    def steal(self, worker_id, size, now=None):
+        # Metade final do que falta na concessão que segura a fronteira, se
+        # ela estiver atrasada; None se não há o que roubar. Intervalos na
+        # fila de realocação vêm antes (são entregues por lease).
+        now = time.time() if now is None else now
+        with self._lock:
+            lease = self._frontier_lease_locked()
+            if lease is None or self._reclaim_live or lease.worker_id == worker_id:
+                return None
+            at = split_point(lease, size) if lagging(lease, now, self.lease_timeout) else None
+            if at is None:
+                return None
+            stolen = self._split_locked(lease, at, worker_id, now)
+            self._record_locked({'type': 'split', 'lease_id': lease.lease_id, 'at': at,
+                                 'worker': worker_id, 'now': now})
+            return stolen
+
+    def heartbeat(self, worker_id, items, now=None):
+        # items: [(lease_id, testado_até)]. Guarda o progresso de cada
+        # concessão do worker e a devolve (end pode ter encolhido num roubo),
+        # ou None se ela não existe mais (concluída, vencida ou reconciliada).
+        now = time.time() if now is None else now
+        with self._lock:
+            leases = []
+            for lease_id, position in items:
+                lease = self._leases.get(lease_id)
+                if lease is None or lease.worker_id != worker_id:
+                    leases.append(None)
+                    continue
+                lease.progress = max(lease.progress, min(position, lease.end))
+                lease.heartbeat_at = now
+                leases.append(lease)
+            return leases
+
+    def complete(self, worker_id, start=None, end=None, lease_id=None):
+        # Marca como concluído o intervalo de uma concessão e devolve a
+        # concessão, ou None se o intervalo não corresponde a nada que o
+        # alocador tenha entregue. A fronteira avança quando possível.
+        return self.complete_many(worker_id, [(start, end, lease_id)])[0]
+
+    def complete_many(self, worker_id, ranges):
+        # ranges: [(start, end, lease_id)], concluídos em lote
+        with self._lock:
+            completed = [self._complete_locked(worker_id, *item) for item in ranges]
+            self._advance_locked()
+            if any(lease is not None for lease in completed):
+                self._record_locked({'type': 'complete', 'worker': worker_id, 'ranges': ranges})
+            return completed
+
+    def release(self, lease_id):
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            if lease is None:
+                return False
+            self._drop_lease_locked(lease)
+            self._push_reclaim_locked(lease.start, lease.end)
+            self._record_locked({'type': 'release', 'lease_id': lease_id})
+            return True
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = self._expire_locked(now)
+            if expired:
+                self._record_locked({'type': 'expire', 'now': now})
+            return expired
+
+    def leases_for(self, worker_id):
+        with self._lock:
+            return [self._leases[i] for i in self._by_worker.get(worker_id, ())]
+
+    def completable(self, worker_id, start=None, end=None, lease_id=None):
+        # complete() com os mesmos argumentos concluiria algo: uma concessão
+        # do worker ou uma vencida ainda na fila de realocação
+        with self._lock:
+            return (self._find_lease_locked(worker_id, start, end, lease_id) is not None
+                    or (start, end) in self._reclaim_origins)
+
+    @property
+    def active_count(self):
+        return len(self._leases)
+
+    def lease_ages(self, now=None):
+        # (maior, média) da idade das concessões ativas, em segundos
+        now = time.time() if now is None else now
+        with self._lock:
+            issued = [lease.issued_at for lease in self._leases.values()]
+        if not issued:
+            return None, None
+        return now - min(issued), now - sum(issued) / len(issued)
+
+    @property
+    def reclaim_count(self):
+        return len(self._reclaim_live)
+
+    def completed_intervals(self):
+        # Intervalos concluídos acima da fronteira, já mesclados (O(n log n)).
+        with self._lock:
+            merged = []
+            for start, end in sorted(self._completed):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            return [tuple(item) for item in merged]
+
+    def stats(self):
+        return {
+            'safe_frontier': self.frontier,
+            'next_start': self.next_start,
+            'active_leases': self.active_count,
+            'reclaim_queue': self.reclaim_count,
+            'completed_pending': len(self._completed),
+            'issued': self.issued,
+            'reissued': self.reissued,
+            'expired': self.expired,
+            'split': self.split,
+            'reconciled': self.reconciled
+        }
+
+    def _lease_locked(self, worker_id, size, now, extra_time=0):
+        start, end = self._pop_reclaim_locked(size)
+        if start is None:
+            start, end = self.next_start, self.next_start + size
+            self.next_start = end
+        else:
+            self.reissued += 1
+
+        lease = Lease(self._next_id, worker_id, start, end, now, now + self.lease_timeout + extra_time)
+        self._next_id += 1
+        self._leases[lease.lease_id] = lease
+        self._by_worker.setdefault(worker_id, set()).add(lease.lease_id)
+        heapq.heappush(self._expiry, (lease.deadline, lease.lease_id))
+        heapq.heappush(self._starts, (lease.start, lease.lease_id))
+        self.issued += 1
+        return lease
+
+    def _record_locked(self, record):
+        self.seq += 1
+        if self.on_record is not None:
+            record['seq'] = self.seq
+            self.on_record(record)
+
+    def _split_locked(self, lease, at, worker_id, now):
+        # lease fica com [start, at); a nova concessão, com [at, end)
+        stolen = Lease(self._next_id, worker_id, at, lease.end, now, now + self.lease_timeout,
+                       split_from=lease.lease_id)
+        self._next_id += 1
+        lease.end = at
+        lease.progress = min(lease.progress, at)
+        lease.split_at = now
+        self._leases[stolen.lease_id] = stolen
+        self._by_worker.setdefault(worker_id, set()).add(stolen.lease_id)
+        self._splits.setdefault(lease.lease_id, set()).add(stolen.lease_id)
+        heapq.heappush(self._expiry, (stolen.deadline, stolen.lease_id))
+        heapq.heappush(self._starts, (stolen.start, stolen.lease_id))
+        self.issued += 1
+        self.split += 1
+        return stolen
+
+    def _frontier_lease_locked(self):
+        # Concessão ativa de menor início
+        while self._starts:
+            start, lease_id = self._starts[0]
+            lease = self._leases.get(lease_id)
+            if lease is not None:
+                return lease
+            heapq.heappop(self._starts)
+        return None
+
+    def _complete_locked(self, worker_id, start, end, lease_id):
+        lease = self._find_lease_locked(worker_id, start, end, lease_id)
+        if lease is not None:
+            covered_to = covered_end(lease, end)
+            self._reconcile_locked(self._drop_lease_locked(lease), covered_to)
+        elif (start, end) in self._reclaim_origins:
+            # Concessão vencida concluída com atraso: evita reprocessar. O
+            # intervalo pode ter sido cortado na fronteira ou dividido ao ser
+            # realocado; os pedaços ainda na fila saem dela (os já
+            # reentregues seguem com suas concessões)
+            for piece in list(self._reclaim_origins[(start, end)]):
+                self._unlive_reclaim_locked(piece)
+            lease = Lease(None, worker_id, start, end, None, None)
+            covered_to = end
+        else:
+            return None
+
+        heapq.heappush(self._completed, (lease.start, covered_to))
+        return lease
+
+    def _reconcile_locked(self, stolen_ids, covered_to):
+        # Concessões roubadas da que foi concluída (e as roubadas delas) que
+        # a conclusão até covered_to já cobriu são descartadas
+        for stolen_id in stolen_ids:
+            stolen = self._leases.get(stolen_id)
+            if stolen is not None and stolen.reach <= covered_to:
+                self.reconciled += 1
+                self._reconcile_locked(self._drop_lease_locked(stolen), covered_to)
+
+    def _find_lease_locked(self, worker_id, start, end, lease_id):
+        if lease_id is not None:
+            lease = self._leases.get(lease_id)
+            if lease is not None and lease.worker_id == worker_id:
+                return lease
+            return None
+        for candidate in self._by_worker.get(worker_id, ()):
+            lease = self._leases[candidate]
+            if lease.start == start and end in (lease.end, lease.reach):
+                return lease
+        return None
+
+    def _drop_lease_locked(self, lease):
+        # Devolve os ids das concessões roubadas desta (ver _reconcile_locked)
+        del self._leases[lease.lease_id]
+        owned = self._by_worker.get(lease.worker_id)
+        if owned is not None:
+            owned.discard(lease.lease_id)
+            if not owned:
+                del self._by_worker[lease.worker_id]
+        return self._splits.pop(lease.lease_id, ())
+
+    def _push_reclaim_locked(self, start, end, origin=None):
+        # origin: intervalo da concessão vencida de que este é um pedaço
+        origin = (start, end) if origin is None else origin
+        if end <= self.frontier:
+            return
+        start = max(start, self.frontier)
+        heapq.heappush(self._reclaim, (start, end))
+        self._live_reclaim_locked((start, end), origin)
+
+    def _live_reclaim_locked(self, piece, origin):
+        if piece in self._reclaim_live:
+            self._unlive_reclaim_locked(piece)
+        self._reclaim_live[piece] = origin
+        self._reclaim_origins.setdefault(origin, set()).add(piece)
+
+    def _unlive_reclaim_locked(self, piece):
+        origin = self._reclaim_live.pop(piece)
+        pieces = self._reclaim_origins[origin]
+        pieces.discard(piece)
+        if not pieces:
+            del self._reclaim_origins[origin]
+        return origin
+
+    def _pop_reclaim_locked(self, size):
+        while self._reclaim:
+            start, end = heapq.heappop(self._reclaim)
+            if (start, end) not in self._reclaim_live:
+                continue
+            origin = self._unlive_reclaim_locked((start, end))
+            if end <= self.frontier:
+                continue  # já coberto (ex.: concessão roubada vencida, depois reconciliada)
+            start = max(start, self.frontier)
+            if end - start > size:
+                self._push_reclaim_locked(start + size, end, origin)
+                end = start + size
+            return start, end
+        return None, None
+
+    def _expire_locked(self, now):
+        expired = []
+        while self._expiry and self._expiry[0][0] <= now:
+            deadline, lease_id = heapq.heappop(self._expiry)
+            lease = self._leases.get(lease_id)
+            if lease is None:
+                continue
+            if lease.deadline > deadline:
+                # Prazo renovado depois de entrar no heap.
+                heapq.heappush(self._expiry, (lease.deadline, lease_id))
+                continue
+            self._drop_lease_locked(lease)
+            self._push_reclaim_locked(lease.start, lease.end)
+            expired.append(lease)
+        self.expired += len(expired)
+        return expired
+
+    def _advance_locked(self):
+        advanced = False
+        while self._completed and self._completed[0][0] <= self.frontier:
+            _, end = heapq.heappop(self._completed)
+            if end > self.frontier:
+                self.frontier = end
+                advanced = True
+        return advanced
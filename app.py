@@ -5,9 +5,26 @@ import math
 import time
 import threading
 import json
-from datetime import datetime, timedelta
-
-app = Flask(__name__)
+import base64
+import atexit
+
+from npp_residue import NPPResidueEngine, MAX_PRIMES_PER_CALL, MAX_VECTOR_PRIME_BITS
+from npp_cache import NPPNumber, build_cache, cache_is_current
+from sieve import MAX_RANGE_WIDTH, SIEVE_LIMIT, primes_in_range, segment_bitmap
+from primality import next_primes
+from prime_index import PrimeIndex
+from coordinator import Coordinator, MAX_BATCH_LEASES, apply_record, empty_state
+from wal import DurableState
+from sqlite_state import SQLiteBackend
+from status_cache import StatusCache
+from ingest import IngestQueue, QueueFull, QUEUED
+from verifier import MAX_PENDING_PER_WORKER, RETRY_AFTER_SECONDS, VerificationFull
+import metrics
+from events import EventHub, format_event
+from results_store import parse_time
+from static_assets import AssetBundle, StaticAsset, REVALIDATE_CACHE_CONTROL
+
+app = Flask(__name__, static_folder=None)  # /static/ é servido por ASSETS
 CORS(app)  # Permitir CORS para todas as rotas
 
 # Conteúdo HTML, CSS e JavaScript como strings
@@ -18,9 +35,9 @@ HTML_CONTENT = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Fatoração Distribuída NPP</title>
-    <style>{css_content}</style>
+    <link rel="stylesheet" href="{css_url}">
 </head>
-<body>
+<body data-compute-worker="{compute_url}">
     <div class="container">
         <header>
             <h1>Fatoração Distribuída do Número NPP</h1>
@@ -72,7 +89,8 @@ HTML_CONTENT = '''
         </main>
     </div>
 
-    <script>{js_content}</script>
+    <script src="{compute_url}" defer></script>
+    <script src="{js_url}" defer></script>
 </body>
 </html>
 '''
@@ -276,7 +294,155 @@ h2 {
 }
 '''
 
+COMPUTE_JS_CONTENT = '''
+// Teste de divisibilidade de N pelos primos de uma concessão. O mesmo arquivo
+// roda nos Web Workers (onde recebe as concessões por mensagem) e na página,
+// quando o navegador não tem Web Workers.
+const MAX_FLOAT_MODULUS = 2 ** 37; // r * 65536 + w continua exato em double
+const RESIDUE_GROUP = 8; // primos por passada sobre as palavras do número
+const BATCH_BUDGET_MS = 50; // duração alvo de cada lote entre mensagens de progresso
+const YIELD_MS = 1000; // intervalo entre pausas do cálculo para receber mensagens ('truncate')
+
+function residueOf(words, p) {
+    // N mod p por Horner sobre as palavras de 16 bits, da mais significativa
+    if (p > MAX_FLOAT_MODULUS) {
+        const modulus = BigInt(p);
+        let r = 0n;
+        for (let i = words.length - 1; i >= 0; i--) {
+            r = (r * 65536n + BigInt(words[i])) % modulus;
+        }
+        return Number(r);
+    }
+    let r = 0;
+    for (let i = words.length - 1; i >= 0; i--) {
+        r = (r * 65536 + words[i]) % p;
+    }
+    return r;
+}
+
+function residuesOf(words, primes) {
+    // Vários primos por passada: cada palavra é lida uma vez por grupo de
+    // RESIDUE_GROUP primos, em vez de uma vez por primo
+    const result = new Array(primes.length);
+    for (let start = 0; start < primes.length; start += RESIDUE_GROUP) {
+        const group = primes.slice(start, start + RESIDUE_GROUP);
+        if (group.some(p => p > MAX_FLOAT_MODULUS)) {
+            group.forEach((p, k) => { result[start + k] = residueOf(words, p); });
+            continue;
+        }
+        const r = new Float64Array(group.length);
+        for (let i = words.length - 1; i >= 0; i--) {
+            const w = words[i];
+            for (let k = 0; k < group.length; k++) {
+                r[k] = (r[k] * 65536 + w) % group[k];
+            }
+        }
+        r.forEach((value, k) => { result[start + k] = value; });
+    }
+    return result;
+}
+
+function simulateDivisibility(divisor) {
+    // Sem o número carregado, simular que raramente encontra divisores
+    // (apenas para demonstração), com alguns divisores pequenos conhecidos
+    if (divisor === 2 || divisor === 3 || divisor === 5 || divisor === 7) {
+        return Math.random() < 0.001; // 0.1% de chance para primos pequenos
+    }
+    return Math.random() < 0.00001; // 0.001% de chance para outros primos
+}
+
+function findDivisors(words, primes) {
+    if (!words) return primes.filter(simulateDivisibility);
+    const residues = residuesOf(words, primes);
+    return primes.filter((p, i) => residues[i] === 0);
+}
+
+if (typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope) {
+    let words = null;
+    const limits = new Map(); // leaseId -> novo fim (concessão dividida pelo servidor)
+    
+    self.onmessage = event => {
+        const message = event.data;
+        if (message.type === 'number') {
+            words = new Uint16Array(message.buffer);
+        } else if (message.type === 'lease') {
+            runLease(message);
+        } else if (message.type === 'truncate') {
+            limits.set(message.leaseId, message.end);
+        }
+    };
+    
+    async function runLease(message) {
+        // Lotes de tamanho adaptativo, de modo que cada um dure cerca de
+        // BATCH_BUDGET_MS; o progresso é enviado ao fim de cada lote. A cada
+        // YIELD_MS o cálculo pausa para receber um novo fim ('truncate').
+        let primes = message.primes;
+        let end = message.end;
+        const divisors = [];
+        const started = performance.now();
+        let lastYield = started;
+        let batch = RESIDUE_GROUP;
+        let index = 0;
+        limits.delete(message.leaseId);
+        while (index < primes.length) {
+            const batchStarted = performance.now();
+            const slice = primes.slice(index, index + batch);
+            divisors.push(...findDivisors(words, slice));
+            index += slice.length;
+            const elapsed = performance.now() - batchStarted;
+            if (elapsed < BATCH_BUDGET_MS / 2) {
+                batch *= 2;
+            } else if (elapsed > BATCH_BUDGET_MS && batch > 1) {
+                batch = Math.max(1, Math.floor(batch / 2));
+            }
+            self.postMessage({ type: 'progress', leaseId: message.leaseId, done: index, prime: primes[index - 1] });
+            if (performance.now() - lastYield >= YIELD_MS) {
+                await new Promise(resolve => setTimeout(resolve, 0));
+                lastYield = performance.now();
+                if (limits.has(message.leaseId)) {
+                    end = Math.min(end, limits.get(message.leaseId));
+                    limits.delete(message.leaseId);
+                    let count = primes.length;
+                    while (count > index && primes[count - 1] >= end) count--;
+                    primes = primes.slice(0, count);
+                }
+            }
+        }
+        self.postMessage({
+            type: 'done',
+            leaseId: message.leaseId,
+            divisors: divisors,
+            tested: index,
+            end: end,
+            ms: performance.now() - started
+        });
+    }
+}
+'''
+
 JS_CONTENT = '''
+const NUMBER_CHUNK_BYTES = 4 * 1024 * 1024; // Partes do download do número (Range)
+const WORK_SLICE_MS = 40; // Sem Web Workers: tempo de cálculo por iteração antes de devolver a vez à interface
+const UI_UPDATE_MS = 500; // Intervalo mínimo entre atualizações do status do trabalho
+const HEARTBEAT_MS = 15000; // Progresso das concessões em cálculo enviado ao servidor
+
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function openNumberStore() {
+    // numbers: hash -> ArrayBuffer completo; chunks: "hash:início" -> parte baixada
+    const request = indexedDB.open('npp', 1);
+    request.onupgradeneeded = () => {
+        request.result.createObjectStore('numbers');
+        request.result.createObjectStore('chunks');
+    };
+    return idbRequest(request);
+}
+
 class FactorizationWorker {
     constructor() {
         this.isWorking = false;
@@ -285,8 +451,24 @@ class FactorizationWorker {
         this.statusInterval = null;
         this.workerId = `worker_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
         this.currentPrime = 2;
+        this.primes = [];
+        this.primeIndex = 0;
+        this.batchSize = 4; // Concessões pedidas por requisição
+        this.workQueue = []; // Concessões pré-buscadas, com os primos já carregados
+        this.completedResults = []; // Intervalos concluídos aguardando envio em lote
+        this.submitting = false;
+        this.eventSource = null;
+        this.usePolling = false; // Consultar /status periodicamente quando /events não estiver disponível
+        this.lastDivisorId = 0; // Último divisor mostrado, para não repetir
+        this.numberBuffer = null; // Número NPP em binário (bytes little-endian)
+        this.numberWords = null; // O mesmo, em palavras de 16 bits
+        this.numberLoading = null;
+        this.computeWorkers = []; // Web Workers de cálculo, um por núcleo
+        this.primesTested = 0; // Primos testados desde o início do trabalho
+        this.workStarted = 0;
+        this.lastStatusUpdate = 0;
         this.initializeEventListeners();
-        this.updateStatus();
+        this.startStatusUpdates();
     }
 
     initializeEventListeners() {
@@ -301,12 +483,23 @@ class FactorizationWorker {
         document.getElementById('start-work').disabled = true;
         document.getElementById('stop-work').disabled = false;
         
-        this.updateWorkStatus('Solicitando trabalho do servidor...');
-        
         try {
+            this.numberLoading = this.numberLoading || this.loadNumber();
+            await this.numberLoading;
+            this.updateWorkStatus('Solicitando trabalho do servidor...');
+            this.primesTested = 0;
+            this.workStarted = performance.now();
+            if (typeof Worker !== 'undefined') {
+                this.startComputeWorkers();
+                this.workInterval = setInterval(() => this.renderProgress(), UI_UPDATE_MS);
+            } else {
+                this.workInterval = setInterval(() => this.processWork(), 10);
+            }
+            this.heartbeatInterval = setInterval(() => this.sendHeartbeats(), HEARTBEAT_MS);
             await this.getWorkFromServer();
-            this.workInterval = setInterval(() => this.processWork(), 100); // Processar mais rapidamente
-            this.statusInterval = setInterval(() => this.updateStatus(), 2000); // Atualizar status mais frequentemente
+            if (this.usePolling) {
+                this.statusInterval = setInterval(() => this.updateStatus(), 2000); // Atualizar status mais frequentemente
+            }
         } catch (error) {
             console.error('Erro ao iniciar trabalho:', error);
             this.updateWorkStatus('Erro ao conectar com o servidor');
@@ -323,132 +516,369 @@ class FactorizationWorker {
             clearInterval(this.workInterval);
             this.workInterval = null;
         }
+        if (this.heartbeatInterval) {
+            clearInterval(this.heartbeatInterval);
+            this.heartbeatInterval = null;
+        }
+        
+        // Concessões em cálculo são abandonadas (vencem no servidor)
+        this.computeWorkers.forEach(worker => worker.terminate());
+        this.computeWorkers = [];
+        this.workQueue = [];
+        this.currentWork = null;
         
         if (this.statusInterval) {
             clearInterval(this.statusInterval);
             this.statusInterval = null;
         }
         
+        // Enviar o que já foi concluído, sem pedir novas concessões
+        this.submitBatch(0);
+        
         this.updateWorkStatus('Trabalho parado');
     }
 
-    async getWorkFromServer() {
-        const response = await fetch(`/get_work?worker_id=${this.workerId}`);
-        if (!response.ok) {
-            throw new Error('Falha ao obter trabalho do servidor');
+    async loadNumber() {
+        // Número NPP em binário, baixado uma única vez e guardado no IndexedDB
+        // pelo hash. Sem ele (servidor ainda sem o cache binário), os testes
+        // de divisibilidade são apenas simulados.
+        try {
+            const response = await fetch('/npp/info');
+            if (!response.ok) return;
+            const info = await response.json();
+            this.updateWorkStatus('Carregando o número NPP...');
+            const buffer = await this.loadNumberBytes(info);
+            // Uint16Array usa a ordem de bytes da plataforma (little-endian na prática)
+            this.numberBuffer = buffer;
+            this.numberWords = new Uint16Array(buffer);
+        } catch (error) {
+            console.error('Erro ao carregar o número NPP:', error);
         }
-        
-        this.currentWork = await response.json();
-        this.currentPrime = this.currentWork.start_range;
-        this.updateWorkStatus(`Testando primos de ${this.currentWork.start_range} até ${this.currentWork.end_range}`);
     }
 
-    async processWork() {
-        if (!this.currentWork || !this.isWorking) return;
-
-        // Processar alguns primos por iteração
-        const primesToProcess = 10;
-        const divisorsFound = [];
+    async loadNumberBytes(info) {
+        const db = await openNumberStore();
+        const stored = await idbRequest(db.transaction('numbers').objectStore('numbers').get(info.hash));
+        if (stored) return stored;
         
-        for (let i = 0; i < primesToProcess && this.currentPrime <= this.currentWork.end_range; i++) {
-            this.currentPrime = this.getNextPrime(this.currentPrime);
-            
-            if (this.currentPrime > this.currentWork.end_range) {
-                break;
-            }
-            
-            // Simular teste de divisibilidade (para números muito grandes, isso seria feito de forma diferente)
-            if (this.testDivisibility(this.currentWork.number_to_factor, this.currentPrime)) {
-                divisorsFound.push(this.currentPrime);
-                this.addResult(`Divisor encontrado: ${this.currentPrime}`);
+        let buffer;
+        if (info.encodings.gzip) {
+            // Variante comprimida: um único pedido, descomprimido pelo navegador
+            const response = await fetch(info.url);
+            if (!response.ok) throw new Error('Falha ao baixar o número NPP');
+            buffer = await response.arrayBuffer();
+        } else {
+            // Em partes com Range; partes já guardadas não são baixadas de novo
+            const bytes = new Uint8Array(info.bytes);
+            for (let start = 0; start < info.bytes; start += NUMBER_CHUNK_BYTES) {
+                const key = `${info.hash}:${start}`;
+                let chunk = await idbRequest(db.transaction('chunks').objectStore('chunks').get(key));
+                if (!chunk) {
+                    const end = Math.min(start + NUMBER_CHUNK_BYTES, info.bytes) - 1;
+                    const response = await fetch(info.url, { headers: { Range: `bytes=${start}-${end}` } });
+                    if (response.status !== 206) throw new Error('Falha ao baixar o número NPP');
+                    chunk = await response.arrayBuffer();
+                    await idbRequest(db.transaction('chunks', 'readwrite').objectStore('chunks').put(chunk, key));
+                }
+                bytes.set(new Uint8Array(chunk), start);
+                this.updateWorkStatus(`Baixando o número NPP: ${Math.min(100, (start + NUMBER_CHUNK_BYTES) / info.bytes * 100).toFixed(0)}%`);
             }
-            
-            this.currentPrime++;
+            buffer = bytes.buffer;
         }
         
-        // Atualizar status do trabalho
-        this.updateWorkStatus(`Testando primo: ${this.currentPrime} (${((this.currentPrime - this.currentWork.start_range) / this.currentWork.range_size * 100).toFixed(1)}% do intervalo)`);
-        
-        // Se terminou o intervalo atual, enviar resultados e solicitar novo trabalho
-        if (this.currentPrime > this.currentWork.end_range) {
-            await this.submitResult({
-                worker_id: this.workerId,
-                divisors: divisorsFound,
-                largest_prime_tested: this.currentPrime - 1,
-                range_completed: {
-                    start: this.currentWork.start_range,
-                    end: this.currentWork.end_range
-                }
+        // Só a versão atual fica guardada
+        const tx = db.transaction(['numbers', 'chunks'], 'readwrite');
+        tx.objectStore('chunks').clear();
+        tx.objectStore('numbers').clear();
+        tx.objectStore('numbers').put(buffer, info.hash);
+        await new Promise((resolve, reject) => {
+            tx.oncomplete = resolve;
+            tx.onerror = () => reject(tx.error);
+        });
+        return buffer;
+    }
+
+    startComputeWorkers() {
+        // Um Web Worker por núcleo; cada um calcula uma concessão por vez
+        const count = Math.max(1, navigator.hardwareConcurrency || 1);
+        const url = document.body.dataset.computeWorker;
+        for (let i = 0; i < count; i++) {
+            const worker = new Worker(url);
+            worker.lease = null;
+            worker.done = 0;
+            worker.onmessage = event => this.onComputeMessage(worker, event.data);
+            if (this.numberBuffer) {
+                worker.postMessage({ type: 'number', buffer: this.numberBuffer });
+            }
+            this.computeWorkers.push(worker);
+        }
+        // Concessões suficientes para manter todos ocupados entre dois lotes
+        this.batchSize = Math.max(4, 2 * count);
+    }
+
+    dispatchWork() {
+        // Entrega concessões da fila aos Web Workers ociosos; quando a fila
+        // esvazia, pede o próximo lote enquanto os atuais são calculados
+        for (const worker of this.computeWorkers) {
+            if (worker.lease || this.workQueue.length === 0) continue;
+            worker.lease = this.workQueue.shift();
+            worker.done = 0;
+            worker.prime = 0;
+            worker.postMessage({
+                type: 'lease',
+                leaseId: worker.lease.lease_id,
+                primes: worker.lease.primes,
+                end: worker.lease.end_range
             });
-            
-            // Solicitar novo trabalho
-            await this.getWorkFromServer();
+        }
+        if (this.computeWorkers.length && this.workQueue.length === 0) {
+            this.submitBatch(this.batchSize);
         }
     }
 
-    getNextPrime(start) {
-        // Função otimizada para encontrar o próximo primo
-        if (start < 2) return 2;
-        if (start === 2) return 3;
+    onComputeMessage(worker, message) {
+        if (!worker.lease || message.leaseId !== worker.lease.lease_id) return;
+        if (message.type === 'progress') {
+            worker.done = message.done;
+            worker.prime = message.prime;
+            this.currentPrime = message.prime;
+            return;
+        }
         
-        // Se é par, começar do próximo ímpar
-        if (start % 2 === 0) {
-            start++;
+        const lease = worker.lease;
+        worker.lease = null;
+        worker.done = 0;
+        this.primesTested += message.tested;
+        message.divisors.forEach(divisor => this.addResult(`Divisor encontrado: ${divisor}`));
+        this.completedResults.push({
+            lease_id: lease.lease_id,
+            divisors: message.divisors,
+            range_completed: {
+                start: lease.start_range,
+                end: message.end  // menor que end_range se o servidor dividiu a concessão
+            }
+        });
+        this.dispatchWork();
+    }
+
+    sendHeartbeats() {
+        // Todo primo até o último testado já foi conferido; com isso o
+        // servidor mede o andamento e divide concessões atrasadas. A resposta
+        // traz o fim atual de cada concessão: se encolheu, o cálculo para
+        // nele; se a concessão não existe mais, para já.
+        const leases = this.computeWorkers
+            .filter(worker => worker.lease && worker.prime)
+            .map(worker => ({ lease_id: worker.lease.lease_id, tested_up_to: worker.prime + 1 }));
+        if (this.currentWork && this.primeIndex > 0) {
+            leases.push({ lease_id: this.currentWork.lease_id, tested_up_to: this.currentPrime + 1 });
+        }
+        if (leases.length === 0) return;
+        fetch('/heartbeat', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ worker_id: this.workerId, leases: leases })
+        })
+            .then(response => response.ok ? response.json() : { leases: [] })
+            .then(reply => reply.leases.forEach(item => this.truncateLease(item)))
+            .catch(error => console.error('Erro ao enviar heartbeat:', error));
+    }
+
+    truncateLease(item) {
+        const worker = this.computeWorkers.find(worker => worker.lease && worker.lease.lease_id === item.lease_id);
+        const lease = worker ? worker.lease : this.currentWork;
+        if (!lease || lease.lease_id !== item.lease_id) return;
+        const end = item.status === 'active' ? item.end_range : lease.start_range;
+        if (end >= lease.end_range) return;
+        lease.end_range = end;
+        if (worker) {
+            worker.postMessage({ type: 'truncate', leaseId: lease.lease_id, end: end });
         } else {
-            start += 2;
+            this.primes = this.primes.filter((p, i) => i < this.primeIndex || p < end);
         }
-        
-        while (!this.isPrime(start)) {
-            start += 2;
+    }
+
+    renderProgress() {
+        const inProgress = this.computeWorkers.reduce((sum, worker) => sum + worker.done, 0);
+        const seconds = (performance.now() - this.workStarted) / 1000;
+        const rate = seconds > 0 ? (this.primesTested + inProgress) / seconds : 0;
+        const busy = this.computeWorkers.filter(worker => worker.lease).length;
+        this.updateWorkStatus(`${busy}/${this.computeWorkers.length} workers ativos · ${Math.round(rate).toLocaleString()} primos/s · testando primo ${this.currentPrime.toLocaleString()}`);
+    }
+
+    async getWorkFromServer() {
+        const response = await fetch(`/get_work_batch?worker_id=${this.workerId}&count=${this.batchSize}&with_primes=1`);
+        if (!response.ok) {
+            throw new Error('Falha ao obter trabalho do servidor');
         }
         
-        return start;
+        const batch = await response.json();
+        await this.enqueueLeases(batch.leases, batch.number_to_factor);
+        if (this.computeWorkers.length) {
+            this.dispatchWork();
+        } else {
+            this.nextWork();
+        }
     }
 
-    isPrime(n) {
-        if (n < 2) return false;
-        if (n === 2) return true;
-        if (n % 2 === 0) return false;
+    async enqueueLeases(leases, numberToFactor) {
+        for (const lease of leases) {
+            lease.number_to_factor = numberToFactor;
+            lease.divisors = [];
+            lease.primes = lease.segment
+                ? this.decodePrimes(lease.segment)
+                : await this.fetchPrimes(lease.start_range, lease.end_range);
+            delete lease.segment;
+            this.workQueue.push(lease);
+        }
+    }
+
+    nextWork() {
+        this.currentWork = this.workQueue.shift() || null;
+        if (!this.currentWork) return;
         
-        const sqrt = Math.sqrt(n);
-        for (let i = 3; i <= sqrt; i += 2) {
-            if (n % i === 0) return false;
+        this.primes = this.currentWork.primes;
+        this.primeIndex = 0;
+        this.currentPrime = this.currentWork.start_range;
+        this.updateWorkStatus(`Testando primos de ${this.currentWork.start_range} até ${this.currentWork.end_range}`);
+    }
+
+    async fetchPrimes(start, end) {
+        // Primos do intervalo [start, end) vindos do crivo segmentado do servidor,
+        // como bitmap de ímpares (1 bit por ímpar, little-endian)
+        const response = await fetch(`/primes?start=${start}&end=${end}&format=bitmap`);
+        if (!response.ok) {
+            throw new Error('Falha ao obter primos do servidor');
+        }
+
+        return this.decodePrimes(await response.json());
+    }
+
+    decodePrimes(segment) {
+        const bytes = Uint8Array.from(atob(segment.bitmap), c => c.charCodeAt(0));
+        const primes = segment.includes_two ? [2] : [];
+        for (let i = 0; i < segment.count_odd; i++) {
+            if (bytes[i >> 3] & (1 << (i & 7))) {
+                primes.push(segment.first_odd + 2 * i);
+            }
         }
-        return true;
+        return primes;
     }
 
-    testDivisibility(numberStr, divisor) {
-        // Para números muito grandes, esta é uma implementação simplificada
-        // Em uma implementação real, seria necessário usar bibliotecas especializadas
-        // Por enquanto, simular que raramente encontra divisores (apenas para demonstração)
+    async processWork() {
+        if (!this.isWorking) return;
+        if (!this.currentWork) {
+            // Fila vazia: aguardando as concessões pedidas no último lote
+            this.nextWork();
+            if (!this.currentWork) {
+                this.submitBatch(this.batchSize);
+                return;
+            }
+        }
+
+        // Sem Web Workers: calcular na thread da interface durante uma
+        // fatia de tempo por iteração
+        const deadline = performance.now() + WORK_SLICE_MS;
+        while (this.primeIndex < this.primes.length && performance.now() < deadline) {
+            this.currentPrime = this.primes[this.primeIndex++];
+            this.primesTested++;
+            
+            if (this.testDivisibility(this.currentPrime)) {
+                this.currentWork.divisors.push(this.currentPrime);
+                this.addResult(`Divisor encontrado: ${this.currentPrime}`);
+            }
+        }
         
-        // Simular alguns divisores pequenos conhecidos para demonstração
-        if (divisor === 2 || divisor === 3 || divisor === 5 || divisor === 7) {
-            return Math.random() < 0.001; // 0.1% de chance para primos pequenos
+        // Atualizar status do trabalho, no máximo a cada UI_UPDATE_MS
+        const now = performance.now();
+        if (now - this.lastStatusUpdate >= UI_UPDATE_MS) {
+            this.lastStatusUpdate = now;
+            this.updateWorkStatus(`Testando primo: ${this.currentPrime} (${(this.primeIndex / Math.max(this.primes.length, 1) * 100).toFixed(1)}% do intervalo)`);
         }
         
-        return Math.random() < 0.00001; // 0.001% de chance para outros primos
+        // Se terminou o intervalo atual, guardar o resultado e seguir para a
+        // próxima concessão da fila. Quando a fila chega à última concessão,
+        // os resultados são enviados em lote e a resposta traz o próximo lote,
+        // enquanto essa última concessão é processada.
+        if (this.primeIndex >= this.primes.length) {
+            this.completedResults.push({
+                lease_id: this.currentWork.lease_id,
+                divisors: this.currentWork.divisors,
+                range_completed: {
+                    start: this.currentWork.start_range,
+                    end: this.currentWork.end_range
+                }
+            });
+            this.nextWork();
+            
+            if (this.workQueue.length === 0) {
+                this.submitBatch(this.batchSize);
+            }
+        }
     }
 
-    async submitResult(result) {
+    async submitBatch(requestLeases) {
+        // Um envio por vez: submitting só é liberado quando este termina (ou
+        // quando o reenvio agendado começa), antes de pedir mais trabalho
+        if (this.submitting || (this.completedResults.length === 0 && requestLeases === 0)) return;
+        this.submitting = true;
+        
+        const results = this.completedResults;
+        this.completedResults = [];
+        let retryAfter = 0;
+        let dispatch = false;
         try {
-            const response = await fetch('/submit_result', {
+            const response = await fetch('/submit_batch', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify(result)
+                body: JSON.stringify({
+                    worker_id: this.workerId,
+                    results: results,
+                    request_leases: requestLeases,
+                    with_primes: true
+                })
             });
             
+            if (response.status === 503 || response.status === 429) {
+                // Fila do servidor cheia (ou worker bloqueado): reenviar após Retry-After
+                retryAfter = Number(response.headers.get('Retry-After')) || 1;
+                this.completedResults = results.concat(this.completedResults);
+                return;
+            }
             if (!response.ok) {
-                throw new Error('Falha ao enviar resultado');
+                throw new Error('Falha ao enviar resultados');
             }
             
-            const responseData = await response.json();
-            console.log('Resultado enviado com sucesso:', responseData);
+            // 202: resultados enfileirados no servidor; as concessões novas já vêm na resposta
+            const batch = await response.json();
+            if (this.isWorking) {
+                await this.enqueueLeases(batch.leases, batch.number_to_factor);
+                // Sem concessões novas, o próximo pedido parte da próxima conclusão
+                dispatch = batch.leases.length > 0;
+            }
         } catch (error) {
-            console.error('Erro ao enviar resultado:', error);
+            console.error('Erro ao enviar resultados:', error);
+            // Tentar novamente no próximo envio (o servidor ignora intervalos repetidos)
+            this.completedResults = results.concat(this.completedResults);
+        } finally {
+            if (retryAfter) {
+                setTimeout(() => {
+                    this.submitting = false;
+                    this.submitBatch(requestLeases);
+                }, retryAfter * 1000);
+            } else {
+                this.submitting = false;
+            }
         }
+        if (dispatch) this.dispatchWork();
+    }
+
+    testDivisibility(divisor) {
+        if (this.numberWords) {
+            return residueOf(this.numberWords, divisor) === 0;
+        }
+        return simulateDivisibility(divisor);
     }
 
     updateWorkStatus(message) {
@@ -473,37 +903,79 @@ class FactorizationWorker {
         }
     }
 
+    startStatusUpdates() {
+        // Status e divisores empurrados pelo servidor via /events; sem
+        // EventSource, ou se o servidor recusar a conexão, volta a consultar /status
+        if (typeof EventSource === 'undefined') {
+            this.fallBackToPolling();
+            return;
+        }
+        
+        this.eventSource = new EventSource('/events');
+        this.eventSource.addEventListener('status', event => this.renderStatus(JSON.parse(event.data)));
+        this.eventSource.addEventListener('divisors', event => this.showDivisors(JSON.parse(event.data)));
+        this.eventSource.onerror = () => {
+            // Erros de rede reconectam sozinhos; CLOSED significa recusa do servidor
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                this.eventSource = null;
+                this.fallBackToPolling();
+            }
+        };
+    }
+
+    fallBackToPolling() {
+        this.usePolling = true;
+        this.updateStatus();
+        if (this.isWorking && !this.statusInterval) {
+            this.statusInterval = setInterval(() => this.updateStatus(), 2000);
+        }
+    }
+
     async updateStatus() {
         try {
             const response = await fetch('/status');
             if (response.ok) {
-                const status = await response.json();
-                
-                // Atualizar elementos da interface
-                document.getElementById('largest-prime').textContent = status.largest_prime_tested.toLocaleString();
-                document.getElementById('active-devices').textContent = status.active_workers;
-                document.getElementById('divisors-found').textContent = status.divisors_found;
-                
-                // Atualizar barra de progresso (baseada no maior primo testado)
-                const progressFill = document.getElementById('progress-fill');
-                const progressText = document.getElementById('progress-text');
-                
-                // Simular progresso baseado no maior primo testado
-                const progress = Math.min((status.largest_prime_tested / 1000000) * 100, 100);
-                progressFill.style.width = `${progress}%`;
-                progressText.textContent = `${progress.toFixed(4)}% concluído (${status.largest_prime_tested.toLocaleString()} primos testados)`;
-                
-                // Mostrar divisores recentes
-                if (status.recent_divisors && status.recent_divisors.length > 0) {
-                    status.recent_divisors.forEach(divisorInfo => {
-                        this.addResult(`Divisor ${divisorInfo.divisor} encontrado por ${divisorInfo.found_by}`);
-                    });
-                }
+                this.renderStatus(await response.json());
             }
         } catch (error) {
             console.error('Erro ao atualizar status:', error);
         }
     }
+
+    showDivisors(divisors) {
+        divisors.forEach(divisorInfo => {
+            if (divisorInfo.id > this.lastDivisorId) {
+                this.lastDivisorId = divisorInfo.id;
+                this.addResult(`Divisor ${divisorInfo.divisor} encontrado por ${divisorInfo.found_by}`);
+            }
+        });
+    }
+
+    renderStatus(status) {
+        // Atualizar elementos da interface
+        document.getElementById('largest-prime').textContent = status.largest_prime_tested.toLocaleString();
+        document.getElementById('active-devices').textContent = status.active_workers;
+        document.getElementById('divisors-found').textContent = status.divisors_found;
+        
+        // Atualizar barra de progresso: primos testados (abaixo da fronteira)
+        // sobre os primos até o limite de busca, contados pelo índice do servidor
+        const progressFill = document.getElementById('progress-fill');
+        const progressText = document.getElementById('progress-text');
+        
+        if (status.primes_tested == null || !status.primes_to_search_limit) {
+            progressText.textContent = `Fronteira em ${status.largest_prime_tested.toLocaleString()} (contagem de primos indisponível)`;
+        } else {
+            const progress = Math.min(status.primes_tested / status.primes_to_search_limit * 100, 100);
+            const rate = status.primes_per_second ? ` · ${Math.round(status.primes_per_second).toLocaleString()} primos/s` : '';
+            progressFill.style.width = `${progress}%`;
+            progressText.textContent = `${progress.toFixed(4)}% dos primos até ${status.search_limit.toLocaleString()} (${status.primes_tested.toLocaleString()} primos testados${rate})`;
+        }
+        
+        // Mostrar divisores recentes (apenas os ainda não exibidos)
+        if (status.recent_divisors && status.recent_divisors.length > 0) {
+            this.showDivisors(status.recent_divisors);
+        }
+    }
 }
 
 // Inicializar o worker quando a página carregar
@@ -512,27 +984,262 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 '''
 
-# Variáveis globais para o número a ser fatorado e o maior primo testado
-NUMBER_TO_FACTOR = 0
-LARGEST_PRIME_TESTED = 2
-WORK_RANGES = {}  # Dicionário para rastrear intervalos de trabalho distribuídos
-ACTIVE_WORKERS = {}  # Dicionário para rastrear workers ativos
-DIVISORS_FOUND = []  # Lista de divisores encontrados
-LAST_UPDATE_TIME = datetime.now()
+BENCHMARK_HTML_CONTENT = '''
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Benchmark do Cálculo - NPP</title>
+    <link rel="stylesheet" href="{css_url}">
+</head>
+<body data-compute-worker="{compute_url}">
+    <div class="container">
+        <header>
+            <h1>Benchmark do Cálculo no Navegador</h1>
+            <p>Primos testados por segundo e maior travamento da interface em cada modo</p>
+        </header>
 
-# Caminhos dos arquivos (ajustados para o novo layout)
-NPP_FILE = os.path.join(os.path.dirname(__file__), 'NPP.txt') # Assumindo que NPP.txt estará na mesma pasta
-LARGEST_PRIME_FILE = os.path.join(os.path.dirname(__file__), 'largest_prime.txt')
-DIVISORS_FILE = os.path.join(os.path.dirname(__file__), 'divisors_found.txt')
+        <main>
+            <section class="work-section">
+                <h2>Configuração</h2>
+                <p>
+                    <label>Segundos por modo <input id="bench-seconds" type="number" value="5" min="1"></label>
+                    <label>Dígitos sintéticos <input id="bench-digits" type="number" value="1000000" min="1000"></label>
+                </p>
+                <p>
+                    <button id="bench-start" class="btn-primary">Executar</button>
+                </p>
+                <div id="bench-status" class="work-status">
+                    <p>Usa o número NPP do servidor, se disponível; senão, um número sintético.</p>
+                </div>
+            </section>
+
+            <section class="results-section">
+                <h2>Resultados</h2>
+                <div id="bench-results" class="results-list"></div>
+            </section>
+        </main>
+    </div>
+
+    <script src="{compute_url}" defer></script>
+    <script src="{benchmark_url}" defer></script>
+</body>
+</html>
+'''
+
+BENCHMARK_JS_CONTENT = '''
+// Compara o laço antigo (10 primos a cada 100 ms na thread da interface), o
+// laço com fatias de tempo e os Web Workers de compute.js. Para cada modo:
+// primos testados por segundo e o maior intervalo entre quadros (travamento).
+const BENCH_FIRST_PRIME = 1000000;
+const BENCH_LEASE_PRIMES = 2000;
+
+function sievePrimes(start, count) {
+    // Primeiros count primos a partir de start (crivo simples por janela)
+    const primes = [];
+    for (let low = start; primes.length < count; low += 1 << 16) {
+        const composite = new Uint8Array(1 << 16);
+        const high = low + composite.length;
+        for (let d = 2; d * d < high; d++) {
+            for (let m = Math.max(d * d, Math.ceil(low / d) * d); m < high; m += d) {
+                composite[m - low] = 1;
+            }
+        }
+        for (let i = 0; i < composite.length && primes.length < count; i++) {
+            if (!composite[i] && low + i > 1) primes.push(low + i);
+        }
+    }
+    return primes;
+}
+
+async function loadBenchmarkNumber(digits) {
+    try {
+        const info = await (await fetch('/npp/info')).json();
+        const response = await fetch(info.url);
+        if (response.ok) return { buffer: await response.arrayBuffer(), label: `NPP (${info.digits.toLocaleString()} dígitos)` };
+    } catch (error) {
+        // sem o número do servidor: sintético
+    }
+    const words = new Uint16Array(Math.ceil(digits * Math.log2(10) / 16));
+    for (let i = 0; i < words.length; i++) words[i] = Math.random() * 65536;
+    return { buffer: words.buffer, label: `sintético (${digits.toLocaleString()} dígitos)` };
+}
+
+function watchFrames() {
+    // Maior intervalo entre quadros enquanto o modo roda
+    const watch = { longest: 0, running: true };
+    let last = performance.now();
+    const frame = now => {
+        watch.longest = Math.max(watch.longest, now - last);
+        last = now;
+        if (watch.running) requestAnimationFrame(frame);
+    };
+    requestAnimationFrame(frame);
+    return watch;
+}
+
+function runMainThread(words, primes, seconds, tick) {
+    // tick(primos, índice) testa alguns primos e devolve o novo índice
+    return new Promise(resolve => {
+        const started = performance.now();
+        let index = 0;
+        const interval = setInterval(() => {
+            index = tick(primes, index);
+            if (performance.now() - started >= seconds * 1000 || index >= primes.length) {
+                clearInterval(interval);
+                resolve(index);
+            }
+        }, tick.interval);
+    });
+}
+
+function oldTick(words) {
+    const tick = (primes, index) => {
+        for (const end = Math.min(index + 10, primes.length); index < end; index++) {
+            residueOf(words, primes[index]);
+        }
+        return index;
+    };
+    tick.interval = 100;
+    return tick;
+}
+
+function slicedTick(words) {
+    const tick = (primes, index) => {
+        const deadline = performance.now() + 40;
+        while (index < primes.length && performance.now() < deadline) {
+            residueOf(words, primes[index++]);
+        }
+        return index;
+    };
+    tick.interval = 10;
+    return tick;
+}
+
+function runWorkers(buffer, primes, seconds, count) {
+    // Concessões de BENCH_LEASE_PRIMES primos, até acabar o tempo
+    return new Promise(resolve => {
+        const url = document.body.dataset.computeWorker;
+        const started = performance.now();
+        let next = 0;
+        let tested = 0;
+        let busy = 0;
+        const workers = [];
+        const dispatch = worker => {
+            if (performance.now() - started >= seconds * 1000 || next >= primes.length) {
+                worker.terminate();
+                if (--busy === 0) resolve(tested);
+                return;
+            }
+            const lease = primes.slice(next, next + BENCH_LEASE_PRIMES);
+            next += lease.length;
+            worker.postMessage({ type: 'lease', leaseId: next, primes: lease });
+        };
+        for (let i = 0; i < count; i++) {
+            const worker = new Worker(url);
+            worker.onmessage = event => {
+                if (event.data.type !== 'done') return;
+                tested += event.data.tested;
+                dispatch(worker);
+            };
+            worker.postMessage({ type: 'number', buffer: buffer.slice(0) });
+            workers.push(worker);
+            busy++;
+        }
+        workers.forEach(dispatch);
+    });
+}
+
+async function runBenchmark() {
+    const button = document.getElementById('bench-start');
+    const status = document.getElementById('bench-status');
+    const results = document.getElementById('bench-results');
+    const seconds = Number(document.getElementById('bench-seconds').value) || 5;
+    const digits = Number(document.getElementById('bench-digits').value) || 1000000;
+    button.disabled = true;
+    results.innerHTML = '';
+
+    status.innerHTML = '<p>Carregando o número...</p>';
+    const number = await loadBenchmarkNumber(digits);
+    const words = new Uint16Array(number.buffer);
+    const cores = Math.max(1, navigator.hardwareConcurrency || 1);
+    const primes = sievePrimes(BENCH_FIRST_PRIME, 200000);
+
+    const modes = [
+        ['10 primos a cada 100 ms (antigo)', () => runMainThread(words, primes, seconds, oldTick(words))],
+        ['Thread da interface, fatias de 40 ms', () => runMainThread(words, primes, seconds, slicedTick(words))],
+        ['1 Web Worker', () => runWorkers(number.buffer, primes, seconds, 1)],
+        [`${cores} Web Workers`, () => runWorkers(number.buffer, primes, seconds, cores)],
+    ];
+    for (const [label, run] of modes) {
+        status.innerHTML = `<p>${number.label}: ${label}...</p>`;
+        const watch = watchFrames();
+        const started = performance.now();
+        const tested = await run();
+        const elapsed = (performance.now() - started) / 1000;
+        watch.running = false;
+        const item = document.createElement('div');
+        item.className = 'result-item';
+        item.textContent = `${label}: ${Math.round(tested / elapsed).toLocaleString()} primos/s, maior travamento ${Math.round(watch.longest)} ms`;
+        results.appendChild(item);
+    }
+    status.innerHTML = `<p>Concluído com o número ${number.label}.</p>`;
+    button.disabled = false;
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('bench-start').addEventListener('click', runBenchmark);
+});
+'''
+
+# Variáveis globais para o número a ser fatorado e o estado do coordenador
+NUMBER_TO_FACTOR = 0
+NPP_ENGINE = None  # Motor de resíduos N mod p sobre o NPP.txt mapeado em memória
+NPP_DOWNLOAD = None  # Limbs binários do NPP para os navegadores (StaticAsset, com Range)
+COORDINATOR = None  # Concessões, workers, resultados e progresso (criado ao iniciar)
+STATE = None  # Snapshot + WAL do progresso e dos divisores (backend em memória)
+STATE_BACKEND = os.environ.get('NPP_STATE_BACKEND', 'memory')  # memory (um processo) ou sqlite (vários processos)
+STATUS_CACHE = None  # JSON de /status pré-serializado, com ETag
+INGEST = None  # Fila de resultados aplicados em segundo plano (ver ingest)
+EVENTS = EventHub()  # Canal /events (Server-Sent Events) compartilhado
+SERVER_WORKERS = int(os.environ.get('NPP_SERVER_WORKERS', 0))  # threads de trabalho no próprio servidor (divisão em lote por gcd)
+EVENTS_STATUS_INTERVAL = 1  # segundos entre verificações de mudança do status
+LEASE_CHECK_INTERVAL = 30  # segundos entre varreduras de concessões vencidas e workers inativos
+WAL_FLUSH_INTERVAL = float(os.environ.get('NPP_WAL_FLUSH_INTERVAL', 0.05))  # segundos entre commits em grupo
+COMPACTION_CHECK_INTERVAL = 10  # segundos entre verificações de compactação
+COMPACTION_BYTES = 2 * 1024 * 1024  # compactar quando o WAL passar deste tamanho (replay < 0,5s)
+# ou quando a última compactação tiver mais de 1 minuto: registro e medições
+# dos workers só vão para o snapshot, então perdem no máximo ~70s numa queda
+COMPACTION_MAX_AGE = 60
+
+# Caminhos dos arquivos (NPP_DATA_DIR permite separar os dados do código)
+DATA_DIR = os.environ.get('NPP_DATA_DIR', os.path.dirname(__file__))
+NPP_FILE = os.path.join(DATA_DIR, 'NPP.txt') # Assumindo que NPP.txt estará na mesma pasta
+NPP_CACHE_FILE = os.path.join(DATA_DIR, 'NPP.bin')  # limbs binários do número (ver npp_cache)
+LARGEST_PRIME_FILE = os.path.join(DATA_DIR, 'largest_prime.txt')
+DIVISORS_FILE = os.path.join(DATA_DIR, 'divisors_found.txt')
+STATE_SNAPSHOT_FILE = os.path.join(DATA_DIR, 'coordinator_state.json')
+STATE_WAL_FILE = os.path.join(DATA_DIR, 'coordinator_state.wal')
+STATE_DB_FILE = os.path.join(DATA_DIR, 'coordinator_state.sqlite')  # NPP_STATE_BACKEND=sqlite
+DIVISORS_STORE_FILE = os.path.join(DATA_DIR, 'divisors.ndjson')
+PRIME_INDEX_FILE = os.path.join(DATA_DIR, 'primes.idx')  # bits dos ímpares primos (ver prime_index)
+PRIME_INDEX_LIMIT = int(os.environ.get('NPP_PRIME_INDEX_LIMIT', 10 ** 9))  # alcance do índice e meta da barra de progresso
+DIVISORS_PAGE_SIZE = 100  # entradas por página em /divisors
+MAX_DIVISORS_PAGE_SIZE = 1000
+MAX_NEXT_PRIMES = 10000  # primos por pedido em /primes?count=
+EXPORT_LINES_PER_CHUNK = 1000  # linhas por bloco na exportação NDJSON
 
 def load_number_from_npp():
-    global NUMBER_TO_FACTOR
+    global NUMBER_TO_FACTOR, NPP_ENGINE
     try:
         with open(NPP_FILE, 'r') as f:
-            sample = f.read(1000)
+            sample = f.read(1000).strip()
             if sample.isdigit():
-                NUMBER_TO_FACTOR = "Número NPP com 44+ milhões de dígitos"
-                print("Arquivo NPP.txt carregado com sucesso (modo simulação)")
+                NPP_ENGINE = NPPResidueEngine(NPP_FILE)
+                NUMBER_TO_FACTOR = f"Número NPP com {NPP_ENGINE.digit_count()} dígitos"
+                print("Arquivo NPP.txt carregado com sucesso")
+                load_npp_cache()
             else:
                 print("Erro: Arquivo NPP.txt não contém apenas dígitos")
                 NUMBER_TO_FACTOR = 0
@@ -543,199 +1250,706 @@ def load_number_from_npp():
         print(f"Erro ao carregar NPP.txt: {e}")
         NUMBER_TO_FACTOR = 0
 
+def load_npp_cache():
+    # Com o cache em dia, NPP.bin é só mapeado em memória. Senão a conversão
+    # (minutos para o número completo) roda em segundo plano e o motor usa
+    # os dígitos do NPP.txt até ela terminar.
+    if cache_is_current(NPP_FILE, NPP_CACHE_FILE):
+        use_npp_number(NPPNumber(NPP_CACHE_FILE))
+        print(f"Cache binário {NPP_CACHE_FILE} carregado")
+        return
+    
+    def build():
+        started = time.perf_counter()
+        try:
+            build_cache(NPP_FILE, NPP_CACHE_FILE)
+            use_npp_number(NPPNumber(NPP_CACHE_FILE))
+        except Exception as e:
+            print(f"Erro ao gerar o cache binário do NPP: {e}")
+            return
+        print(f"Cache binário do NPP gerado em {time.perf_counter() - started:.1f}s")
+    
+    print("Gerando o cache binário do NPP em segundo plano")
+    threading.Thread(target=build, daemon=True).start()
+
+def use_npp_number(number):
+    global NPP_DOWNLOAD
+    NPP_ENGINE.number = number
+    # O nome do download deriva do hash do NPP.txt: uma versão nova do número
+    # muda a URL, e a antiga pode ficar em cache no navegador para sempre
+    NPP_DOWNLOAD = StaticAsset(
+        'npp.bin', number.data, 'application/octet-stream',
+        digest=number.content_hash[:16],
+        variants={'gzip': number.compressed} if number.compressed is not None else {}
+    )
+
+# largest_prime.txt e divisors_found.txt são o formato antigo, lido apenas
+# para migrar para o snapshot + WAL na primeira inicialização
 def load_largest_prime_tested():
-    global LARGEST_PRIME_TESTED
     try:
         with open(LARGEST_PRIME_FILE, 'r') as f:
-            LARGEST_PRIME_TESTED = int(f.read().strip())
+            return int(f.read().strip())
     except FileNotFoundError:
-        LARGEST_PRIME_TESTED = 2
-        save_largest_prime_tested()
+        return 2
     except ValueError:
         print(f"Erro: Conteúdo inválido no arquivo {LARGEST_PRIME_FILE}. Não é um número inteiro.")
-        LARGEST_PRIME_TESTED = 2
-
-def save_largest_prime_tested():
-    with open(LARGEST_PRIME_FILE, 'w') as f:
-        f.write(str(LARGEST_PRIME_TESTED))
+        return 2
 
 def load_divisors():
-    global DIVISORS_FOUND
     try:
         with open(DIVISORS_FILE, 'r') as f:
             content = f.read().strip()
-            if content:
-                DIVISORS_FOUND = json.loads(content)
-            else:
-                DIVISORS_FOUND = []
+            return json.loads(content) if content else []
     except FileNotFoundError:
-        DIVISORS_FOUND = []
+        return []
     except (ValueError, json.JSONDecodeError):
         print(f"Erro: Conteúdo inválido no arquivo {DIVISORS_FILE}.")
-        DIVISORS_FOUND = []
-
-def save_divisors():
-    with open(DIVISORS_FILE, 'w') as f:
-        json.dump(DIVISORS_FOUND, f)
-
-def is_prime(n):
-    if n < 2:
-        return False
-    if n == 2:
-        return True
-    if n % 2 == 0:
-        return False
-    
-    for i in range(3, int(math.sqrt(n)) + 1, 2):
-        if n % i == 0:
-            return False
-    return True
+        return []
 
-def get_next_prime(start):
-    if start < 2:
-        return 2
-    if start == 2:
-        return 3
-    
-    if start % 2 == 0:
-        start += 1
+def load_coordinator_state():
+    if STATE.exists():
+        initial = empty_state()
     else:
-        start += 2
-    
-    while not is_prime(start):
-        start += 2
-    
-    return start
-
-def get_work_range(worker_id, range_size=10000):
-    global LARGEST_PRIME_TESTED, WORK_RANGES
-    
-    start_range = LARGEST_PRIME_TESTED
-    
-    for existing_start, existing_end in WORK_RANGES.values():
-        if start_range < existing_end:
-            start_range = existing_end
-    
-    end_range = start_range + range_size
-    
-    WORK_RANGES[worker_id] = (start_range, end_range)
-    
-    return start_range, end_range
-
-def update_largest_prime_periodically():
-    global LARGEST_PRIME_TESTED, LAST_UPDATE_TIME
+        initial = {'largest_prime_tested': load_largest_prime_tested(), 'divisors': load_divisors()}
     
+    started = time.perf_counter()
+    state, replayed = STATE.load(initial)
+    print(f"Estado restaurado em {time.perf_counter() - started:.3f}s ({replayed} registros do WAL)")
+    return state, replayed
+
+def log_progress(largest_prime_tested):
+    STATE.append({'type': 'progress', 'largest_prime_tested': largest_prime_tested})
+
+def log_divisors(entries):
+    STATE.append({'type': 'divisors', 'entries': entries})
+    publish_divisors(entries)
+
+def publish_divisors(entries):
+    # Com vários processos, só os clientes de /events do processo que
+    # recebeu o resultado são avisados na hora; os demais veem o divisor no
+    # próximo status
+    EVENTS.publish('divisors', entries, event_id=entries[-1]['id'])
+
+def broadcast_status_periodically():
+    # Mudanças rápidas são coalescidas: no máximo um evento por intervalo,
+    # e só quando o conteúdo mudou
+    _, last_etag = STATUS_CACHE.get()
+    while True:
+        time.sleep(EVENTS_STATUS_INTERVAL)
+        
+        if not len(EVENTS):
+            continue
+        body, etag = STATUS_CACHE.get()
+        if etag != last_etag:
+            EVENTS.publish('status', body, coalesce=True)
+            last_etag = etag
+
+def compact_state_periodically():
+    last_compaction = time.time()
     while True:
-        time.sleep(7200)  # 2 horas em segundos
+        time.sleep(COMPACTION_CHECK_INTERVAL)
         
-        max_tested = LARGEST_PRIME_TESTED
-        for start, end in WORK_RANGES.values():
-            if start > max_tested:
-                max_tested = start
+        size = STATE.wal.bytes_written
+        if size > COMPACTION_BYTES or (size and time.time() - last_compaction > COMPACTION_MAX_AGE):
+            STATE.compact(COORDINATOR.snapshot_state)
+            last_compaction = time.time()
+            print(f"WAL compactado ({size} bytes)")
+
+def verify_divisors(candidates):
+    # N mod d de cada candidato numa única passada sobre N (árvore de
+    # produto); sem o número carregado, nada pode ser conferido
+    if NPP_ENGINE is None:
+        return None
+    return NPP_ENGINE.product_residues(candidates)
+
+def timed_route(route):
+    # Histograma de latência da rota em /metrics
+    return metrics.histogram('npp_request_duration_seconds', 'Latência das rotas, em segundos', {'route': route}).timed
+
+def register_gauges():
+    # Valores lidos do coordenador a cada coleta de /metrics
+    metrics.gauge('npp_leases_outstanding', 'Concessões ativas', lambda: COORDINATOR.allocator.active_count)
+    metrics.gauge('npp_lease_oldest_age_seconds', 'Idade da concessão ativa mais antiga',
+                  lambda: COORDINATOR.allocator.lease_ages()[0])
+    metrics.gauge('npp_lease_mean_age_seconds', 'Idade média das concessões ativas',
+                  lambda: COORDINATOR.allocator.lease_ages()[1])
+    metrics.gauge('npp_largest_prime_tested', 'Fronteira segura (todo número abaixo foi testado)',
+                  lambda: COORDINATOR.largest_prime_tested)
+    metrics.gauge('npp_fleet_primes_per_second', 'Primos testados por segundo (janela recente da fronteira)',
+                  lambda: COORDINATOR.prime_progress().get('primes_per_second'))
+    metrics.gauge('npp_fleet_numbers_per_second', 'Soma das vazões medidas dos workers (números/s)',
+                  lambda: COORDINATOR.rates.stats()['fleet_numbers_per_sec'])
+    metrics.gauge('npp_active_workers', 'Workers registrados', lambda: len(COORDINATOR.workers))
+    metrics.gauge('npp_divisors_found', 'Divisores verificados no histórico', lambda: len(COORDINATOR.results))
+    metrics.gauge('npp_divisors_pending', 'Divisores declarados aguardando verificação',
+                  lambda: COORDINATOR.verifier.stats()['pending'])
+    metrics.gauge('npp_ingest_queue_depth', 'Intervalos concluídos aguardando aplicação', lambda: len(INGEST))
+
+def queue_full_response(error):
+    response = jsonify({'status': 'error', 'message': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def throttled_response(seconds):
+    response = jsonify({'status': 'error', 'message': 'Worker bloqueado temporariamente por divisores rejeitados'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(seconds))
+    return response
+
+def get_work_range(worker_id, range_size=None, ip=None, anonymous=False):
+    return COORDINATOR.request_work(worker_id, ip, range_size, anonymous=anonymous)
+
+def run_server_worker(worker_id):
+    # Worker no próprio servidor: cada concessão é testada de uma vez, com
+    # árvore de produto dos primos do intervalo e um único gcd contra N
+    while True:
+        lease = get_work_range(worker_id)
+        try:
+            divisors = NPP_ENGINE.product_divisors(primes_in_range(lease.start, lease.end))
+        except Exception as e:
+            print(f"Erro no worker {worker_id} em [{lease.start}, {lease.end}): {e}")
+            COORDINATOR.release(lease.lease_id)
+            time.sleep(LEASE_CHECK_INTERVAL)
+            continue
+        if divisors:
+            print(f"Divisores encontrados por {worker_id}: {divisors}")
+        COORDINATOR.submit(worker_id, divisors=divisors, lease_id=lease.lease_id)
+
+def build_prime_index():
+    # Cresce o índice de primos até PRIME_INDEX_LIMIT, em passos do crivo
+    # segmentado; o que já estiver no disco não é crivado de novo
+    if PRIME_INDEX.covers(PRIME_INDEX_LIMIT - 1):
+        return
+    started = time.time()
+    PRIME_INDEX.extend(PRIME_INDEX_LIMIT)
+    COORDINATOR.mark_changed()
+    print(f"Índice de primos até {PRIME_INDEX.limit:,} gerado em {time.time() - started:.1f}s")
+
+def reclaim_expired_leases_periodically():
+    # Também remove workers inativos, tirando essa varredura do /status
+    while True:
+        time.sleep(LEASE_CHECK_INTERVAL)
         
-        if max_tested > LARGEST_PRIME_TESTED:
-            LARGEST_PRIME_TESTED = max_tested
-            save_largest_prime_tested()
-            LAST_UPDATE_TIME = datetime.now()
-            print(f"Maior primo testado atualizado para: {LARGEST_PRIME_TESTED}")
+        expired = COORDINATOR.expire_leases()
+        if expired:
+            print(f"{len(expired)} intervalos vencidos voltaram para a fila de realocação")
+        COORDINATOR.reap_inactive()
 
 # Carregar dados ao iniciar a aplicação
 load_number_from_npp()
-load_largest_prime_tested()
-load_divisors()
-
-# Iniciar thread para atualização periódica
-update_thread = threading.Thread(target=update_largest_prime_periodically, daemon=True)
-update_thread.start()
+PRIME_INDEX = PrimeIndex(PRIME_INDEX_FILE)
+if STATE_BACKEND == 'sqlite':
+    # Estado compartilhado no banco: cada operação é gravada na sua
+    # transação, sem snapshot + WAL próprios nem compactação
+    COORDINATOR = Coordinator(
+        on_divisors=publish_divisors,
+        prime_index=PRIME_INDEX,
+        search_limit=PRIME_INDEX_LIMIT,
+        verify=verify_divisors,
+        backend=SQLiteBackend(STATE_DB_FILE, frontier=load_largest_prime_tested())
+    )
+else:
+    STATE = DurableState(STATE_SNAPSHOT_FILE, STATE_WAL_FILE, apply_record, flush_interval=WAL_FLUSH_INTERVAL)
+    state, replayed = load_coordinator_state()
+    COORDINATOR = Coordinator(
+        state['largest_prime_tested'],
+        state['divisors'],
+        on_progress=log_progress,
+        on_divisors=log_divisors,
+        results_path=DIVISORS_STORE_FILE,
+        prime_index=PRIME_INDEX,
+        search_limit=PRIME_INDEX_LIMIT,
+        allocator=state.get('allocator'),
+        workers=state.get('workers'),
+        rates=state.get('rates'),
+        on_allocator_record=STATE.append,
+        verify=verify_divisors
+    )
+    if replayed or not os.path.exists(STATE_SNAPSHOT_FILE):
+        STATE.compact(COORDINATOR.snapshot_state)
+    atexit.register(STATE.close)
+STATUS_CACHE = StatusCache(COORDINATOR)
+INGEST = IngestQueue(COORDINATOR.submit_batch)
+atexit.register(INGEST.drain, 5)  # antes do STATE.close (atexit roda em ordem inversa)
+register_gauges()
+
+# Iniciar thread de recuperação de intervalos vencidos e remoção de workers inativos
+reclaim_thread = threading.Thread(target=reclaim_expired_leases_periodically, daemon=True)
+reclaim_thread.start()
+
+# Iniciar thread de aplicação dos resultados enfileirados
+ingest_thread = threading.Thread(target=INGEST.run, daemon=True)
+ingest_thread.start()
+
+# Iniciar thread de verificação dos divisores declarados
+verifier_thread = threading.Thread(target=COORDINATOR.verifier.run, daemon=True)
+verifier_thread.start()
+
+# Iniciar thread de geração do índice de primos
+prime_index_thread = threading.Thread(target=build_prime_index, daemon=True)
+prime_index_thread.start()
+
+# Iniciar thread de compactação do WAL
+if STATE is not None:
+    compaction_thread = threading.Thread(target=compact_state_periodically, daemon=True)
+    compaction_thread.start()
+
+# Iniciar thread de publicação do status em /events
+events_thread = threading.Thread(target=broadcast_status_periodically, daemon=True)
+events_thread.start()
+
+# Iniciar workers do servidor (desligados por padrão; exigem o NPP.txt)
+if NPP_ENGINE is not None:
+    for i in range(SERVER_WORKERS):
+        threading.Thread(target=run_server_worker, args=(f'server_{i}',), daemon=True).start()
+
+# Front-end renderizado uma única vez: CSS e JS com nomes derivados do
+# conteúdo (cache imutável) e a página revalidada com ETag
+ASSETS = AssetBundle('/static/')
+CSS_ASSET = ASSETS.add('app.css', CSS_CONTENT, 'text/css')
+COMPUTE_ASSET = ASSETS.add('compute.js', COMPUTE_JS_CONTENT, 'text/javascript')  # roda nos Web Workers e na página
+JS_ASSET = ASSETS.add('app.js', JS_CONTENT, 'text/javascript')
+BENCHMARK_JS_ASSET = ASSETS.add('benchmark.js', BENCHMARK_JS_CONTENT, 'text/javascript')
+INDEX_PAGE = StaticAsset(
+    'index.html',
+    HTML_CONTENT.format(css_url=ASSETS.url(CSS_ASSET), compute_url=ASSETS.url(COMPUTE_ASSET), js_url=ASSETS.url(JS_ASSET)),
+    'text/html',
+    cache_control=REVALIDATE_CACHE_CONTROL
+)
+BENCHMARK_PAGE = StaticAsset(
+    'benchmark.html',
+    BENCHMARK_HTML_CONTENT.format(css_url=ASSETS.url(CSS_ASSET), compute_url=ASSETS.url(COMPUTE_ASSET),
+                                  benchmark_url=ASSETS.url(BENCHMARK_JS_ASSET)),
+    'text/html',
+    cache_control=REVALIDATE_CACHE_CONTROL
+)
 
 @app.route('/')
 def index():
-    rendered_html = HTML_CONTENT.format(css_content=CSS_CONTENT, js_content=JS_CONTENT)
-    return Response(rendered_html, mimetype='text/html')
+    return INDEX_PAGE.response(request)
+
+@app.route('/benchmark')
+def benchmark():
+    # Compara o cálculo na thread da interface e em Web Workers
+    return BENCHMARK_PAGE.response(request)
+
+@app.route('/static/<name>')
+def static_asset(name):
+    asset = ASSETS.get(name)
+    if asset is None:
+        return jsonify({'status': 'error', 'message': 'Arquivo não encontrado'}), 404
+    return asset.response(request)
+
+@app.route('/npp/info', methods=['GET'])
+def get_npp_info():
+    # Onde baixar o número em binário: bytes little-endian do inteiro, em
+    # limbs de 64 bits. Os navegadores guardam o download pelo hash.
+    download = NPP_DOWNLOAD
+    if download is None:
+        return jsonify({'status': 'error', 'message': 'Número NPP em binário ainda não disponível'}), 503
+    response = jsonify({
+        'hash': download.digest,
+        'digits': NPP_ENGINE.number.digits,
+        'bytes': len(download.variants['identity']),
+        'url': f'/npp/{download.hashed_name}',
+        'encodings': {encoding: len(body) for encoding, body in download.variants.items()}
+    })
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def number_to_factor():
+    # Metadados do número entregues com as concessões: dígitos e hash da
+    # versão atual, quando o binário já existe, e onde obter o download
+    download = NPP_DOWNLOAD
+    if download is None:
+        return {'info': '/npp/info'}
+    return {'digits': NPP_ENGINE.number.digits, 'hash': download.digest, 'info': '/npp/info'}
+
+@app.route('/npp/<name>', methods=['GET'])
+def get_npp_binary(name):
+    download = NPP_DOWNLOAD
+    if download is None or name != download.hashed_name:
+        return jsonify({'status': 'error', 'message': 'Arquivo não encontrado'}), 404
+    return download.response(request)
 
 @app.route('/get_work', methods=['GET'])
+@timed_route('/get_work')
 def get_work():
     worker_id = request.args.get('worker_id', f'worker_{int(time.time())}')
+    throttled = COORDINATOR.throttled(worker_id, request.remote_addr)
+    if throttled:
+        return throttled_response(throttled)
     
-    ACTIVE_WORKERS[worker_id] = {
-        'last_seen': datetime.now(),
-        'ip': request.remote_addr
-    }
-    
-    start_range, end_range = get_work_range(worker_id)
+    # Sem worker_id, o id gerado conta como anônimo no registro de workers
+    lease = get_work_range(worker_id, ip=request.remote_addr, anonymous='worker_id' not in request.args)
     
     return jsonify({
         'worker_id': worker_id,
-        'number_to_factor': 'Número NPP com 44+ milhões de dígitos (modo simulação)',
-        'start_range': start_range,
-        'end_range': end_range,
-        'range_size': end_range - start_range
+        'lease_id': lease.lease_id,
+        'number_to_factor': number_to_factor(),
+        'start_range': lease.start,
+        'end_range': lease.end,
+        'range_size': lease.end - lease.start
     })
 
 @app.route('/submit_result', methods=['POST'])
+@timed_route('/submit_result')
 def submit_result():
-    data = request.json
+    # O resultado é só validado e enfileirado (ver ingest): 202 ao aceitar,
+    # ou o estado já conhecido quando o cliente repete o mesmo intervalo
+    data, error = worker_request()
+    if error:
+        return error
+    worker_id = data['worker_id']
+    throttled = COORDINATOR.throttled(worker_id, request.remote_addr)
+    if throttled:
+        return throttled_response(throttled)
+    
+    # O progresso vem apenas de intervalos concedidos e concluídos; o
+    # largest_prime_tested enviado pelo cliente não move a fronteira
+    result = parse_result(data)
+    if result is None:
+        return jsonify({'status': 'error', 'message': 'range_completed, lease_id ou divisors inválido'}), 400
+    if result['divisors'] and COORDINATOR.verification_full():
+        return queue_full_response(VerificationFull(RETRY_AFTER_SECONDS))
+    
+    try:
+        [(_, state)] = INGEST.offer(worker_id, request.remote_addr, [result])
+    except QueueFull as e:
+        return queue_full_response(e)
+    
+    if result['divisors']:
+        print(f"Divisores declarados por {worker_id}: {result['divisors']}")
+    
+    if state == QUEUED:
+        return jsonify({'status': 'accepted', 'message': 'Resultado recebido; será processado em seguida'}), 202
+    return jsonify({'status': state, 'message': 'Resultado já recebido anteriormente'})
+
+def parse_result(data):
+    # Intervalo concluído no formato de Coordinator.submit_batch, ou None se
+    # inválido; lease_id, start e end compõem a chave de idempotência e,
+    # como os divisores, só podem ser inteiros. Mais divisores do que cabem
+    # na fila de verificação do worker seriam recusados de qualquer forma
+    if not isinstance(data, dict):
+        return None
+    range_completed = data.get('range_completed') or {}
+    divisors = data.get('divisors') or []
+    if not isinstance(range_completed, dict) or not isinstance(divisors, list) or len(divisors) > MAX_PENDING_PER_WORKER:
+        return None
+    result = {
+        'lease_id': data.get('lease_id'),
+        'start': range_completed.get('start'),
+        'end': range_completed.get('end'),
+        'divisors': divisors
+    }
+    if not all(result[key] is None or is_int(result[key]) for key in ('lease_id', 'start', 'end')):
+        return None
+    if not all(is_int(divisor) for divisor in divisors):
+        return None
+    return result
+
+def is_int(value):
+    return type(value) is int  # True/False não contam
+
+def worker_request():
+    # (corpo JSON, None) de um POST de worker, ou (None, resposta 400) se o
+    # corpo não for um objeto ou o worker_id não for um texto não vazio
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return None, (jsonify({'status': 'error', 'message': 'O corpo deve ser um objeto JSON'}), 400)
     worker_id = data.get('worker_id')
+    if not worker_id or not isinstance(worker_id, str):
+        return None, (jsonify({'status': 'error', 'message': 'worker_id é obrigatório'}), 400)
+    return data, None
+
+def lease_to_json(lease, with_primes=False):
+    # with_primes embute o bitmap de primos do intervalo, poupando ao
+    # cliente uma requisição a /primes por concessão
+    lease_json = {
+        'lease_id': lease.lease_id,
+        'start_range': lease.start,
+        'end_range': lease.end,
+        'range_size': lease.end - lease.start
+    }
+    if with_primes:
+        segment = segment_bitmap(lease.start, lease.end)
+        segment['bitmap'] = base64.b64encode(segment['bitmap']).decode('ascii')
+        lease_json['segment'] = segment
+    return lease_json
+
+@app.route('/get_work_batch', methods=['GET'])
+@timed_route('/get_work_batch')
+def get_work_batch():
+    worker_id = request.args.get('worker_id', f'worker_{int(time.time())}')
+    try:
+        count = int(request.args.get('count', 4))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'count deve ser inteiro'}), 400
+    if not 1 <= count <= MAX_BATCH_LEASES:
+        return jsonify({'status': 'error', 'message': f'count deve estar entre 1 e {MAX_BATCH_LEASES}'}), 400
+    throttled = COORDINATOR.throttled(worker_id, request.remote_addr)
+    if throttled:
+        return throttled_response(throttled)
     
-    if not worker_id:
-        return jsonify({'status': 'error', 'message': 'worker_id é obrigatório'}), 400
+    leases = COORDINATOR.request_work_batch(worker_id, count, ip=request.remote_addr,
+                                            anonymous='worker_id' not in request.args)
+    with_primes = request.args.get('with_primes') == '1'
     
-    if worker_id in ACTIVE_WORKERS:
-        ACTIVE_WORKERS[worker_id]['last_seen'] = datetime.now()
+    return jsonify({
+        'worker_id': worker_id,
+        'number_to_factor': number_to_factor(),
+        'leases': [lease_to_json(lease, with_primes) for lease in leases]
+    })
+
+@app.route('/submit_batch', methods=['POST'])
+@timed_route('/submit_batch')
+def submit_batch():
+    # Vários intervalos concluídos numa requisição, enfileirados como em
+    # /submit_result; opcionalmente devolve novas concessões (request_leases)
+    # para o cliente não ficar ocioso
+    data, error = worker_request()
+    if error:
+        return error
+    worker_id = data['worker_id']
+    results = data.get('results') or []
+    if not isinstance(results, list) or len(results) > MAX_BATCH_LEASES:
+        return jsonify({'status': 'error', 'message': f'results deve ser uma lista de até {MAX_BATCH_LEASES} itens'}), 400
+    throttled = COORDINATOR.throttled(worker_id, request.remote_addr)
+    if throttled:
+        return throttled_response(throttled)
     
-    if 'divisors' in data and data['divisors']:
-        for divisor in data['divisors']:
-            divisor_info = {
-                'divisor': divisor,
-                'found_by': worker_id,
-                'timestamp': datetime.now().isoformat(),
-                'ip': request.remote_addr
-            }
-            DIVISORS_FOUND.append(divisor_info)
-        
-        save_divisors()
-        print(f"Divisores encontrados por {worker_id}: {data['divisors']}")
+    parsed = [parse_result(result) for result in results]
+    if None in parsed:
+        return jsonify({'status': 'error', 'message': 'Item de results inválido'}), 400
+    if any(result['divisors'] for result in parsed) and COORDINATOR.verification_full():
+        return queue_full_response(VerificationFull(RETRY_AFTER_SECONDS))
+    
+    try:
+        states = INGEST.offer(worker_id, request.remote_addr, parsed)
+    except QueueFull as e:
+        return queue_full_response(e)
     
-    if 'largest_prime_tested' in data:
-        global LARGEST_PRIME_TESTED
-        new_largest_prime = int(data['largest_prime_tested'])
-        if new_largest_prime > LARGEST_PRIME_TESTED:
-            LARGEST_PRIME_TESTED = new_largest_prime
-            save_largest_prime_tested()
+    divisors = [d for result in parsed for d in result['divisors']]
+    if divisors:
+        print(f"Divisores declarados por {worker_id}: {divisors}")
+    
+    try:
+        request_leases = int(data.get('request_leases', 0))
+    except (TypeError, ValueError):
+        request_leases = 0
+    new_leases = COORDINATOR.request_work_batch(worker_id, request_leases, ip=request.remote_addr)
+    
+    # results: estado de cada intervalo ('queued' ou o já conhecido de uma repetição)
+    return jsonify({
+        'status': 'accepted',
+        'results': [state for _, state in states],
+        'number_to_factor': number_to_factor(),
+        'leases': [lease_to_json(lease, bool(data.get('with_primes'))) for lease in new_leases]
+    }), 202
+
+@app.route('/heartbeat', methods=['POST'])
+@timed_route('/heartbeat')
+def heartbeat():
+    # Progresso das concessões em andamento: leases é [{'lease_id',
+    # 'tested_up_to'}], com tudo abaixo de tested_up_to já testado. Uma
+    # concessão atrasada pode ter a metade final entregue a outro worker;
+    # a resposta traz o end_range atual (o cliente pode parar nele) ou
+    # 'ignored' se a concessão não existe mais.
+    data, error = worker_request()
+    if error:
+        return error
+    worker_id = data['worker_id']
+    leases = data.get('leases') or []
+    if not isinstance(leases, list) or len(leases) > MAX_BATCH_LEASES:
+        return jsonify({'status': 'error', 'message': f'leases deve ser uma lista de até {MAX_BATCH_LEASES} itens'}), 400
+    items = []
+    for item in leases:
+        position = item.get('tested_up_to') if isinstance(item, dict) else None
+        if not is_int(position) or not is_int(item.get('lease_id')):
+            return jsonify({'status': 'error', 'message': 'Item de leases inválido'}), 400
+        items.append((item.get('lease_id'), position))
     
-    if worker_id in WORK_RANGES:
-        del WORK_RANGES[worker_id]
+    current = COORDINATOR.heartbeat(worker_id, items, ip=request.remote_addr)
     
-    return jsonify({'status': 'success', 'message': 'Resultado processado com sucesso'})
+    return jsonify({
+        'status': 'success',
+        'leases': [
+            {'lease_id': lease_id, 'status': 'ignored'} if lease is None else
+            {'lease_id': lease_id, 'status': 'active', 'start_range': lease.start, 'end_range': lease.end}
+            for (lease_id, _), lease in zip(items, current)
+        ]
+    })
 
 @app.route('/status', methods=['GET'])
+@timed_route('/status')
 def get_status():
-    current_time = datetime.now()
-    inactive_workers = []
-    for worker_id, worker_info in ACTIVE_WORKERS.items():
-        if current_time - worker_info['last_seen'] > timedelta(minutes=5):
-            inactive_workers.append(worker_id)
+    body, etag = STATUS_CACHE.get()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/events', methods=['GET'])
+def get_events():
+    subscriber = EVENTS.subscribe()
+    if subscriber is None:
+        # O cliente volta a consultar /status periodicamente
+        return jsonify({'status': 'error', 'message': 'Limite de conexões de eventos atingido'}), 503
     
-    for worker_id in inactive_workers:
-        del ACTIVE_WORKERS[worker_id]
-        if worker_id in WORK_RANGES:
-            del WORK_RANGES[worker_id]
+    # Estado atual na conexão; numa reconexão, também os divisores perdidos
+    body, _ = STATUS_CACHE.get()
+    initial = [format_event('status', body)]
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    if last_event_id is not None:
+        missed = COORDINATOR.results.after(last_event_id, limit=1000)
+        if missed:
+            initial.append(format_event('divisors', missed, event_id=missed[-1]['id']))
     
-    return jsonify({
-        'largest_prime_tested': LARGEST_PRIME_TESTED,
-        'active_workers': len(ACTIVE_WORKERS),
-        'divisors_found': len(DIVISORS_FOUND),
-        'last_update': LAST_UPDATE_TIME.isoformat(),
-        'work_ranges_active': len(WORK_RANGES),
-        'recent_divisors': DIVISORS_FOUND[-5:] if DIVISORS_FOUND else []
-    })
+    response = Response(EVENTS.stream(subscriber, initial), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def export_divisors(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_LINES_PER_CHUNK:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
 
 @app.route('/divisors', methods=['GET'])
+@timed_route('/divisors')
 def get_divisors():
+    # Paginação por cursor: after é o id da última entrada já recebida.
+    # Filtros opcionais: worker e janela de tempo [since, until), em ISO 8601
+    # ou segundos desde a época. Com format=ndjson, exporta tudo o que casa
+    # com os filtros como um fluxo de linhas JSON.
+    try:
+        after = int(request.args.get('after', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+        since = parse_time(request.args.get('since'))
+        until = parse_time(request.args.get('until'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Parâmetros inválidos'}), 400
+    worker = request.args.get('worker')
+    if limit is not None and limit < 1:
+        return jsonify({'status': 'error', 'message': 'limit deve ser positivo'}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        lines = COORDINATOR.results.query(after, limit, worker, since, until)
+        return Response(export_divisors(lines), mimetype='application/x-ndjson')
+    
+    limit = min(limit or DIVISORS_PAGE_SIZE, MAX_DIVISORS_PAGE_SIZE)
+    lines = list(COORDINATOR.results.query(after, limit, worker, since, until))
+    # Próximo cursor, ou null se esta é a última página
+    next_after = json.loads(lines[-1])['id'] if len(lines) == limit else None
+    # As linhas do arquivo já são JSON: a resposta é montada sem decodificá-las
+    body = b''.join([
+        b'{"divisors":[', b','.join(lines),
+        b'],"total_count":', str(len(COORDINATOR.results)).encode('ascii'),
+        b',"next_after":', json.dumps(next_after).encode('ascii'), b'}'
+    ])
+    return Response(body, mimetype='application/json')
+
+@app.route('/residues', methods=['POST'])
+def get_residues():
+    if NPP_ENGINE is None:
+        return jsonify({'status': 'error', 'message': 'Número NPP não carregado'}), 503
+
+    data = request.get_json(silent=True) or {}
+    primes = data.get('primes')
+    if not isinstance(primes, list) or not primes:
+        return jsonify({'status': 'error', 'message': 'primes deve ser uma lista não vazia'}), 400
+    if len(primes) > MAX_PRIMES_PER_CALL:
+        return jsonify({'status': 'error', 'message': f'Máximo de {MAX_PRIMES_PER_CALL} primos por requisição'}), 400
+    # Só inteiros (2.5 não é truncado para 2) e abaixo do limite do caminho
+    # vetorizado: cada módulo maior custaria uma passada sobre N em Python puro
+    if not all(is_int(p) and 2 <= p < 1 << MAX_VECTOR_PRIME_BITS for p in primes):
+        return jsonify({'status': 'error',
+                        'message': f'primes deve conter inteiros >= 2 e menores que 2**{MAX_VECTOR_PRIME_BITS}'}), 400
+
+    # mode: 'vector' (um resíduo por primo, vetorizado), 'tree' (árvore de
+    # produto + árvore de restos) ou 'gcd' (só os divisores, com um gcd)
+    mode = data.get('mode', 'vector')
+    try:
+        if mode == 'gcd':
+            divisors = NPP_ENGINE.product_divisors(primes)
+            return jsonify({'divisors': divisors, 'scan': NPP_ENGINE.last_scan})
+        elif mode == 'tree':
+            residues = NPP_ENGINE.product_residues(primes)
+        elif mode == 'vector':
+            residues = NPP_ENGINE.residues(primes)
+        else:
+            return jsonify({'status': 'error', 'message': f'Modo desconhecido: {mode}'}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
     return jsonify({
-        'divisors': DIVISORS_FOUND,
-        'total_count': len(DIVISORS_FOUND)
+        'residues': {str(p): r for p, r in residues.items()},
+        'divisors': [p for p, r in residues.items() if r == 0],
+        'scan': NPP_ENGINE.last_scan
     })
 
+@app.route('/primes', methods=['GET'])
+def get_primes():
+    if 'count' in request.args:
+        # Os count primeiros primos >= start (Miller-Rabin / crivo, ver primality)
+        try:
+            start = int(request.args['start'])
+            count = int(request.args['count'])
+        except (KeyError, ValueError):
+            return jsonify({'status': 'error', 'message': 'start e count inteiros são obrigatórios'}), 400
+        if start < 0 or not 0 < count <= MAX_NEXT_PRIMES:
+            return jsonify({'status': 'error', 'message': f'count deve estar entre 1 e {MAX_NEXT_PRIMES}'}), 400
+        if start >= SIEVE_LIMIT:
+            return jsonify({'status': 'error', 'message': f'start deve ser menor que {SIEVE_LIMIT}'}), 400
+        if PRIME_INDEX.covers(start):
+            primes = PRIME_INDEX.next_primes(start - 1, count)
+        else:
+            primes = next_primes(start - 1, count)
+        return jsonify({'start': start, 'count': count, 'primes': primes})
+
+    try:
+        start = int(request.args['start'])
+        end = int(request.args['end'])
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error', 'message': 'start e end inteiros são obrigatórios'}), 400
+    if start < 0 or end < start or end - start > MAX_RANGE_WIDTH:
+        return jsonify({'status': 'error', 'message': f'Intervalo inválido (largura máxima {MAX_RANGE_WIDTH})'}), 400
+    if end > SIEVE_LIMIT:
+        return jsonify({'status': 'error', 'message': f'end deve ser no máximo {SIEVE_LIMIT}'}), 400
+
+    if request.args.get('format') == 'bitmap':
+        segment = segment_bitmap(start, end)
+        segment['bitmap'] = base64.b64encode(segment['bitmap']).decode('ascii')
+        return jsonify(dict(segment, start=start, end=end))
+
+    primes = primes_in_range(start, end)
+    return jsonify({'start': start, 'end': end, 'count': len(primes), 'primes': primes})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/verification', methods=['GET'])
+def get_verification():
+    # Fila de verificação, contagens e rejeições recentes
+    return jsonify(COORDINATOR.verifier.stats())
+
+@app.route('/worker_stats', methods=['GET'])
+def get_worker_stats():
+    return jsonify(COORDINATOR.rates.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,91 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Vazão agregada de /get_work + /submit_result com P processos do servidor
+# sobre o mesmo estado SQLite (NPP_STATE_BACKEND=sqlite), contra um único
+# processo com o estado em memória. Cada processo importa app, como um
+# worker do gunicorn, e atende os pedidos pelo cliente de teste do Flask
+# (sem rede), então a medida é de aplicação + estado. No fim, confere que
+# nenhum intervalo foi entregue a dois workers e que a fronteira cobre tudo.
+
+
+def serve(data_dir, backend, process, clients, seconds, barrier, results):
+    os.environ['NPP_DATA_DIR'] = data_dir
+    os.environ['NPP_STATE_BACKEND'] = backend
+    os.environ['NPP_PRIME_INDEX_LIMIT'] = str(10 ** 6)
+    import app
+
+    client = app.app.test_client()
+    ranges = []
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    requests = 0
+    while time.perf_counter() < deadline:
+        worker_id = f'p{process}_w{requests % clients}'
+        work = client.get(f'/get_work?worker_id={worker_id}').get_json()
+        response = client.post('/submit_result', json={
+            'worker_id': worker_id,
+            'lease_id': work['lease_id'],
+            'range_completed': {'start': work['start_range'], 'end': work['end_range']},
+            'divisors': []
+        })
+        assert response.get_json()['status'] == 'accepted'
+        ranges.append((work['start_range'], work['end_range']))
+        requests += 2
+    app.INGEST.drain()
+    results.put((requests, ranges, app.COORDINATOR.allocator.frontier))
+
+
+def run(backend, processes, clients, seconds):
+    data_dir = tempfile.mkdtemp(prefix='npp-backends-')
+    try:
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(processes + 1)
+        results = context.Queue()
+        workers = [context.Process(target=serve, args=(data_dir, backend, i, clients, seconds, barrier, results))
+                   for i in range(processes)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()  # todos os processos já importaram app
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    finally:
+        shutil.rmtree(data_dir)
+
+    requests = sum(item[0] for item in collected)
+    ranges = sorted(r for item in collected for r in item[1])
+    for (_, previous_end), (start, _) in zip(ranges, ranges[1:]):
+        assert start >= previous_end, 'intervalos sobrepostos'
+    # Cada processo viu a fronteira após o próprio último submit; a maior
+    # delas cobre todos os intervalos entregues
+    assert ranges[0][0] == 2 and max(item[2] for item in collected) == ranges[-1][1]
+    return requests / seconds, len(ranges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão de /get_work e /submit_result por número de processos')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=16, help='worker_ids distintos por processo')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} CPUs')
+    print(f'{"estado":>8} {"processos":>9} {"pedidos/s":>10} {"intervalos":>11}')
+    rate, leases = run('memory', 1, args.clients, args.seconds)
+    print(f'{"memória":>8} {1:>9} {rate:>10.0f} {leases:>11,}')
+    for processes in args.processes:
+        rate, leases = run('sqlite', processes, args.clients, args.seconds)
+        print(f'{"sqlite":>8} {processes:>9} {rate:>10.0f} {leases:>11,}')
+
+
+if __name__ == '__main__':
+    main()
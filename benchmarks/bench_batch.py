@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from npp_residue import NPPResidueEngine
+from sieve import primes_in_range
+from bench_residues import write_synthetic
+
+# Divisão por tentativa em lote (árvore de produto / gcd) contra a redução
+# por primo do motor vetorizado, para intervalos de tamanho crescente.
+# Sem --npp, gera um arquivo sintético com a quantidade de dígitos pedida.
+
+
+def timed(function, primes):
+    started = time.perf_counter()
+    result = function(primes)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Árvore de produto/gcd contra redução por primo')
+    parser.add_argument('--npp', help='arquivo NPP.txt real (opcional)')
+    parser.add_argument('--digits', type=int, default=2_000_000)
+    parser.add_argument('--start', type=int, default=1_000_000, help='início dos intervalos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    tmp = None
+    path = args.npp
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
+        tmp.close()
+        path = tmp.name
+        write_synthetic(path, args.digits)
+
+    try:
+        engine = NPPResidueEngine(path)
+        print(f'{engine.digit_count():,} dígitos em {path}')
+        print(f'{"intervalo":>10} {"primos":>8} {"por primo":>12} {"árvore":>12} {"gcd":>12}   (primos/s)')
+        for size in args.sizes:
+            primes = primes_in_range(args.start, args.start + size)
+            vector_time, residues = timed(engine.residues, primes)
+            tree_time, tree_residues = timed(engine.product_residues, primes)
+            gcd_time, divisors = timed(engine.product_divisors, primes)
+            assert residues == tree_residues
+            assert divisors == sorted(p for p, r in residues.items() if r == 0)
+            n = len(primes)
+            print(f'{size:>10,} {n:>8,} {n / vector_time:>12,.0f} {n / tree_time:>12,.0f} {n / gcd_time:>12,.0f}')
+    finally:
+        if tmp:
+            os.unlink(tmp.name)
+
+
+if __name__ == '__main__':
+    main()
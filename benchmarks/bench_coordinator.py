@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Teste de estresse do coordenador: muitos workers falsos concorrentes fazendo
+# /get_work + /submit_result pelo cliente de teste do Flask, com pollers de
+# /status em paralelo. Reporta ops/s e verifica que nenhum intervalo foi
+# entregue a dois workers ao mesmo tempo.
+
+
+def run_worker(app, worker_id, deadline, leases, errors):
+    client = app.test_client()
+    while time.time() < deadline:
+        response = client.get(f'/get_work?worker_id={worker_id}')
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            continue
+        work = response.get_json()
+        leases.append((work['start_range'], work['end_range']))
+        response = client.post('/submit_result', json={
+            'worker_id': worker_id,
+            'lease_id': work['lease_id'],
+            'divisors': [],
+            'range_completed': {'start': work['start_range'], 'end': work['end_range']}
+        })
+        if response.status_code != 202 or response.get_json()['status'] != 'accepted':
+            errors.append(response.status_code)
+
+
+def run_poller(app, deadline, counter, errors):
+    client = app.test_client()
+    while time.time() < deadline:
+        if client.get('/status').status_code != 200:
+            errors.append('status')
+        counter.append(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estresse multi-thread do coordenador')
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--pollers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ['NPP_DATA_DIR'] = tempfile.mkdtemp(prefix='npp-bench-')
+    import app as app_module
+    app = app_module.app
+    start_frontier = app_module.COORDINATOR.largest_prime_tested
+
+    leases, status_polls, errors = [], [], []
+    deadline = time.time() + args.seconds
+    threads = [threading.Thread(target=run_worker, args=(app, f'bench_{i}', deadline, leases, errors))
+               for i in range(args.workers)]
+    threads += [threading.Thread(target=run_poller, args=(app, deadline, status_polls, errors))
+                for _ in range(args.pollers)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    app_module.INGEST.drain()  # resultados aceitos e ainda na fila de ingestão
+
+    overlaps = 0
+    ordered = sorted(leases)
+    for (_, prev_end), (start, _) in zip(ordered, ordered[1:]):
+        if start < prev_end:
+            overlaps += 1
+    gaps = sum(1 for (_, prev_end), (start, _) in zip(ordered, ordered[1:]) if start > prev_end)
+
+    frontier = app_module.COORDINATOR.largest_prime_tested
+    expected_frontier = ordered[-1][1] if ordered else start_frontier
+    ops = 2 * len(leases) + len(status_polls)
+    print(f'workers={args.workers} pollers={args.pollers} duração={elapsed:.2f}s')
+    print(f'concessões concluídas: {len(leases)} ({len(leases) / elapsed:,.0f}/s)')
+    print(f'/status: {len(status_polls)} ({len(status_polls) / elapsed:,.0f}/s)')
+    print(f'total: {ops / elapsed:,.0f} ops/s, erros: {len(errors)}')
+    print(f'sobreposições: {overlaps}, lacunas: {gaps}, fronteira: {frontier} (esperada {expected_frontier})')
+    if overlaps or gaps or errors or frontier != expected_frontier:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
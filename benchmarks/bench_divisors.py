@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# /divisors com históricos de tamanhos diferentes: latência de uma página,
+# de uma página filtrada por worker e da exportação NDJSON completa, com o
+# pico de memória alocada em cada uma. Com o histórico em disco o pico deve
+# ficar constante à medida que o histórico cresce.
+
+
+def timed(client, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(path)
+    size = sum(len(chunk) for chunk in response.response)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paginação e exportação de /divisors')
+    parser.add_argument('--sizes', default='10000,100000,500000', help='tamanhos do histórico')
+    parser.add_argument('--workers', type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ['NPP_DATA_DIR'] = tempfile.mkdtemp(prefix='npp-bench-')
+    import app as app_module
+    results = app_module.COORDINATOR.results
+    client = app_module.app.test_client()
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        batch = 1000
+        while len(results) < size:
+            n = min(batch, size - len(results))
+            results.add(list(range(n)), f'bench_{(len(results) // batch) % args.workers}')
+
+        print(f'histórico: {len(results):,} entradas')
+        for label, path in [
+            ('primeira página', '/divisors'),
+            ('página no fim', f'/divisors?after={len(results) - 50}'),
+            ('página por worker', '/divisors?worker=bench_7&limit=1000'),
+            ('exportação NDJSON', '/divisors?format=ndjson'),
+        ]:
+            elapsed, peak, body = timed(client, path)
+            print(f'  {label:<18} {elapsed * 1000:>9.1f} ms  pico {peak / 1024:>8.0f} KB  corpo {body / 1024:>9.0f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Latência de /submit_result numa rajada de --submits envios simultâneos
+# (pelo cliente de teste do Flask, em --threads threads): com a fila de
+# ingestão (a rota enfileira e responde 202) contra uma rota equivalente que
+# aplica o resultado no próprio pedido, como antes. Reporta p50/p99/máximo,
+# recusas por fila cheia (503) e o tempo até a fila esvaziar; no fim, a
+# fronteira deve cobrir todas as concessões.
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def burst(app_module, route, leases, threads, max_size):
+    app_module.INGEST.max_size = max_size
+    latencies = []
+    refused = []
+    chunks = [leases[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def submitter(chunk):
+        client = app_module.app.test_client()
+        barrier.wait()
+        for lease in chunk:
+            payload = {
+                'worker_id': lease.worker_id,
+                'lease_id': lease.lease_id,
+                'range_completed': {'start': lease.start, 'end': lease.end},
+                'divisors': []
+            }
+            while True:
+                started = time.perf_counter()
+                response = client.post(route, json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 503:
+                    break
+                refused.append(1)
+                time.sleep(float(response.headers['Retry-After']) / 100)  # rajada: espera encurtada
+            assert response.status_code in (200, 202), response.status_code
+
+    workers = [threading.Thread(target=submitter, args=(chunk,)) for chunk in chunks]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    answered = time.perf_counter() - started
+    app_module.INGEST.drain()
+    applied = time.perf_counter() - started
+    latencies.sort()
+    return latencies, len(refused), answered, applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência de /submit_result numa rajada, com e sem fila de ingestão')
+    parser.add_argument('--submits', type=int, default=10_000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=64, help='worker_ids distintos')
+    parser.add_argument('--queue-size', type=int, default=10_000)
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    args = parser.parse_args()
+
+    os.environ['NPP_DATA_DIR'] = tempfile.mkdtemp(prefix='npp-ingest-')
+    os.environ['NPP_STATE_BACKEND'] = args.backend
+    import app as app_module
+    from flask import jsonify, request
+
+    def submit_inline():
+        # A rota antiga: aplica o resultado antes de responder
+        data = request.get_json()
+        result = app_module.parse_result(data)
+        app_module.COORDINATOR.submit(data['worker_id'], ip=request.remote_addr, divisors=result['divisors'],
+                                      start=result['start'], end=result['end'], lease_id=result['lease_id'])
+        return jsonify({'status': 'success'})
+
+    app_module.app.add_url_rule('/bench_submit_inline', 'bench_submit_inline', submit_inline, methods=['POST'])
+
+    print(f'{args.submits:,} envios em {args.threads} threads, fila de {args.queue_size:,}, estado {args.backend}')
+    print(f'{"rota":<14} {"p50 ms":>8} {"p99 ms":>8} {"máx ms":>8} {"503":>6} {"respostas s":>12} {"aplicados s":>12}')
+    for name, route in [('no pedido', '/bench_submit_inline'), ('fila (202)', '/submit_result')]:
+        leases = [app_module.COORDINATOR.request_work(f'bench_{i % args.workers}') for i in range(args.submits)]
+        latencies, refused, answered, applied = burst(app_module, route, leases, args.threads, args.queue_size)
+        assert app_module.COORDINATOR.allocator.frontier == max(lease.end for lease in leases)
+        print(f'{name:<14} {percentile(latencies, 0.5) * 1e3:>8.2f} {percentile(latencies, 0.99) * 1e3:>8.2f} '
+              f'{latencies[-1] * 1e3:>8.2f} {refused:>6,} {answered:>12.2f} {applied:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+# Custo da instrumentação no caminho das requisições: incremento de
+# contador, observação de histograma e trava medida (sem disputa) contra um
+# threading.Lock puro, com uma e com várias threads escrevendo, e o tempo de
+# uma coleta de /metrics.
+
+
+def per_op(function, count):
+    started = time.perf_counter()
+    function(count)
+    return (time.perf_counter() - started) / count * 1e9
+
+
+def in_threads(function, threads, count):
+    workers = [threading.Thread(target=function, args=(count,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (count * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Custo das métricas por operação')
+    parser.add_argument('--ops', type=int, default=1_000_000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    registry = metrics.Registry()
+    counter = registry.counter('bench_total', 'contador')
+    histogram = registry.histogram('bench_seconds', 'histograma')
+    timed_lock = metrics.TimedLock('bench')
+    plain_lock = threading.Lock()
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    def inc(n):
+        for _ in range(n):
+            counter.inc()
+
+    def observe(n):
+        for i in range(n):
+            histogram.observe(i * 1e-6)
+
+    def with_plain(n):
+        for _ in range(n):
+            with plain_lock:
+                pass
+
+    def with_timed(n):
+        for _ in range(n):
+            with timed_lock:
+                pass
+
+    baseline = per_op(empty, args.ops)
+    print(f'nanossegundos por operação (já descontado o laço vazio, {baseline:.0f} ns)')
+    print(f'{"operação":<22} {"1 thread":>9} {f"{args.threads} threads":>11}')
+    for name, function in [('Counter.inc', inc), ('Histogram.observe', observe),
+                           ('threading.Lock', with_plain), ('TimedLock', with_timed)]:
+        single = per_op(function, args.ops) - baseline
+        threaded = in_threads(function, args.threads, args.ops // args.threads) - baseline
+        print(f'{name:<22} {single:>9.0f} {threaded:>11.0f}')
+
+    # Nenhum incremento perdido entre as threads
+    assert f'bench_total {args.ops + args.ops // args.threads * args.threads}' in registry.render()
+    started = time.perf_counter()
+    text = registry.render()
+    print(f'coleta: {(time.perf_counter() - started) * 1e3:.2f} ms, {len(text.splitlines())} linhas')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_residues import write_synthetic
+
+# Inicialização com o cache binário do NPP: tempo e pico de RSS da conversão
+# de dígitos (primeira inicialização) e do carregamento do NPP.bin já pronto
+# (inicializações seguintes). Cada fase roda num processo separado, para que
+# o pico de RSS de uma não contamine a outra.
+# Sem --npp, gera um arquivo sintético com a quantidade de dígitos pedida.
+
+PHASE = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+from npp_cache import load_npp_number
+started = time.perf_counter()
+number, build_seconds = load_npp_number({source!r}, {cache!r})
+if {touch_value}:
+    number.value()
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'built': build_seconds is not None,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'bytes': number.byte_length,
+}}))
+'''
+
+
+def run_phase(source, cache, touch_value=False):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = PHASE.format(root=root, source=source, cache=cache, touch_value=touch_value)
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de inicialização e pico de RSS do cache binário do NPP')
+    parser.add_argument('--npp', help='arquivo NPP.txt real (opcional)')
+    parser.add_argument('--digits', type=int, default=4_000_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='npp-bench-')
+    source = args.npp
+    if not source:
+        source = os.path.join(directory, 'NPP.txt')
+        write_synthetic(source, args.digits)
+    cache = os.path.join(directory, 'NPP.bin')
+
+    print(f'{os.path.getsize(source):,} bytes em {source}')
+    for label, touch_value in [
+        ('conversão (1ª inicialização)', False),
+        ('cache mapeado', False),
+        ('cache + int completo', True),
+    ]:
+        result = run_phase(source, cache, touch_value)
+        print(f'{label:<30} {result["seconds"] * 1000:>11.1f} ms  pico RSS {result["max_rss_kb"] / 1024:>7.1f} MB'
+              f'  {"(convertido)" if result["built"] else ""}')
+    print(f'NPP.bin: {os.path.getsize(cache):,} bytes')
+
+
+if __name__ == '__main__':
+    main()
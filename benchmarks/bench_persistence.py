@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coordinator import apply_record, empty_state
+from wal import DurableState
+
+# Submits/s da persistência antiga (reescrever divisors_found.txt inteiro e
+# largest_prime.txt a cada submit) contra o WAL com commit em grupo.
+
+
+def make_entry(i):
+    return {'id': i, 'divisor': 1000003 + 2 * i, 'found_by': f'worker_{i % 97}',
+            'timestamp': '2026-01-01T00:00:00', 'ip': '127.0.0.1'}
+
+
+def bench_legacy(directory, history, submits, divisor_every):
+    divisors = [make_entry(i + 1) for i in range(history)]
+    divisors_file = os.path.join(directory, 'divisors_found.txt')
+    largest_file = os.path.join(directory, 'largest_prime.txt')
+    started = time.perf_counter()
+    for i in range(submits):
+        if i % divisor_every == 0:
+            divisors.append(make_entry(len(divisors) + 1))
+            with open(divisors_file, 'w') as f:
+                json.dump(divisors, f)
+        with open(largest_file, 'w') as f:
+            f.write(str(10000 * (i + 1)))
+    return time.perf_counter() - started
+
+
+def bench_wal(directory, history, submits, divisor_every, threads, wait):
+    state = DurableState(os.path.join(directory, 'state.json'), os.path.join(directory, 'state.wal'), apply_record)
+    initial = empty_state()
+    initial['divisors'] = [make_entry(i + 1) for i in range(history)]
+    state.load(initial)
+    next_id = [history + 1]
+    lock = threading.Lock()
+
+    def submitter(count):
+        for i in range(count):
+            if i % divisor_every == 0:
+                with lock:
+                    entry = make_entry(next_id[0])
+                    next_id[0] += 1
+                    state.append({'type': 'divisors', 'entries': [entry]})
+            state.append({'type': 'progress', 'largest_prime_tested': 10000 * (i + 1)})
+            if wait:
+                state.wal.sync()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=submitter, args=(submits // threads,)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    state.wal.sync()
+    elapsed = time.perf_counter() - started
+    flushes = state.wal.flushes
+
+    # Replay a partir do snapshot + WAL
+    state.close()
+    replay = DurableState(state.snapshot_path, state.wal_path, apply_record)
+    t0 = time.perf_counter()
+    _, replayed = replay.load(initial)
+    replay_seconds = time.perf_counter() - t0
+    replay.close()
+    return elapsed, flushes, replayed, replay_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistência antiga vs. WAL com commit em grupo')
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 10000, 100000])
+    parser.add_argument('--submits', type=int, default=2000)
+    parser.add_argument('--divisor-every', type=int, default=10, help='um divisor a cada N submits')
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f'{"histórico":>10} {"antigo/s":>10} {"WAL/s":>10} {"WAL+sync/s":>11} {"fsyncs":>7} {"replay (s)":>11}')
+    for history in args.history:
+        directory = tempfile.mkdtemp(prefix='npp-wal-')
+        try:
+            legacy = bench_legacy(directory, history, args.submits, args.divisor_every)
+            wal_async, _, _, _ = bench_wal(directory, history, args.submits,
+                                           args.divisor_every, 1, wait=False)
+            shutil.rmtree(directory)
+            os.makedirs(directory)
+            wal_sync, flushes, replayed, replay_seconds = bench_wal(directory, history, args.submits,
+                                                                    args.divisor_every, args.threads, wait=True)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f'{history:>10} {args.submits / legacy:>10,.0f} {args.submits / wal_async:>10,.0f} '
+              f'{args.submits / wal_sync:>11,.0f} {flushes:>7} {replay_seconds:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from primality import is_prime, next_prime, next_primes
+
+
+# Cópia da divisão por tentativa que app.py usava (is_prime / get_next_prime),
+# como referência.
+def trial_is_prime(n):
+    if n < 2:
+        return False
+    if n == 2:
+        return True
+    if n % 2 == 0:
+        return False
+
+    for i in range(3, int(math.sqrt(n)) + 1, 2):
+        if n % i == 0:
+            return False
+    return True
+
+
+def trial_next_prime(start):
+    if start < 2:
+        return 2
+    if start == 2:
+        return 3
+    start += 1 if start % 2 == 0 else 2
+    while not trial_is_prime(start):
+        start += 2
+    return start
+
+
+def chain(function, start, count):
+    primes = []
+    for _ in range(count):
+        start = function(start)
+        primes.append(start)
+    return primes
+
+
+def per_call(function, count):
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) / count * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Miller-Rabin determinístico contra divisão por tentativa')
+    parser.add_argument('--magnitudes', type=int, nargs='+', default=[6, 9, 12, 15, 18], help='expoentes de 10')
+    parser.add_argument('--samples', type=int, default=2000, help='números aleatórios por magnitude (is_prime)')
+    parser.add_argument('--primes', type=int, default=200, help='primos seguidos por magnitude (próximo primo)')
+    parser.add_argument('--trial-limit', type=int, default=12, help='maior expoente medido com a divisão por tentativa')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print('microssegundos por chamada (is_prime) e por primo (próximo primo)')
+    print(f'{"magnitude":>9} {"is_prime":>10} {"antigo":>10} {"next_prime":>11} {"next_primes":>12} {"antigo":>10}')
+    for exponent in args.magnitudes:
+        base = 10 ** exponent
+        numbers = [rng.randrange(base, 10 * base) for _ in range(args.samples)]
+        new_check, flags = per_call(lambda: [is_prime(n) for n in numbers], len(numbers))
+        new_next, chained = per_call(lambda: chain(next_prime, base, args.primes), args.primes)
+        next_primes(base, args.primes)  # a primeira chamada inclui a montagem da tabela de primos-base
+        batch_next, batched = per_call(lambda: next_primes(base, args.primes), args.primes)
+        assert chained == batched
+
+        old_check = old_next = '-'
+        if exponent <= args.trial_limit:
+            seconds, expected = per_call(lambda: [trial_is_prime(n) for n in numbers], len(numbers))
+            assert flags == expected
+            old_check = f'{seconds:.2f}'
+            seconds, expected = per_call(lambda: chain(trial_next_prime, base, args.primes), args.primes)
+            assert chained == expected
+            old_next = f'{seconds:.2f}'
+        print(f'{"1e" + str(exponent):>9} {new_check:>10.2f} {old_check:>10} {new_next:>11.2f} {batch_next:>12.2f} {old_next:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prime_index import PrimeIndex
+from primality import next_prime
+
+# Índice de primos em disco: tempo de geração, de reabertura e das consultas
+# (pi(x), next_prime, prev_prime) contra o next_prime por Miller-Rabin.
+
+
+def per_call(function, values):
+    started = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - started) / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Geração e consultas do índice de primos')
+    parser.add_argument('--limit', type=int, default=10 ** 9)
+    parser.add_argument('--queries', type=int, default=100_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='npp-primes-')
+    try:
+        path = os.path.join(directory, 'primes.idx')
+        started = time.perf_counter()
+        PrimeIndex(path).extend(args.limit)
+        built = time.perf_counter() - started
+        started = time.perf_counter()
+        index = PrimeIndex(path)
+        opened = time.perf_counter() - started
+        size = os.path.getsize(path) + os.path.getsize(index.counts_path)
+        print(f'índice até {index.limit:,}: gerado em {built:.2f}s, reaberto em {opened * 1000:.2f} ms, {size:,} bytes')
+        print(f'pi({index.limit - 1:,}) = {index.prime_count(index.limit - 1):,}')
+
+        rng = random.Random(1)
+        values = [rng.randrange(index.limit // 2) for _ in range(args.queries)]
+        print('microssegundos por consulta')
+        print(f'  pi(x)                    {per_call(index.prime_count, values):>8.2f}')
+        print(f'  next_prime (índice)      {per_call(index.next_prime, values):>8.2f}')
+        print(f'  prev_prime (índice)      {per_call(index.prev_prime, values):>8.2f}')
+        print(f'  next_prime (primality)   {per_call(next_prime, values):>8.2f}')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coordinator import Coordinator, apply_record, empty_state
+from wal import DurableState
+
+# Reinício do coordenador após uma queda: tempo para restaurar concessões,
+# intervalos concluídos e workers a partir do snapshot + WAL, com um
+# histórico de --leases concessões (parte delas ainda ativa e parte
+# concluída fora de ordem, acima da fronteira).
+
+
+def open_coordinator(directory):
+    state_file = DurableState(os.path.join(directory, 'state.json'), os.path.join(directory, 'state.wal'),
+                              apply_record)
+    started = time.perf_counter()
+    state, replayed = state_file.load(empty_state())
+    coordinator = Coordinator(
+        state['largest_prime_tested'],
+        state['divisors'],
+        on_progress=lambda frontier: state_file.append({'type': 'progress', 'largest_prime_tested': frontier}),
+        allocator=state.get('allocator'),
+        workers=state.get('workers'),
+        rates=state.get('rates'),
+        on_allocator_record=state_file.append
+    )
+    return state_file, coordinator, time.perf_counter() - started, replayed
+
+
+def build_history(coordinator, leases, workers, active, batch, rng):
+    # Concessões em lotes; todas são concluídas em ordem aleatória, exceto as
+    # últimas `active`, que ficam em andamento
+    issued = []
+    while len(issued) < leases:
+        worker_id = f'worker_{rng.randrange(workers)}'
+        issued.extend((worker_id, lease) for lease in coordinator.request_work_batch(worker_id, batch))
+    done = issued[:-active] if active else issued
+    rng.shuffle(done)
+    for start in range(0, len(done), batch):
+        for worker_id, lease in done[start:start + batch]:
+            coordinator.submit_batch(worker_id, [{'start': lease.start, 'end': lease.end, 'lease_id': lease.lease_id}])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de restauração do coordenador (snapshot + WAL)')
+    parser.add_argument('--leases', type=int, default=100_000, help='concessões no histórico')
+    parser.add_argument('--active', type=int, default=10_000, help='concessões em andamento na queda')
+    parser.add_argument('--workers', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=8, help='concessões por pedido')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    directory = tempfile.mkdtemp(prefix='npp-recovery-')
+    try:
+        state_file, coordinator, _, _ = open_coordinator(directory)
+        build_history(coordinator, args.leases, args.workers, args.active, args.batch, rng)
+        expected = coordinator.allocator.stats()
+        state_file.wal.sync()
+        wal_bytes = sum(os.path.getsize(path) for path in state_file.wal.segments())
+
+        # Queda sem snapshot: tudo vem do WAL
+        _, restored, seconds, replayed = open_coordinator(directory)
+        assert restored.allocator.stats() == expected
+        print(f'só WAL:           {seconds * 1000:>8.1f} ms  ({replayed:,} registros, {wal_bytes:,} bytes)')
+
+        # Snapshot e mais alguns pedidos depois dele
+        started = time.perf_counter()
+        state_file.compact(coordinator.snapshot_state)
+        snapshot_seconds = time.perf_counter() - started
+        build_history(coordinator, args.batch * 100, args.workers, args.batch, args.batch, rng)
+        expected = coordinator.allocator.stats()
+        state_file.wal.sync()
+
+        _, restored, seconds, replayed = open_coordinator(directory)
+        assert restored.allocator.stats() == expected
+        snapshot_bytes = os.path.getsize(os.path.join(directory, 'state.json'))
+        print(f'snapshot + WAL:   {seconds * 1000:>8.1f} ms  ({replayed:,} registros, snapshot de {snapshot_bytes:,} bytes)')
+        print(f'gravação do snapshot: {snapshot_seconds * 1000:.1f} ms; {expected["active_leases"]:,} concessões ativas, '
+              f'{expected["completed_pending"]:,} intervalos concluídos acima da fronteira')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from npp_residue import NPPResidueEngine
+
+# Benchmark do motor de resíduos: primos/s e MB/s de dígitos varridos.
+# Sem --npp, gera um arquivo sintético com a quantidade de dígitos pedida.
+
+
+def small_primes(count, start=3):
+    primes = []
+    n = start | 1
+    while len(primes) < count:
+        if all(n % p for p in range(3, int(n ** 0.5) + 1, 2)):
+            primes.append(n)
+        n += 2
+    return primes
+
+
+def write_synthetic(path, digits):
+    rng = random.Random(42)
+    with open(path, 'w') as f:
+        f.write(str(rng.randint(1, 9)))
+        remaining = digits - 1
+        while remaining > 0:
+            n = min(remaining, 1 << 20)
+            f.write(''.join(rng.choices('0123456789', k=n)))
+            remaining -= n
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do motor de resíduos N mod p')
+    parser.add_argument('--npp', help='arquivo NPP.txt real (opcional)')
+    parser.add_argument('--digits', type=int, default=2_000_000)
+    parser.add_argument('--primes', type=int, nargs='+', default=[1, 100, 1000, 4000])
+    parser.add_argument('--start', type=int, default=1_000_003, help='primeiro candidato a primo')
+    args = parser.parse_args()
+
+    tmp = None
+    path = args.npp
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
+        tmp.close()
+        path = tmp.name
+        write_synthetic(path, args.digits)
+
+    try:
+        engine = NPPResidueEngine(path)
+        digits = engine.digit_count()
+        print(f'{digits:,} dígitos em {path}')
+        print(f'{"primos":>8} {"segundos":>10} {"primos/s":>12} {"MB/s":>10}')
+        for count in args.primes:
+            primes = small_primes(count, args.start)
+            started = time.perf_counter()
+            engine.residues(primes)
+            elapsed = time.perf_counter() - started
+            print(f'{count:>8} {elapsed:>10.3f} {count / elapsed:>12,.0f} {digits / elapsed / 1e6:>10.1f}')
+    finally:
+        if tmp:
+            os.unlink(tmp.name)
+
+
+if __name__ == '__main__':
+    main()
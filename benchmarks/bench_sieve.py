@@ -0,0 +1,59 @@
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sieve import iter_primes
+
+
+# Cópia da divisão por tentativa que app.py usava (is_prime / get_next_prime),
+# usada como referência.
+def is_prime(n):
+    if n < 2:
+        return False
+    if n == 2:
+        return True
+    if n % 2 == 0:
+        return False
+
+    for i in range(3, int(math.sqrt(n)) + 1, 2):
+        if n % i == 0:
+            return False
+    return True
+
+
+def trial_division_range(start, end):
+    return [n for n in range(start, end) if is_prime(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crivo segmentado vs. divisão por tentativa')
+    parser.add_argument('--width', type=int, default=10000, help='largura do intervalo (como get_work_range)')
+    parser.add_argument('--starts', type=int, nargs='+', default=[10 ** 6, 10 ** 9, 10 ** 12])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"início":>15} {"primos":>7} {"is_prime (s)":>13} {"crivo (s)":>10} {"ganho":>8}')
+    for start in args.starts:
+        end = start + args.width
+
+        t0 = time.perf_counter()
+        expected = trial_division_range(start, end)
+        trial = time.perf_counter() - t0
+
+        # A primeira chamada inclui a montagem da tabela de primos-base.
+        list(iter_primes(start, end))
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            found = list(iter_primes(start, end))
+        sieved = (time.perf_counter() - t0) / args.repeat
+
+        assert found == expected, f'divergência em [{start}, {end})'
+        print(f'{start:>15,} {len(found):>7} {trial:>13.4f} {sieved:>10.4f} {trial / sieved:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
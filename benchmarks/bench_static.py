@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Página inicial antes e depois dos assets pré-renderizados: requisições/s de
+# / e bytes transferidos por visita (primeira visita e visitante que volta
+# com o cache do navegador preenchido).
+
+
+def measure(client, path, seconds, headers=None):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        response = client.get(path, headers=headers or {})
+        assert response.status_code in (200, 304)
+        count += 1
+    return count / seconds
+
+
+def wire_bytes(response):
+    # Corpo + cabeçalhos, aproximando o que vai pela rede
+    headers = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return len(response.get_data()) + headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga da página inicial e bytes por visitante')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    os.environ['NPP_DATA_DIR'] = tempfile.mkdtemp(prefix='npp-bench-')
+    import app as app_module
+    from flask import Response
+
+    def legacy_index():
+        # Comportamento antigo: format() a cada requisição, CSS e JS embutidos
+        html = app_module.HTML_CONTENT.replace(
+            '<link rel="stylesheet" href="{css_url}">', f'<style>{app_module.CSS_CONTENT}</style>'
+        ).replace(
+            '<script src="{js_url}" defer></script>', f'<script>{app_module.JS_CONTENT}</script>'
+        )
+        return Response(html, mimetype='text/html')
+
+    app_module.app.add_url_rule('/index_legacy', 'index_legacy', legacy_index)
+    client = app_module.app.test_client()
+    accept = {'Accept-Encoding': 'gzip, deflate, br'}
+
+    legacy_rps = measure(client, '/index_legacy', args.seconds, accept)
+    new_rps = measure(client, '/', args.seconds, accept)
+
+    legacy_visit = wire_bytes(client.get('/index_legacy', headers=accept))
+
+    # Primeira visita: página + CSS + JS, comprimidos
+    asset_urls = [app_module.ASSETS.url(a) for a in (app_module.CSS_ASSET, app_module.JS_ASSET)]
+    page = client.get('/', headers=accept)
+    first_visit = wire_bytes(page) + sum(wire_bytes(client.get(url, headers=accept)) for url in asset_urls)
+
+    # Visitante que volta: a página é revalidada (304) e os assets imutáveis
+    # nem são pedidos
+    returning = client.get('/', headers=dict(accept, **{'If-None-Match': page.headers['ETag']}))
+    assert returning.status_code == 304
+    returning_visit = wire_bytes(returning)
+
+    print(f'/ antigo (format por requisição): {legacy_rps:>9,.0f} req/s')
+    print(f'/ pré-renderizado:                {new_rps:>9,.0f} req/s')
+    print(f'bytes por visita, antigo:             {legacy_visit:>9,}')
+    print(f'bytes na primeira visita, novo:       {first_visit:>9,}')
+    print(f'bytes por visitante que volta, novo:  {returning_visit:>9,}')
+    for name, variants in app_module.ASSETS.stats().items():
+        sizes = ', '.join(f'{encoding} {size:,}' for encoding, size in variants.items())
+        print(f'  {name}: {sizes}')
+
+
+if __name__ == '__main__':
+    main()
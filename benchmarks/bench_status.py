@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Teste de carga de /status: requisições/s no comportamento antigo (varredura
+# de workers + JSON novo a cada chamada) contra o snapshot pré-serializado,
+# com e sem If-None-Match. Um thread de fundo simula submits concorrentes
+# alterando o estado.
+
+
+def measure(client, path, seconds, headers=None):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        response = client.get(path, headers=headers or {})
+        assert response.status_code in (200, 304)
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga de /status antes e depois do snapshot')
+    parser.add_argument('--workers', type=int, default=10000, help='workers registrados')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--submit-rate', type=float, default=50, help='mudanças de estado por segundo')
+    args = parser.parse_args()
+
+    os.environ['NPP_DATA_DIR'] = tempfile.mkdtemp(prefix='npp-bench-')
+    import app as app_module
+    from flask import jsonify
+    coordinator = app_module.COORDINATOR
+
+    for i in range(args.workers):
+        coordinator.request_work(f'bench_{i}')
+
+    def legacy_status():
+        coordinator.reap_inactive()
+        return jsonify(coordinator.status())
+
+    app_module.app.add_url_rule('/status_legacy', 'status_legacy', legacy_status)
+    client = app_module.app.test_client()
+
+    stop = threading.Event()
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            lease = coordinator.request_work(f'bench_{i % args.workers}')
+            coordinator.submit(lease.worker_id, lease_id=lease.lease_id)
+            i += 1
+            time.sleep(1 / args.submit_rate)
+
+    churner = threading.Thread(target=churn, daemon=True)
+    churner.start()
+    try:
+        legacy = measure(client, '/status_legacy', args.seconds)
+        cached = measure(client, '/status', args.seconds)
+        etag = client.get('/status').headers['ETag']
+        conditional = measure(client, '/status', args.seconds, {'If-None-Match': etag})
+
+        # Sem mudanças de estado, todo poll condicional vira 304
+        stop.set()
+        churner.join()
+        time.sleep(app_module.STATUS_CACHE.min_interval)
+        etag = client.get('/status').headers['ETag']
+        idle = measure(client, '/status', args.seconds, {'If-None-Match': etag})
+    finally:
+        stop.set()
+
+    print(f'workers registrados: {args.workers}, mudanças de estado: {args.submit_rate:.0f}/s')
+    print(f'antigo (varredura + JSON):        {legacy:>9,.0f} req/s')
+    print(f'snapshot:                         {cached:>9,.0f} req/s')
+    print(f'snapshot + If-None-Match:         {conditional:>9,.0f} req/s')
+    print(f'snapshot + If-None-Match, ocioso: {idle:>9,.0f} req/s (304)')
+    print(f'reconstruções do snapshot: {app_module.STATUS_CACHE.rebuilds}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import heapq
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from allocator import IntervalAllocator
+
+# Simulação, em tempo virtual, de uma frota sobre o IntervalAllocator: cada
+# worker pede uma concessão dimensionada para --lease-seconds na vazão medida
+# na concessão anterior, testa o intervalo e pede a próxima. Alguns workers
+# (--stragglers) ficam --slowdown vezes mais lentos sem aviso, como um
+# celular que vai para segundo plano: a concessão seguinte, dimensionada
+# pela vazão antiga, atrasa. Compara sem roubo de trabalho, com
+# roubo por tempo (clientes sem heartbeat, que testam sempre o intervalo
+# inteiro) e com heartbeats a cada --heartbeat segundos (o cliente para no
+# fim encolhido que a resposta traz). Reporta o atraso da fronteira: para
+# cada concessão, o tempo entre a entrega e a fronteira passar do seu fim.
+
+
+def simulate(args, steal, heartbeats):
+    rng = random.Random(1)
+    allocator = IntervalAllocator(2)
+    speeds = [rng.uniform(0.5, 2) * args.speed for _ in range(args.workers)]
+    measured = list(speeds)  # vazão da última concessão concluída
+    slow = set(range(args.stragglers))
+    events = [(rng.uniform(0, 1), 'request', w) for w in range(args.workers)]
+    current = {}  # worker -> [concessão, início, vazão real, fim a testar]
+    issued = {}  # lease_id -> (fim, instante)
+    passed = []  # atrasos da fronteira por concessão
+    frontier_log = [(0.0, allocator.frontier)]
+    now = 0.0
+
+    while events:
+        now, kind, worker = heapq.heappop(events)
+        if now > args.seconds:
+            break
+        if kind == 'request':
+            size = int(measured[worker] * args.lease_seconds)
+            lease = (allocator.steal(f'w{worker}', size, now) if steal else None) or allocator.lease(f'w{worker}', size, now)
+            speed = speeds[worker] / (args.slowdown if worker in slow and now > args.slow_after else 1)
+            current[worker] = [lease, now, speed, lease.reach]
+            issued[lease.lease_id] = (lease.reach, now)
+            heapq.heappush(events, (now + (lease.reach - lease.start) / speed, 'done', worker))
+            if heartbeats:
+                heapq.heappush(events, (now + args.heartbeat, 'heartbeat', worker))
+        elif kind == 'heartbeat':
+            if worker not in current:
+                continue
+            state = current[worker]
+            lease, started, speed, end = state
+            position = int(lease.start + (now - started) * speed)
+            [known] = allocator.heartbeat(f'w{worker}', [(lease.lease_id, position)], now)
+            if known is not None and known.end < end:
+                # Concessão dividida: para no novo fim (ou já, se passou dele)
+                state[3] = max(known.end, min(position, end))
+                heapq.heappush(events, (max(now, started + (state[3] - lease.start) / speed), 'done', worker))
+            heapq.heappush(events, (now + args.heartbeat, 'heartbeat', worker))
+        else:
+            state = current.get(worker)
+            if state is None or now < state[1] + (state[3] - state[0].start) / state[2] - 1e-9:
+                continue  # evento de um fim que já foi antecipado
+            lease, _, speed, end = current.pop(worker)
+            measured[worker] = speed
+            allocator.complete(f'w{worker}', end=end, lease_id=lease.lease_id)
+            frontier_log.append((now, allocator.frontier))
+            heapq.heappush(events, (now + args.round_trip, 'request', worker))
+
+    # Instante em que a fronteira passou do fim de cada concessão
+    ends = sorted(issued.values())
+    i = 0
+    for time, frontier in frontier_log:
+        while i < len(ends) and ends[i][0] <= frontier:
+            passed.append(time - ends[i][1])
+            i += 1
+    passed.sort()
+    stats = allocator.stats()
+    return passed, allocator.frontier, stats['split'], stats['reconciled']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Atraso da fronteira com e sem roubo de concessões atrasadas')
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--stragglers', type=int, default=3)
+    parser.add_argument('--slowdown', type=float, default=20, help='fator de lentidão dos atrasados')
+    parser.add_argument('--slow-after', type=float, default=600, help='segundos até os atrasados ficarem lentos')
+    parser.add_argument('--speed', type=float, default=50_000, help='números/s de um worker típico')
+    parser.add_argument('--lease-seconds', type=float, default=60)
+    parser.add_argument('--heartbeat', type=float, default=15)
+    parser.add_argument('--round-trip', type=float, default=0.2)
+    parser.add_argument('--seconds', type=float, default=3600)
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers, {args.stragglers} ficam {args.slowdown:g}x mais lentos após {args.slow_after:g}s; '
+          f'{args.seconds:g}s simulados')
+    print(f'{"modo":<22} {"p50 s":>7} {"p99 s":>7} {"máx s":>7} {"fronteira":>14} {"divisões":>9} {"reconciliadas":>13}')
+    for name, steal, heartbeats in [('sem roubo', False, False), ('roubo por tempo', True, False),
+                                    ('roubo com heartbeat', True, True)]:
+        passed, frontier, split, reconciled = simulate(args, steal, heartbeats)
+        p50 = passed[len(passed) // 2]
+        p99 = passed[min(len(passed) - 1, int(len(passed) * 0.99))]
+        print(f'{name:<22} {p50:>7.0f} {p99:>7.0f} {passed[-1]:>7.0f} {frontier:>14,} {split:>9,} {reconciled:>13,}')
+
+
+if __name__ == '__main__':
+    main()
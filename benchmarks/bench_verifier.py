@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from npp_residue import NPPResidueEngine
+from verifier import DivisorVerifier
+from bench_residues import write_synthetic
+
+# Verificação de divisores declarados: --claims declarações (com repetições)
+# conferidas pelo DivisorVerifier em lotes de tamanhos diferentes. Cada lote
+# é uma passada sobre N; com lote 1, é o custo de conferir um divisor por vez.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificação de divisores em lote contra um por vez')
+    parser.add_argument('--npp', help='arquivo NPP.txt real (opcional)')
+    parser.add_argument('--digits', type=int, default=2_000_000)
+    parser.add_argument('--claims', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=500, help='candidatos distintos entre as declarações')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 1000])
+    args = parser.parse_args()
+
+    tmp = None
+    path = args.npp
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
+        tmp.close()
+        path = tmp.name
+        write_synthetic(path, args.digits)
+
+    try:
+        engine = NPPResidueEngine(path)
+        rng = random.Random(1)
+        candidates = [rng.randrange(2, 1 << 40) for _ in range(args.distinct)]
+        claims = [rng.choice(candidates) for _ in range(args.claims)]
+        print(f'{engine.digit_count():,} dígitos; {args.claims:,} declarações, {len(set(claims)):,} distintas')
+        print(f'{"lote":>6} {"passadas":>9} {"segundos":>9} {"declarações/s":>14}')
+        expected = None
+        for batch_size in args.batch_sizes:
+            outcomes = {}
+            verifier = DivisorVerifier(engine.product_residues,
+                                       lambda claim, verified, rejected: outcomes.update(dict.fromkeys(verified, True)),
+                                       batch_size=batch_size)
+            started = time.perf_counter()
+            for i, divisor in enumerate(claims):
+                verifier.submit(f'w{i}', None, [divisor], (None, None, i))
+            while verifier.verify_pending():
+                pass
+            seconds = time.perf_counter() - started
+            stats = verifier.stats()
+            assert stats['verified'] + stats['rejected'] == args.claims
+            assert expected is None or outcomes == expected
+            expected = outcomes
+            print(f'{batch_size:>6,} {stats["batches"]:>9,} {seconds:>9.2f} {args.claims / seconds:>14,.0f}')
+    finally:
+        if tmp:
+            os.unlink(tmp.name)
+
+
+if __name__ == '__main__':
+    main()
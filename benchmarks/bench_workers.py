@@ -0,0 +1,119 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from worker_registry import WORKER_INACTIVE_SECONDS, WorkerRegistry
+
+# Registro de workers: memória ocupada por --workers workers, custo de um
+# touch (heartbeat de um worker já registrado) e de uma remoção de inativos
+# (a cada 30s no servidor, com --expiring dos workers vencendo) no registro
+# antigo (um dict por worker, varredura completa) e no WorkerRegistry
+# (registros com __slots__, roda de tempo). Por fim, uma enxurrada de --anonymous
+# pedidos sem worker_id num registro limitado a --workers: a memória para de
+# crescer no limite.
+
+
+class LegacyRegistry:
+    # O registro antigo do coordinator
+    def __init__(self):
+        self._workers = {}
+        self._lock = metrics.TimedLock('bench_workers')
+
+    def touch(self, worker_id, ip=None, now=None, create=True, anonymous=False):
+        with self._lock:
+            info = self._workers.get(worker_id)
+            if info is None:
+                if not create:
+                    return False
+                self._workers[worker_id] = {'last_seen': now, 'ip': ip}
+            else:
+                info['last_seen'] = now
+                if ip is not None:
+                    info['ip'] = ip
+            return True
+
+    def reap(self, now=None):
+        with self._lock:
+            inactive = [w for w, info in self._workers.items() if now - info['last_seen'] > WORKER_INACTIVE_SECONDS]
+            for worker_id in inactive:
+                del self._workers[worker_id]
+        return inactive
+
+    def __len__(self):
+        return len(self._workers)
+
+
+def fresh(text):
+    # O texto como chega numa requisição: um objeto novo a cada vez
+    return text.encode().decode()
+
+
+def fill(registry, ids, ips, now):
+    tracemalloc.start()
+    for i, worker_id in enumerate(ids):
+        registry.touch(fresh(worker_id), fresh(ips[i % len(ips)]), now=now + i * 1e-6)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória e custo de touch/remoção no registro de workers')
+    parser.add_argument('--workers', type=int, default=100_000)
+    parser.add_argument('--ips', type=int, default=5_000, help='IPs distintos (NAT, redes móveis)')
+    parser.add_argument('--touches', type=int, default=500_000)
+    parser.add_argument('--expiring', type=float, default=0.01, help='fração de workers que vence por remoção')
+    parser.add_argument('--anonymous', type=int, default=500_000)
+    args = parser.parse_args()
+
+    ids = [f'worker-{i:08d}-{i * 2654435761 % 2 ** 32:08x}' for i in range(args.workers)]
+    ips = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(args.ips)]
+    touched = [fresh(ids[i * 7919 % args.workers]) for i in range(args.touches)]
+    now = 1_000_000.0
+
+    print(f'{args.workers:,} workers, {args.ips:,} IPs')
+    print(f'{"registro":<16} {"MB":>7} {"bytes/worker":>13} {"touch ns":>9} {"remoção ms":>11} {"máx ms":>8} {"removidos":>10}')
+    for name, registry in [('antigo (dict)', LegacyRegistry()), ('WorkerRegistry', WorkerRegistry(now=now))]:
+        memory = fill(registry, ids, ips, now)
+
+        ip = ips[0]
+        started = time.perf_counter()
+        for i, worker_id in enumerate(touched):
+            registry.touch(worker_id, ip, now=now + 1 + i * 1e-6, create=False)
+        touch_ns = (time.perf_counter() - started) / args.touches * 1e9
+
+        # Só os primeiros --expiring workers ficam sem atividade; remoções a
+        # cada 30s até passar o prazo de todos, como no servidor
+        active = ids[int(args.workers * args.expiring):]
+        later = now + WORKER_INACTIVE_SECONDS / 2
+        for worker_id in active:
+            registry.touch(worker_id, now=later, create=False)
+        reaps = []
+        removed = 0
+        for step in range(1, WORKER_INACTIVE_SECONDS // 30 + 2):
+            started = time.perf_counter()
+            removed += len(registry.reap(now=now + step * 30))
+            reaps.append(time.perf_counter() - started)
+        assert len(registry) == len(active)
+        print(f'{name:<16} {memory / 2 ** 20:>7.1f} {memory / args.workers:>13.0f} {touch_ns:>9.0f} '
+              f'{sum(reaps) / len(reaps) * 1e3:>11.2f} {max(reaps) * 1e3:>8.2f} {removed:>10,}')
+
+    registry = WorkerRegistry(max_workers=args.workers, now=now)
+    tracemalloc.start()
+    peaks = []
+    for i in range(args.anonymous):
+        registry.touch(f'worker_{int(now) + i}', fresh(ips[i % len(ips)]), now=now, anonymous=True)
+        if (i + 1) % (args.anonymous // 5) == 0:
+            peaks.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    print(f'{args.anonymous:,} anônimos com limite de {args.workers:,}: {len(registry):,} registrados, '
+          f'{args.anonymous - len(registry):,} despejados; MB ao longo da enxurrada: {" ".join(f"{p / 2 ** 20:.1f}" for p in peaks)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+import collections
+import itertools
+import json
+import time
+from datetime import datetime
+
+import metrics
+from allocator import IntervalAllocator
+from results_store import ResultsStore
+from throughput import WorkerRateTracker
+from verifier import DivisorVerifier
+from worker_registry import WorkerRegistry
+
+# Estado do coordenador, antes espalhado em variáveis globais de app.py.
+#
+# Cada parte tem sua própria trava, para que handlers concorrentes não
+# disputem uma trava única:
+#   - tabela de concessões: trava interna do IntervalAllocator;
+#   - registro de workers: WorkerRegistry (ver worker_registry);
+#   - log de resultados: ResultsLog;
+#   - progresso persistido (maior primo testado): _progress_lock.
+# Nenhuma operação segura duas dessas travas ao mesmo tempo. Com o backend
+# SQLite (ver sqlite_state), as três primeiras partes ficam no banco,
+# compartilhado por vários processos do servidor.
+
+MAX_BATCH_LEASES = 32  # concessões por requisição em /get_work_batch e /submit_batch
+PROGRESS_RATE_WINDOW = 300  # segundos de histórico da fronteira para a taxa de primos/s
+
+
+ALLOCATOR_RECORDS = ('lease', 'complete', 'release', 'expire', 'split')
+
+LEASES_ISSUED = metrics.counter('npp_leases_issued_total', 'Concessões entregues')
+LEASES_COMPLETED = metrics.counter('npp_leases_completed_total', 'Concessões concluídas')
+LEASES_EXPIRED = metrics.counter('npp_leases_expired_total', 'Concessões vencidas e devolvidas à fila')
+LEASES_RELEASED = metrics.counter('npp_leases_released_total', 'Concessões devolvidas à fila antes do prazo')
+LEASES_STOLEN = metrics.counter('npp_leases_stolen_total', 'Metades de concessões atrasadas entregues a outros workers')
+
+
+def empty_state():
+    return {'largest_prime_tested': 2, 'divisors': []}
+
+
+def apply_record(state, record):
+    # Aplica um registro do WAL ao estado persistido. Idempotente: o progresso
+    # só cresce, divisores com id já presente são ignorados e operações do
+    # alocador com seq já incluído no snapshot também (ver allocator).
+    allocator = state.get('allocator')
+    if not isinstance(allocator, IntervalAllocator):
+        # Snapshot sem o alocador (formato antigo): ele partiu da fronteira
+        # do snapshot, antes de qualquer registro
+        allocator = state['allocator'] = IntervalAllocator.from_dict(allocator, state['largest_prime_tested'])
+    if record['type'] == 'progress':
+        state['largest_prime_tested'] = max(state['largest_prime_tested'], record['largest_prime_tested'])
+    elif record['type'] == 'divisors':
+        last_id = state['divisors'][-1].get('id', 0) if state['divisors'] else 0
+        state['divisors'].extend(e for e in record['entries'] if e['id'] > last_id)
+    elif record['type'] in ALLOCATOR_RECORDS:
+        allocator.replay(record)
+    return state
+
+
+class ResultsLog:
+    def __init__(self, store, divisors=None, on_append=None):
+        # O histórico fica no ResultsStore (em disco); divisors são entradas
+        # ainda não incorporadas a ele (formato antigo ou replay do WAL).
+        # Entradas antigas, sem id, são numeradas na ordem em que estão.
+        self.store = store
+        entries = []
+        for entry in divisors or []:
+            if 'id' not in entry:
+                entry = dict(entry, id=store.last_id + len(entries) + 1)
+            entries.append(entry)
+        store.append(entries)
+        self._next_id = store.last_id + 1
+        self._on_append = on_append
+        self._lock = metrics.TimedLock('results')
+
+    def add(self, divisors, worker_id, ip=None):
+        timestamp = datetime.now().isoformat()
+        with self._lock:
+            entries = []
+            for divisor in divisors:
+                entries.append({
+                    'id': self._next_id,
+                    'divisor': divisor,
+                    'found_by': worker_id,
+                    'timestamp': timestamp,
+                    'ip': ip
+                })
+                self._next_id += 1
+            self.store.append(entries)
+            # Dentro da trava, para que o log receba as entradas em ordem de id
+            if self._on_append is not None:
+                self._on_append(entries)
+        return entries
+
+    def recent(self, count=5):
+        return [json.loads(line) for line in self.store.tail(count)] if count else []
+
+    def after(self, entry_id, limit=None):
+        # Entradas com id > entry_id, em ordem (ids são crescentes)
+        positions = self.store.positions(after=entry_id)
+        return [json.loads(line) for line in self.store.read(itertools.islice(positions, limit))]
+
+    def query(self, after=0, limit=None, worker=None, since=None, until=None):
+        # Linhas JSON (bytes) das entradas filtradas, sem decodificar
+        positions = self.store.positions(after, worker, since, until)
+        return self.store.read(itertools.islice(positions, limit))
+
+    def sync(self):
+        self.store.sync()
+
+    def __len__(self):
+        return len(self.store)
+
+
+class Coordinator:
+    def __init__(self, largest_prime_tested=2, divisors=None, on_progress=None, on_divisors=None,
+                 results_path=None, prime_index=None, search_limit=None, allocator=None,
+                 workers=None, rates=None, on_allocator_record=None, backend=None, verify=None):
+        # allocator, workers e rates vêm do snapshot (ver snapshot_state);
+        # allocator também pode ser o IntervalAllocator já reconstruído pelo
+        # replay do WAL. on_allocator_record recebe as operações do alocador.
+        # Com backend (ver sqlite_state), concessões, workers, resultados e
+        # medições ficam nele, compartilhados entre processos, e os demais
+        # argumentos de estado são ignorados. Com verify (ver verifier), os
+        # divisores declarados só entram no histórico depois de conferidos.
+        self.backend = backend
+        if backend is not None:
+            allocator = backend.allocator
+            self.workers = backend.workers
+            self.results = backend.results
+            self.results.on_append = on_divisors
+            self.rates = backend.rates
+        else:
+            if not isinstance(allocator, IntervalAllocator):
+                allocator = IntervalAllocator.from_dict(allocator, largest_prime_tested)
+            allocator.on_record = on_allocator_record
+            self.workers = WorkerRegistry()
+            self.workers.restore(workers or {})
+            self.results = ResultsLog(ResultsStore(results_path), divisors, on_append=on_divisors)
+            self.rates = WorkerRateTracker()
+            self.rates.restore(rates or {})
+        self.allocator = allocator
+        self.verifier = DivisorVerifier(verify, self._claim_verified) if verify is not None else None
+        largest_prime_tested = max(largest_prime_tested, allocator.frontier)
+        self.largest_prime_tested = largest_prime_tested
+        self.last_update = datetime.now()
+        self._on_progress = on_progress
+        self._progress_lock = metrics.TimedLock('progress')
+        # Com o índice de primos (ver prime_index), /status conta os primos
+        # testados abaixo da fronteira e a taxa na janela recente
+        self.prime_index = prime_index
+        self.search_limit = search_limit
+        self._frontier_samples = collections.deque([(time.time(), largest_prime_tested)])
+        # Versão do estado visível em /status; next() num itertools.count é
+        # atômico sob o GIL, então não precisa de trava
+        self._versions = itertools.count(1)
+        self._version = next(self._versions)
+
+    @property
+    def version(self):
+        # Com backend, mudanças gravadas por outros processos também contam
+        if self.backend is None:
+            return self._version
+        return self._version, self.backend.data_version()
+
+    def mark_changed(self):
+        self._version = next(self._versions)
+
+    def request_work(self, worker_id, ip=None, range_size=None, anonymous=False):
+        # Sem tamanho explícito, o intervalo é dimensionado pela vazão medida
+        # do worker. Intervalos vencidos são reentregues antes dos novos; em
+        # seguida, a metade de uma concessão atrasada que segura a fronteira.
+        # anonymous: worker_id gerado pelo servidor (ver worker_registry).
+        self.workers.touch(worker_id, ip, anonymous=anonymous)
+        if range_size is None:
+            range_size = self.rates.next_size(worker_id)
+        lease = self._steal(worker_id, range_size) or self.allocator.lease(worker_id, range_size)
+        LEASES_ISSUED.inc()
+        self.mark_changed()
+        return lease
+
+    def submit(self, worker_id, ip=None, divisors=None, start=None, end=None, lease_id=None):
+        # Registra divisores e conclui a concessão. Devolve a concessão
+        # concluída, None se o intervalo não foi entregue pelo alocador (ou
+        # teve divisores rejeitados) ou PENDING enquanto os divisores
+        # declarados aguardam a verificação. Só declarações de intervalos
+        # entregues ao worker entram na fila de verificação.
+        self.workers.touch(worker_id, create=False)
+        if divisors and self.verifier is not None:
+            if not self.allocator.completable(worker_id, start, end, lease_id):
+                return None
+            return self.verifier.submit(worker_id, ip, divisors, (start, end, lease_id))
+        if divisors:
+            self.results.add(divisors, worker_id, ip)
+
+        lease = self._complete(worker_id, [(start, end, lease_id)])[0]
+        self.mark_changed()
+        return lease
+
+    def request_work_batch(self, worker_id, count, ip=None, anonymous=False):
+        count = max(0, min(count, MAX_BATCH_LEASES))
+        self.workers.touch(worker_id, ip, anonymous=anonymous)
+        if not count:
+            return []
+        size = self.rates.next_size(worker_id)
+        stolen = self._steal(worker_id, size)
+        leases = [stolen] if stolen is not None else []
+        if count > len(leases):
+            leases += self.allocator.lease_many(worker_id, size, count - len(leases), stagger=self.rates.target_seconds)
+        LEASES_ISSUED.inc(len(leases))
+        self.mark_changed()
+        return leases
+
+    def submit_batch(self, worker_id, results, ip=None):
+        # results: [{'start', 'end', 'lease_id', 'divisors'}]. Concessões
+        # sem divisores declarados são concluídas com uma única aquisição da
+        # trava do alocador; as demais, como em submit. Sem verificação, todos
+        # os divisores entram num único registro.
+        self.workers.touch(worker_id, create=False)
+        leases = [None] * len(results)
+        plain = []
+        unverified = []
+        for i, result in enumerate(results):
+            item = (result.get('start'), result.get('end'), result.get('lease_id'))
+            divisors = result.get('divisors') or []
+            if divisors and self.verifier is not None:
+                if self.allocator.completable(worker_id, *item):
+                    leases[i] = self.verifier.submit(worker_id, ip, divisors, item)
+            else:
+                unverified.extend(divisors)
+                plain.append((i, item))
+        if unverified:
+            self.results.add(unverified, worker_id, ip)
+
+        completed = self._complete(worker_id, [item for _, item in plain])
+        for (i, _), lease in zip(plain, completed):
+            leases[i] = lease
+        self.mark_changed()
+        return leases
+
+    def heartbeat(self, worker_id, items, ip=None):
+        # items: [(lease_id, testado_até)], progresso dentro das concessões;
+        # devolve cada concessão atual (end encolhe se foi dividida) ou None
+        self.workers.touch(worker_id, ip, create=False)
+        return self.allocator.heartbeat(worker_id, items)
+
+    def throttled(self, worker_id, ip=None):
+        # Segundos restantes de bloqueio (do worker ou do IP) por divisores rejeitados
+        return self.verifier.throttled(worker_id, ip) if self.verifier is not None else 0
+
+    def verification_full(self):
+        return self.verifier is not None and self.verifier.full()
+
+    def release(self, lease_id):
+        # Devolve à fila de realocação uma concessão que não será concluída
+        released = self.allocator.release(lease_id)
+        if released:
+            LEASES_RELEASED.inc()
+            self.mark_changed()
+        return released
+
+    def expire_leases(self, now=None):
+        expired = self.allocator.expire(now)
+        if expired:
+            LEASES_EXPIRED.inc(len(expired))
+            self.mark_changed()
+        return expired
+
+    def reap_inactive(self, now=None):
+        # As concessões desses workers vencem no alocador e são reentregues
+        inactive = self.workers.reap(now)
+        for worker_id in inactive:
+            self.rates.forget(worker_id)
+        if inactive:
+            self.mark_changed()
+        return inactive
+
+    def status(self):
+        # Com backend, a fronteira pode ter avançado em outro processo
+        if self.backend is not None:
+            self._advance_progress()
+        return {
+            'largest_prime_tested': self.largest_prime_tested,
+            'active_workers': len(self.workers),
+            'divisors_found': len(self.results),
+            'last_update': self.last_update.isoformat(),
+            'work_ranges_active': self.allocator.active_count,
+            'allocator': self.allocator.stats(),
+            'recent_divisors': self.results.recent(5),
+            **self.verification_progress(),
+            **self.prime_progress()
+        }
+
+    def verification_progress(self):
+        if self.verifier is None:
+            return {}
+        stats = self.verifier.stats()
+        return {'divisors_pending': stats['pending'], 'divisors_rejected': stats['rejected']}
+
+    def prime_progress(self):
+        # Primos abaixo da fronteira, primos/s e primos até search_limit;
+        # None onde o índice ainda não chega
+        index = self.prime_index
+        if index is None:
+            return {}
+        with self._progress_lock:
+            frontier = self.largest_prime_tested
+            since, old_frontier = self._frontier_samples[0]
+        tested = index.prime_count(frontier - 1) if index.covers(frontier - 1) else None
+        rate = None
+        elapsed = time.time() - since
+        if tested is not None and elapsed > 0:
+            rate = (tested - index.prime_count(old_frontier - 1)) / elapsed
+        target = None
+        if self.search_limit is not None and index.covers(self.search_limit - 1):
+            target = index.prime_count(self.search_limit - 1)
+        return {
+            'primes_tested': tested,
+            'primes_per_second': rate,
+            'search_limit': self.search_limit,
+            'primes_to_search_limit': target
+        }
+
+    def snapshot_state(self):
+        # Estado persistido (ver apply_record), para compactação do WAL. Os
+        # divisores já estão no ResultsStore; o fsync dele vem antes de o
+        # snapshot substituir os segmentos do WAL que os continham. Registro
+        # e medições dos workers só existem no snapshot: a perda máxima é o
+        # intervalo entre snapshots; concessões e conclusões estão no WAL.
+        with self._progress_lock:
+            largest_prime_tested = self.largest_prime_tested
+        self.results.sync()
+        return {
+            'largest_prime_tested': largest_prime_tested,
+            'divisors': [],
+            'allocator': self.allocator.to_dict(),
+            'workers': self.workers.to_dict(),
+            'rates': self.rates.to_dict()
+        }
+
+    def _complete(self, worker_id, items):
+        # items: [(start, end, lease_id)]; devolve as concessões concluídas
+        if not items:
+            return []
+        leases = self.allocator.complete_many(worker_id, items)
+        completed = [lease for lease in leases if lease is not None]
+        LEASES_COMPLETED.inc(len(completed))
+        self.rates.record_completions(worker_id, completed)
+        self._advance_progress()
+        return leases
+
+    def _claim_verified(self, claim, verified, rejected):
+        # Resultado da verificação dos divisores de uma concessão (ver
+        # verifier): com algum rejeitado ou recusado, o intervalo volta para
+        # a fila
+        if verified:
+            self.results.add(verified, claim.worker_id, claim.ip)
+        start, end, lease_id = claim.lease
+        lease = None
+        if rejected or claim.refused:
+            for owned in self.allocator.leases_for(claim.worker_id):
+                if owned.lease_id == lease_id or (lease_id is None and owned.start == start and end in (owned.end, owned.reach)):
+                    self.release(owned.lease_id)
+                    break
+        else:
+            lease = self._complete(claim.worker_id, [claim.lease])[0]
+        self.mark_changed()
+        return lease
+
+    def _steal(self, worker_id, size):
+        lease = self.allocator.steal(worker_id, size)
+        if lease is not None:
+            LEASES_STOLEN.inc()
+            print(f"Concessão atrasada dividida: [{lease.start}, {lease.end}) entregue a {worker_id}")
+        return lease
+
+    def _advance_progress(self):
+        # A fronteira só avança sobre intervalos contíguos já concluídos
+        with self._progress_lock:
+            frontier = self.allocator.frontier
+            if frontier <= self.largest_prime_tested:
+                return False
+            self.largest_prime_tested = frontier
+            self.last_update = datetime.now()
+            now = time.time()
+            samples = self._frontier_samples
+            samples.append((now, frontier))
+            while len(samples) > 2 and samples[1][0] < now - PROGRESS_RATE_WINDOW:
+                samples.popleft()
+            if self._on_progress is not None:
+                self._on_progress(frontier)
+            return True
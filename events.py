@@ -0,0 +1,108 @@
+import collections
+import json
+import threading
+
+# Hub de Server-Sent Events compartilhado por todas as conexões de /events.
+#
+# Cada evento é serializado uma única vez e o mesmo objeto bytes é entregue a
+# todos os assinantes. Eventos "coalescíveis" (status) ocupam um único slot
+# por assinante: uma atualização nova substitui a anterior ainda não enviada.
+# Os demais (divisores) vão para uma fila limitada; um assinante que deixa a
+# fila transbordar é desconectado e o EventSource reconecta com Last-Event-ID.
+
+MAX_SUBSCRIBERS = 2000
+MAX_QUEUED_EVENTS = 256
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if not isinstance(data, (bytes, str)):
+        data = json.dumps(data, separators=(',', ':'))
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    lines.extend(f'data: {line}' for line in data.split('\n'))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class Subscriber:
+    __slots__ = ('latest', 'queue', 'overflowed', 'wakeup')
+
+    def __init__(self):
+        self.latest = {}  # evento coalescível -> último bloco serializado
+        self.queue = collections.deque()
+        self.overflowed = False
+        self.wakeup = threading.Event()
+
+    def next_chunks(self, timeout):
+        # Blocos pendentes, [] em timeout (keepalive) ou None se transbordou
+        self.wakeup.wait(timeout)
+        self.wakeup.clear()
+        if self.overflowed:
+            return None
+        chunks = []
+        while self.queue:
+            chunks.append(self.queue.popleft())
+        while self.latest:
+            chunks.append(self.latest.popitem()[1])
+        return chunks
+
+
+class EventHub:
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS, max_queued=MAX_QUEUED_EVENTS):
+        self.max_subscribers = max_subscribers
+        self.max_queued = max_queued
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber()
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None, coalesce=False):
+        chunk = format_event(event, data, event_id)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if coalesce:
+                subscriber.latest[event] = chunk
+            elif len(subscriber.queue) >= self.max_queued:
+                subscriber.overflowed = True
+                self.dropped += 1
+            else:
+                subscriber.queue.append(chunk)
+            subscriber.wakeup.set()
+        self.published += 1
+        return len(subscribers)
+
+    def stream(self, subscriber, initial=(), keepalive=KEEPALIVE_SECONDS):
+        # Gerador com o corpo da resposta text/event-stream
+        try:
+            yield f'retry: {RETRY_MILLISECONDS}\n\n'.encode('ascii')
+            yield from initial
+            while True:
+                chunks = subscriber.next_chunks(keepalive)
+                if chunks is None:
+                    return
+                if not chunks:
+                    yield b': keepalive\n\n'
+                    continue
+                yield b''.join(chunks)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def __len__(self):
+        return len(self._subscribers)
@@ -0,0 +1,189 @@
+import collections
+import threading
+import time
+
+import metrics
+from verifier import PENDING
+
+# Fila de ingestão dos resultados enviados em /submit_result e /submit_batch.
+#
+# A rota só valida o pedido, enfileira os intervalos concluídos e responde
+# 202; uma thread de fundo os aplica ao coordenador em lotes, agrupados por
+# worker (um submit_batch por grupo, com uma aquisição da trava do alocador).
+#
+#   - a fila é limitada a max_size intervalos; cheia, o pedido inteiro é
+#     recusado e a rota responde 503 com Retry-After;
+#   - cada intervalo tem uma chave de idempotência (worker_id, lease_id), ou
+#     (worker_id, start, end) sem lease_id; uma repetição da mesma chave,
+#     ainda na fila ou já aplicada, não é enfileirada de novo e devolve o
+#     estado conhecido. Repetições que escapem da deduplicação (chave já
+#     esquecida, outro processo do servidor) continuam inofensivas: a
+#     concessão já concluída é ignorada pelo coordenador;
+#   - um resultado aceito e ainda não aplicado se perde numa queda do
+#     servidor; a concessão vence e o intervalo é reentregue.
+
+INGEST_QUEUE_SIZE = 10_000  # intervalos aguardando aplicação
+INGEST_BATCH_SIZE = 500  # intervalos aplicados por passada da thread
+MAX_KNOWN_KEYS = 100_000  # chaves de idempotência lembradas (LRU)
+RETRY_AFTER_SECONDS = 1  # sugestão para o cliente com a fila cheia
+
+QUEUED = 'queued'  # estado de uma chave ainda na fila
+
+ACCEPTED = metrics.counter('npp_ingest_accepted_total', 'Intervalos aceitos na fila de ingestão')
+DUPLICATES = metrics.counter('npp_ingest_duplicates_total', 'Intervalos repetidos (chave de idempotência conhecida)')
+REFUSED = metrics.counter('npp_ingest_refused_total', 'Intervalos recusados com a fila cheia')
+APPLY_SECONDS = metrics.histogram('npp_ingest_apply_seconds', 'Duração da aplicação de um lote da fila')
+QUEUE_SECONDS = metrics.histogram('npp_ingest_queue_seconds', 'Espera de um intervalo na fila até ser aplicado')
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Fila de ingestão cheia; tente novamente em {retry_after}s')
+        self.retry_after = retry_after
+
+
+def outcome_label(outcome):
+    # Resultado de Coordinator.submit/submit_batch como estado da chave
+    if outcome is PENDING:
+        return PENDING
+    return 'success' if outcome is not None else 'ignored'
+
+
+def idempotency_key(worker_id, item):
+    # item: {'start', 'end', 'lease_id', 'divisors'}, como em submit_batch
+    if item.get('lease_id') is not None:
+        return (worker_id, item['lease_id'])
+    return (worker_id, item.get('start'), item.get('end'))
+
+
+class IngestQueue:
+    def __init__(self, apply_batch, max_size=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE):
+        # apply_batch(worker_id, items, ip) -> um resultado por item (o
+        # Coordinator.submit_batch: concessão, None ou PENDING), guardado
+        # como estado da chave (ver outcome_label)
+        self._apply_batch = apply_batch
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self._queue = collections.deque()  # (chave, worker_id, ip, item, instante)
+        self._keys = collections.OrderedDict()  # chave -> QUEUED ou outcome_label (LRU)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._applying = 0  # intervalos retirados da fila e ainda em aplicação
+        self.applied = 0
+        self.batches = 0
+
+    def offer(self, worker_id, ip, items):
+        # Enfileira os intervalos de um pedido; devolve, por item, a chave e o
+        # estado (QUEUED ou o resultado já conhecido de uma repetição).
+        # Levanta QueueFull, sem enfileirar nada, se não couberem todos.
+        keys = [idempotency_key(worker_id, item) for item in items]
+        now = time.perf_counter()
+        with self._lock:
+            fresh = []
+            seen = set()
+            for key, item in zip(keys, items):
+                if key not in self._keys and key not in seen:
+                    seen.add(key)
+                    fresh.append((key, item))
+            if len(self._queue) + len(fresh) > self.max_size:
+                REFUSED.inc(len(fresh))
+                raise QueueFull(RETRY_AFTER_SECONDS)
+            # Estados das repetições lidos antes de lembrar as chaves novas,
+            # que podem esquecer as mais antigas (inclusive deste pedido)
+            states = []
+            for key in keys:
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+                    states.append(self._keys[key])
+                else:
+                    states.append(QUEUED)
+            for key, item in fresh:
+                self._queue.append((key, worker_id, ip, item, now))
+                self._remember_locked(key, QUEUED)
+            if fresh:
+                self._ready.notify()
+        ACCEPTED.inc(len(fresh))
+        if len(fresh) < len(items):
+            DUPLICATES.inc(len(items) - len(fresh))
+        return list(zip(keys, states))
+
+    def apply_pending(self):
+        # Aplica um lote da fila; devolve o número de intervalos
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._applying += len(batch)
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        groups = {}  # (worker_id, ip) -> [entrada], na ordem de chegada
+        for entry in batch:
+            groups.setdefault((entry[1], entry[2]), []).append(entry)
+            QUEUE_SECONDS.observe(started - entry[4])
+        for (worker_id, ip), entries in groups.items():
+            try:
+                outcomes = self._apply_batch(worker_id, [entry[3] for entry in entries], ip)
+            except Exception as e:
+                # A chave é esquecida para que a repetição do cliente seja aceita
+                print(f"Erro ao aplicar {len(entries)} resultados de {worker_id}: {e}")
+                outcomes = None
+            with self._lock:
+                for i, entry in enumerate(entries):
+                    if outcomes is None:
+                        self._keys.pop(entry[0], None)
+                    elif entry[0] in self._keys:
+                        self._keys[entry[0]] = outcome_label(outcomes[i])
+        APPLY_SECONDS.observe(time.perf_counter() - started)
+        with self._lock:
+            self._applying -= len(batch)
+            self.applied += len(batch)
+            self.batches += 1
+            if not self._queue and not self._applying:
+                self._idle.notify_all()
+        return len(batch)
+
+    def run(self, stop=None):
+        # Laço da thread de ingestão: aplica enquanto houver fila
+        while not (stop is not None and stop.is_set()):
+            with self._lock:
+                if not self._queue:
+                    self._ready.wait(1)
+            while self.apply_pending():
+                pass
+
+    def drain(self, timeout=None):
+        # Espera a fila esvaziar (encerramento do servidor, benchmarks);
+        # devolve False se o prazo acabar antes
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._queue or self._applying:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def state(self, key):
+        # QUEUED, 'success', 'ignored', PENDING ou None (chave desconhecida)
+        with self._lock:
+            return self._keys.get(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._queue) + self._applying,
+                'max_size': self.max_size,
+                'applied': self.applied,
+                'batches': self.batches
+            }
+
+    def __len__(self):
+        return len(self._queue) + self._applying
+
+    def _remember_locked(self, key, state):
+        self._keys[key] = state
+        while len(self._keys) > MAX_KNOWN_KEYS:
+            oldest, oldest_state = next(iter(self._keys.items()))
+            if oldest_state == QUEUED:
+                break  # chaves na fila não são esquecidas
+            del self._keys[oldest]
@@ -0,0 +1,235 @@
+import bisect
+import functools
+import threading
+import time
+
+# Métricas no formato de texto do Prometheus, servidas em /metrics.
+#
+# Contadores e histogramas são somados por thread: cada thread escreve só na
+# sua célula (uma lista guardada em threading.local), sem trava no caminho
+# das requisições. A trava do registro só é usada quando uma thread escreve
+# pela primeira vez numa métrica e na coleta, que soma as células. Células de
+# threads encerradas (o servidor de desenvolvimento cria uma por requisição)
+# são incorporadas a um total acumulado, para que a lista não cresça sem fim.
+#
+# Gauges são funções lidas na coleta; None omite a amostra.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _PerThread:
+    def __init__(self, size):
+        self._size = size
+        self.local = threading.local()  # .cell: célula da thread atual
+        self._cells = []  # (thread, célula)
+        self._retired = [0] * size  # soma das células de threads encerradas
+        self._fold_at = 64
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self.local.cell
+        except AttributeError:
+            cell = self.local.cell = [0] * self._size
+            with self._lock:
+                self._cells.append((threading.current_thread(), cell))
+                if len(self._cells) >= self._fold_at:
+                    self._fold_locked()
+                    self._fold_at = 2 * len(self._cells) + 64
+            return cell
+
+    def totals(self):
+        with self._lock:
+            self._fold_locked()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                for i, value in enumerate(cell):
+                    totals[i] += value
+        return totals
+
+    def _fold_locked(self):
+        alive = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                alive.append((thread, cell))
+            else:
+                for i, value in enumerate(cell):
+                    self._retired[i] += value
+        self._cells = alive
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._cells = _PerThread(1)
+        self._local = self._cells.local
+
+    def inc(self, amount=1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cells.cell()[0] += amount
+
+    def samples(self):
+        yield self.name, self.labels, self._cells.totals()[0]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Célula: contagem por faixa (a última é +Inf) e a soma dos valores
+        self._cells = _PerThread(len(self.buckets) + 2)
+        self._local = self._cells.local
+
+    def observe(self, value):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def timed(self, function):
+        # Decorador: observa a duração de cada chamada, em segundos
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - started)
+        return wrapper
+
+    def samples(self):
+        totals = self._cells.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals):
+            cumulative += count
+            yield f'{self.name}_bucket', dict(self.labels, le=_format_value(bound)), cumulative
+        yield f'{self.name}_sum', self.labels, totals[-1]
+        yield f'{self.name}_count', self.labels, cumulative
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels, function):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.function = function
+
+    def samples(self):
+        value = self.function()
+        if value is not None:
+            yield self.name, self.labels, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}  # (nome, rótulos) -> métrica, na ordem de registro
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labels=None):
+        return self._register(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=None, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labels, buckets)
+
+    def gauge(self, name, help, function, labels=None):
+        # Uma nova função substitui a anterior (ex.: coordenador recriado)
+        gauge = self._register(Gauge, name, help, labels, function)
+        gauge.function = function
+        return gauge
+
+    def _register(self, cls, name, help, labels, *args):
+        # A mesma métrica (nome e rótulos) é compartilhada por quem a pedir
+        labels = dict(labels or {})
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, help, labels, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'Métrica {name} já registrada como {metric.kind}')
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        described = set()
+        for metric in sorted(metrics, key=lambda m: m.name):
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+gauge = REGISTRY.gauge
+
+
+class TimedLock:
+    # threading.Lock que soma o tempo de espera quando há disputa; a
+    # aquisição sem disputa não mede nada
+    def __init__(self, name):
+        labels = {'lock': name}
+        self._lock = threading.Lock()
+        self._wait = counter('npp_lock_wait_seconds_total', 'Tempo de espera por travas disputadas', labels)
+        self._contended = counter('npp_lock_contended_total', 'Aquisições de trava que precisaram esperar', labels)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        started = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        self._wait.inc(time.perf_counter() - started)
+        self._contended.inc()
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        if not self._lock.acquire(False):
+            self.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
@@ -0,0 +1,180 @@
+import glob
+import gzip
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from product_tree import digits_to_int
+from wal import write_atomic
+
+try:
+    import gmpy2
+except ImportError:  # gmpy2 é opcional: sem ele a conversão usa digits_to_int
+    gmpy2 = None
+
+# Cache binário do número NPP.
+#
+# Converter os 44+ milhões de dígitos de NPP.txt num int leva minutos, então
+# a conversão é feita uma única vez (divisão e conquista, ver digits_to_int)
+# e o resultado vai para NPP.bin: um cabeçalho com tamanho, mtime e hash do
+# NPP.txt de origem, seguido dos limbs de 64 bits do número em little-endian.
+# Nas inicializações seguintes o arquivo só é mapeado em memória.
+#
+# O cache é válido enquanto tamanho e mtime do NPP.txt baterem com o
+# cabeçalho; se só o mtime mudou (arquivo copiado, touch), o hash do
+# conteúdo decide e, sendo igual, apenas o cabeçalho é regravado.
+#
+# Para download pelos navegadores, os limbs também são comprimidos com gzip
+# na geração do cache (NPP.bin.<hash>.gz), se isso reduzir o tamanho.
+
+CACHE_MAGIC = b'NPPLIMB1'
+CACHE_HEADER = struct.Struct('<8sQqQQ32s')  # magic, tamanho, mtime_ns, dígitos, bytes, blake2b
+CACHE_HEADER_SIZE = 128  # os limbs começam alinhados
+HASH_CHUNK_BYTES = 1 << 24
+
+_WHITESPACE = b' \t\r\n'
+
+
+def source_hash(path):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _source_info(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pack_header(size, mtime_ns, digits, byte_length, content_hash):
+    header = CACHE_HEADER.pack(CACHE_MAGIC, size, mtime_ns, digits, byte_length, content_hash)
+    return header.ljust(CACHE_HEADER_SIZE, b'\0')
+
+
+def _read_header(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(CACHE_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(data) < CACHE_HEADER.size:
+        return None
+    magic, size, mtime_ns, digits, byte_length, content_hash = CACHE_HEADER.unpack(data)
+    if magic != CACHE_MAGIC:
+        return None
+    if os.path.getsize(path) != CACHE_HEADER_SIZE + byte_length:
+        return None
+    return size, mtime_ns, digits, byte_length, content_hash
+
+
+def parse_digits(path):
+    # int do número em path (só dígitos, espaços nas pontas ignorados)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, end = 0, len(mm)
+        while start < end and mm[start] in _WHITESPACE:
+            start += 1
+        while end > start and mm[end - 1] in _WHITESPACE:
+            end -= 1
+        if end == start:
+            raise ValueError('Arquivo NPP sem dígitos')
+        digits = np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+        invalid = ((digits < 48) | (digits > 57)).any()
+        del digits
+        if invalid:
+            raise ValueError('Arquivo NPP contém caracteres que não são dígitos')
+        if gmpy2 is not None:
+            return int(gmpy2.mpz(mm[start:end].decode('ascii'))), end - start
+        with memoryview(mm) as view:
+            return digits_to_int(view[start:end]), end - start
+
+
+def build_cache(source_path, cache_path):
+    size, mtime_ns = _source_info(source_path)
+    content_hash = source_hash(source_path)
+    value, digits = parse_digits(source_path)
+    byte_length = -(-max(1, value.bit_length()) // 64) * 8
+    payload = value.to_bytes(byte_length, 'little')
+    del value
+    write_atomic(cache_path, _pack_header(size, mtime_ns, digits, byte_length, content_hash) + payload)
+
+    for stale in glob.glob(f'{glob.escape(cache_path)}.*.gz'):
+        os.remove(stale)
+    compressed = gzip.compress(payload, compresslevel=9, mtime=0)
+    if len(compressed) < len(payload):
+        write_atomic(compressed_path(cache_path, content_hash.hex()), compressed)
+
+
+def compressed_path(cache_path, content_hash):
+    return f'{cache_path}.{content_hash[:16]}.gz'
+
+
+def cache_is_current(source_path, cache_path):
+    # True se o cache corresponde ao NPP.txt atual (ver comentário acima)
+    header = _read_header(cache_path)
+    if header is None:
+        return False
+    size, mtime_ns = _source_info(source_path)
+    cached_size, cached_mtime, digits, byte_length, content_hash = header
+    if (size, mtime_ns) == (cached_size, cached_mtime):
+        return True
+    if size != cached_size or source_hash(source_path) != content_hash:
+        return False
+    with open(cache_path, 'r+b') as f:
+        f.write(_pack_header(size, mtime_ns, digits, byte_length, content_hash))
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+class NPPNumber:
+    # Número NPP mapeado a partir do cache: limbs sem cópia e o int sob demanda
+    def __init__(self, cache_path):
+        header = _read_header(cache_path)
+        if header is None:
+            raise ValueError(f'Cache inválido: {cache_path}')
+        _, _, self.digits, self.byte_length, content_hash = header
+        self.path = cache_path
+        self.content_hash = content_hash.hex()
+        self._file = open(cache_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._value = None
+        self._compressed = None
+        gz_path = compressed_path(cache_path, self.content_hash)
+        if os.path.exists(gz_path):
+            with open(gz_path, 'rb') as f:
+                self._compressed = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def data(self):
+        # Bytes do número, little-endian (memoryview sobre o mmap)
+        return memoryview(self._mm)[CACHE_HEADER_SIZE:]
+
+    @property
+    def compressed(self):
+        # Os mesmos bytes comprimidos com gzip, ou None
+        return memoryview(self._compressed) if self._compressed is not None else None
+
+    @property
+    def limbs(self):
+        return np.frombuffer(self._mm, dtype='<u8', offset=CACHE_HEADER_SIZE)
+
+    def value(self):
+        if self._value is None:
+            self._value = int.from_bytes(self.data, 'little')
+        return self._value
+
+
+def load_npp_number(source_path, cache_path):
+    # NPPNumber do cache, reconstruído antes se NPP.txt mudou. Devolve
+    # (número, segundos gastos na conversão ou None se o cache foi usado).
+    if cache_is_current(source_path, cache_path):
+        return NPPNumber(cache_path), None
+    started = time.perf_counter()
+    build_cache(source_path, cache_path)
+    return NPPNumber(cache_path), time.perf_counter() - started
@@ -0,0 +1,216 @@
+import math
+import mmap
+import time
+
+import numpy as np
+
+from product_tree import gcd_divisors, mod_bytes, mod_digits, product_tree, remainder_tree
+
+# Motor de resíduos N mod p para o número NPP.
+#
+# O arquivo NPP.txt (44+ milhões de dígitos) é mapeado em memória e lido em
+# blocos grandes. Os dígitos são agrupados em "blocos" de k dígitos e os
+# blocos em grupos de m; para cada grupo o valor mod p é calculado de uma vez
+# para todos os primos (matriz de potências B^j mod p) e combinado ao resíduo
+# acumulado com Horner: r = r * B^m + grupo (mod p).
+
+DEFAULT_CHUNK_DIGITS = 1 << 22  # dígitos lidos do mmap por iteração
+MAX_PRIMES_PER_CALL = 100000
+MAX_VECTOR_PRIME_BITS = 44  # acima disso os primos seguem pelo caminho em Python puro
+
+_WHITESPACE = b' \t\r\n'
+
+
+def _group_shape(pbits):
+    # Escolhe m (blocos por grupo) e k (dígitos por bloco) tais que a soma de
+    # m termos d * B^j, com d < 10**k e B^j < p, caiba em uint64.
+    log2_m = min(6, max(1, (64 - pbits) // 4))
+    k = max(1, min(18, int((64 - pbits - log2_m) * math.log10(2))))
+    return 1 << log2_m, k
+
+
+def _mulmod(a, b, p, pbits):
+    # a * b mod p para vetores uint64 com a, b < p < 2**pbits, sem estouro:
+    # a é quebrado em fatias de (63 - pbits) bits e combinado via Horner.
+    shift = 63 - pbits
+    if shift >= pbits:
+        return (a * b) % p
+    mask = np.uint64((1 << shift) - 1)
+    ushift = np.uint64(shift)
+    chunks = -(-pbits // shift)
+    acc = np.zeros_like(a)
+    for j in range(chunks - 1, -1, -1):
+        part = (a >> np.uint64(j * shift)) & mask
+        acc = ((acc << ushift) % p + part * b) % p
+    return acc
+
+
+def _digit_span(mm):
+    start, end = 0, len(mm)
+    while start < end and mm[start] in _WHITESPACE:
+        start += 1
+    while end > start and mm[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
+
+
+class NPPResidueEngine:
+    def __init__(self, path, chunk_digits=DEFAULT_CHUNK_DIGITS, number=None):
+        self.path = path
+        self.chunk_digits = chunk_digits
+        # NPPNumber do cache binário (npp_cache); enquanto não existe, as
+        # reduções por produto varrem os dígitos do NPP.txt
+        self.number = number
+        self.last_scan = None
+
+    def digit_count(self):
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = _digit_span(mm)
+            return end - start
+
+    def residues(self, primes):
+        primes = [int(p) for p in primes]
+        if not primes:
+            return {}
+        if len(primes) > MAX_PRIMES_PER_CALL:
+            raise ValueError(f'Máximo de {MAX_PRIMES_PER_CALL} primos por chamada')
+        if min(primes) < 2:
+            raise ValueError('Todos os módulos devem ser >= 2')
+
+        unique = sorted(set(primes))
+        limit = 1 << MAX_VECTOR_PRIME_BITS
+        small = [p for p in unique if p < limit]
+        large = [p for p in unique if p >= limit]
+
+        started = time.perf_counter()
+        result = {}
+        digits = 0
+        if small:
+            values, digits = self._scan_vector(small)
+            result.update(zip(small, values))
+        for p in large:
+            result[p], digits = self._scan_python(p)
+        elapsed = time.perf_counter() - started
+
+        self.last_scan = {
+            'primes': len(unique),
+            'digits': digits,
+            'seconds': elapsed,
+            'primes_per_sec': len(unique) / elapsed if elapsed else 0.0,
+            'mb_per_sec': digits * ((1 if small else 0) + len(large)) / elapsed / 1e6 if elapsed else 0.0,
+        }
+        return {p: result[p] for p in primes}
+
+    def divisors(self, primes):
+        return [p for p, r in self.residues(primes).items() if r == 0]
+
+    def product_residues(self, primes):
+        # Mesmo resultado de residues(), por árvore de produto + árvore de
+        # restos: N é varrido uma única vez, reduzido pelo produto dos primos
+        primes = self._check_moduli(primes)
+        levels = product_tree(sorted(set(primes)))
+        residues = dict(zip(levels[0], remainder_tree(self._mod_product(levels, 'tree'), levels)))
+        return {p: residues[p] for p in primes}
+
+    def product_divisors(self, primes):
+        # Primos que dividem N com um único gcd(N mod P, P). Os módulos devem
+        # ser primos distintos (ou ao menos coprimos dois a dois).
+        primes = sorted(set(self._check_moduli(primes)))
+        levels = product_tree(primes)
+        return gcd_divisors(self._mod_product(levels, 'gcd'), primes, levels[-1][0])
+
+    def _check_moduli(self, primes):
+        primes = [int(p) for p in primes]
+        if primes and min(primes) < 2:
+            raise ValueError('Todos os módulos devem ser >= 2')
+        return primes
+
+    def _mod_product(self, levels, mode):
+        if not levels[0]:
+            return 0
+        product = levels[-1][0]
+        started = time.perf_counter()
+        number = self.number
+        if number is not None:
+            value = mod_bytes(number.data, product)
+            digits = number.digits
+        else:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, end = _digit_span(mm)
+                if end == start:
+                    raise ValueError('Arquivo NPP sem dígitos')
+                with memoryview(mm) as view:
+                    value = mod_digits(view[start:end], product)
+            digits = end - start
+        elapsed = time.perf_counter() - started
+        self.last_scan = {
+            'mode': mode,
+            'source': 'binary' if number is not None else 'digits',
+            'primes': len(levels[0]),
+            'digits': digits,
+            'product_bits': product.bit_length(),
+            'seconds': elapsed,
+            'primes_per_sec': len(levels[0]) / elapsed if elapsed else 0.0,
+            'mb_per_sec': digits / elapsed / 1e6 if elapsed else 0.0,
+        }
+        return value
+
+    def _scan_vector(self, primes):
+        P = np.array(primes, dtype=np.uint64)
+        pbits = max(int(P.max()).bit_length(), 1)
+        m, k = _group_shape(pbits)
+        group = k * m
+
+        # POW[i] = B^(m-1-i) mod p, B = 10^k
+        base = np.uint64(10 ** k) % P
+        pow_matrix = np.empty((m, len(primes)), dtype=np.uint64)
+        pow_matrix[m - 1] = np.uint64(1) % P
+        for i in range(m - 2, -1, -1):
+            pow_matrix[i] = _mulmod(pow_matrix[i + 1], base, P, pbits)
+        base_m = _mulmod(pow_matrix[0], base, P, pbits)
+        weights = np.array([10 ** (k - 1 - i) for i in range(k)], dtype=np.uint64)
+
+        chunk = max(group, (self.chunk_digits // group) * group)
+        r = np.zeros(len(primes), dtype=np.uint64)
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = _digit_span(mm)
+            total = end - start
+            if total == 0:
+                raise ValueError('Arquivo NPP sem dígitos')
+
+            # Zeros à esquerda não alteram o valor: completam o primeiro grupo.
+            pad = (-total) % group
+            offset = start
+            while offset < end:
+                take = min(chunk - pad, end - offset)
+                raw = np.frombuffer(mm, dtype=np.uint8, count=take, offset=offset)
+                digits = raw - np.uint8(48)
+                del raw
+                if pad:
+                    digits = np.concatenate([np.zeros(pad, dtype=np.uint8), digits])
+                    pad = 0
+                if (digits > 9).any():
+                    raise ValueError('Arquivo NPP contém caracteres que não são dígitos')
+                blocks = (digits.reshape(-1, k).astype(np.uint64) * weights).sum(axis=1)
+                del digits
+                # Uma linha por grupo: soma de m termos d * B^j mod p, sem estouro.
+                sums = (blocks.reshape(-1, m) @ pow_matrix) % P
+                for s in sums:
+                    r = (_mulmod(r, base_m, P, pbits) + s) % P
+                offset += take
+
+        return [int(x) for x in r], total
+
+    def _scan_python(self, p):
+        # Caminho lento para módulos grandes demais para uint64.
+        step = 4000  # abaixo do limite de conversão int/str do CPython
+        factor = pow(10, step, p)
+        r = 0
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = _digit_span(mm)
+            head = (end - start) % step or step
+            r = int(mm[start:start + head]) % p
+            for offset in range(start + head, end, step):
+                r = (r * factor + int(mm[offset:offset + step])) % p
+        return r, end - start
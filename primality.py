@@ -0,0 +1,127 @@
+import math
+
+from sieve import SIEVE_LIMIT, iter_primes, sieve_segment
+
+# Testes de primalidade pontuais (um número, ou os próximos k primos).
+#
+# Intervalos inteiros são atendidos pelo crivo segmentado (ver sieve). Para
+# consultas isoladas, em vez da divisão por tentativa até sqrt(n):
+#
+#   1. n abaixo de SMALL_PRIME_LIMIT: consulta a uma tabela de primos em cache;
+#   2. roda de 30: só 8 restos módulo 30 podem ser primos;
+#   3. um gcd com o produto dos primos pequenos elimina a maioria dos compostos;
+#   4. Miller-Rabin com conjuntos de bases conhecidos, determinístico para
+#      n < 2**64 (e até 3.3e24 com as 13 primeiras bases primas). Acima disso
+#      o resultado é "provável primo".
+
+SMALL_PRIME_LIMIT = 1 << 16
+TRIAL_PRIME_LIMIT = 256  # primos do gcd do passo 3
+SIEVE_MIN_COUNT = 16  # next_primes usa o crivo (até SIEVE_LIMIT) a partir deste número de primos
+
+# Posição i: 1 se 2*i + 1 é primo
+_SMALL_ODD_FLAGS = sieve_segment(1, SMALL_PRIME_LIMIT // 2).tobytes()
+_SMALL_PRIMES = [2] + [2 * i + 1 for i, flag in enumerate(_SMALL_ODD_FLAGS) if flag]
+_TRIAL_PRODUCT = math.prod(p for p in _SMALL_PRIMES if 7 <= p < TRIAL_PRIME_LIMIT)
+
+_WHEEL = 30
+_COPRIME_30 = bytes(math.gcd(r, _WHEEL) == 1 for r in range(_WHEEL))
+# Distância de r até o próximo resto coprimo com 30 (estritamente maior)
+_WHEEL_STEP = bytes(
+    next(d for d in range(1, _WHEEL + 1) if _COPRIME_30[(r + d) % _WHEEL]) for r in range(_WHEEL)
+)
+
+# (limite, bases): Miller-Rabin com essas bases é exato para n < limite
+_WITNESSES = [
+    (1_373_653, (2, 3)),
+    (25_326_001, (2, 3, 5)),
+    (3_215_031_751, (2, 3, 5, 7)),
+    (2_152_302_898_747, (2, 3, 5, 7, 11)),
+    (3_474_749_660_383, (2, 3, 5, 7, 11, 13)),
+    (341_550_071_728_321, (2, 3, 5, 7, 11, 13, 17)),
+    (1 << 64, (2, 325, 9375, 28178, 450775, 9780504, 1795265022)),
+    (318_665_857_834_031_151_167_461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3_317_044_064_679_887_385_961_981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
+_LARGE_WITNESSES = tuple(_SMALL_PRIMES[:20])  # acima de 3.3e24: provável primo
+
+
+def _witnesses(n):
+    for limit, bases in _WITNESSES:
+        if n < limit:
+            return bases
+    return _LARGE_WITNESSES
+
+
+def _miller_rabin(n):
+    # n ímpar, sem fatores primos pequenos
+    d = n - 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+    for a in _witnesses(n):
+        a %= n
+        if a == 0:
+            continue
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _is_prime_large(n):
+    # n >= SMALL_PRIME_LIMIT, já coprimo com 30
+    return math.gcd(n, _TRIAL_PRODUCT) == 1 and _miller_rabin(n)
+
+
+def is_prime(n):
+    if n < SMALL_PRIME_LIMIT:
+        if n < 3:
+            return n == 2
+        return n & 1 == 1 and _SMALL_ODD_FLAGS[n >> 1] == 1
+    return _COPRIME_30[n % _WHEEL] == 1 and _is_prime_large(n)
+
+
+def next_prime(n):
+    # Menor primo maior que n
+    if n < 2:
+        return 2
+    if n < SMALL_PRIME_LIMIT - 1:
+        candidate = n + 1
+        while not is_prime(candidate):
+            candidate += 1
+        if candidate < SMALL_PRIME_LIMIT:
+            return candidate
+        n = candidate - 1
+    # Só os candidatos coprimos com 30 são testados
+    candidate = n + _WHEEL_STEP[n % _WHEEL]
+    while not _is_prime_large(candidate):
+        candidate += _WHEEL_STEP[candidate % _WHEEL]
+    return candidate
+
+
+def next_primes(start, k):
+    # Os k primos seguintes a start (maiores que start), em ordem. Pedidos
+    # grandes abaixo de SIEVE_LIMIT usam o crivo segmentado, em janelas do
+    # tamanho esperado pelo teorema dos números primos.
+    primes = []
+    if k >= SIEVE_MIN_COUNT:
+        low = start + 1
+        while len(primes) < k:
+            width = max(4096, int((k - len(primes)) * math.log(low + 2) * 1.1))
+            if low + width > SIEVE_LIMIT:
+                break
+            for p in iter_primes(low, low + width):
+                primes.append(p)
+                if len(primes) == k:
+                    return primes
+            low += width
+        start = low - 1
+    while len(primes) < k:
+        start = next_prime(start)
+        primes.append(start)
+    return primes
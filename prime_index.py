@@ -0,0 +1,189 @@
+import contextlib
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from primality import is_prime as _is_prime, next_prime as _next_prime
+from sieve import sieve_segment
+
+# Índice persistente de primos, mapeado em memória.
+#
+# primes.idx guarda um bit por ímpar (o bit i corresponde a 2*i + 1, em ordem
+# little-endian, como em sieve.segment_bitmap), após um cabeçalho de 64 bytes.
+# primes.idx.counts guarda, para cada bloco de BLOCK_ODDS ímpares, quantos
+# primos ímpares existem até o fim do bloco (uint64 little-endian). Com isso,
+# pi(x) é um checkpoint mais a contagem de bits de no máximo um bloco, e
+# next_prime/prev_prime leem só os bits vizinhos.
+#
+# O índice cresce em blocos inteiros, pelo crivo segmentado. Os bits de cada
+# trecho são gravados (com fsync) antes dos checkpoints, de modo que um
+# checkpoint no disco sempre cobre bits já gravados; na abertura, o excesso
+# de um crescimento interrompido é descartado. Fora da faixa coberta,
+# is_prime e next_prime/prev_prime recorrem a primality.
+#
+# Vários processos do servidor podem abrir o mesmo índice: abertura e
+# crescimento seguram uma trava de arquivo (primes.idx.lock), e quem cresce
+# parte do que já estiver no disco.
+
+INDEX_MAGIC = b'NPPPRIM1'
+INDEX_HEADER = struct.Struct('<8sQ')  # magic, ímpares por bloco
+INDEX_HEADER_SIZE = 64
+BLOCK_ODDS = 4096  # ímpares por checkpoint (512 bytes de bits)
+BLOCK_BYTES = BLOCK_ODDS // 8
+EXTEND_ODDS = 1 << 24  # ímpares crivados por passo de crescimento (~32M números)
+SCAN_BYTES = 64  # bytes lidos por vez na busca do primo vizinho
+
+
+class PrimeIndex:
+    def __init__(self, path):
+        self.path = path
+        self.counts_path = f'{path}.counts'
+        self.lock_path = f'{path}.lock'
+        self._lock = threading.Lock()  # um crescimento por vez
+        with self._file_lock():
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(INDEX_HEADER.pack(INDEX_MAGIC, BLOCK_ODDS).ljust(INDEX_HEADER_SIZE, b'\0'))
+                open(self.counts_path, 'wb').close()
+            with open(path, 'rb') as f:
+                magic, block_odds = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC or block_odds != BLOCK_ODDS:
+                raise ValueError(f'Índice de primos inválido: {path}')
+            self._reload(truncate=True)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield  # a trava é liberada ao fechar o arquivo
+
+    def _reload(self, truncate=False):
+        # Só blocos com bits e checkpoint gravados; com a trava de arquivo,
+        # o excesso é de um crescimento interrompido e pode ser descartado
+        bit_blocks = (os.path.getsize(self.path) - INDEX_HEADER_SIZE) // BLOCK_BYTES
+        count_blocks = os.path.getsize(self.counts_path) // 8
+        blocks = min(bit_blocks, count_blocks)
+        if truncate:
+            os.truncate(self.path, INDEX_HEADER_SIZE + blocks * BLOCK_BYTES)
+            os.truncate(self.counts_path, blocks * 8)
+        self._publish(np.fromfile(self.counts_path, dtype='<u8', count=blocks))
+
+    def _publish(self, counts):
+        # Troca a visão usada pelas consultas: (bits, checkpoints, limite)
+        with open(self.path, 'rb') as f:
+            bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = (bits, counts, 2 * len(counts) * BLOCK_ODDS)
+
+    @property
+    def limit(self):
+        # Números menores que limit estão cobertos
+        return self._view[2]
+
+    def extend(self, limit, step_odds=EXTEND_ODDS, stop=None):
+        # Cresce até cobrir os números menores que limit
+        if self.limit >= limit:
+            return
+        with self._lock, self._file_lock():
+            self._reload(truncate=True)  # outro processo pode ter crescido o índice
+            while self.limit < limit and not (stop is not None and stop.is_set()):
+                _, counts, covered = self._view
+                first_odd = covered + 1
+                count = min(step_odds, -(-(limit - covered) // 2))
+                count = -(-count // BLOCK_ODDS) * BLOCK_ODDS
+                flags = sieve_segment(first_odd, count)
+                previous = int(counts[-1]) if len(counts) else 0
+                block_counts = flags.reshape(-1, BLOCK_ODDS).sum(axis=1, dtype=np.uint64).cumsum() + np.uint64(previous)
+                with open(self.path, 'ab') as f:
+                    f.write(np.packbits(flags, bitorder='little').tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self.counts_path, 'ab') as f:
+                    f.write(block_counts.astype('<u8').tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._publish(np.concatenate([counts, block_counts]))
+
+    def covers(self, n):
+        return n < self.limit
+
+    def is_prime(self, n):
+        bits, _, limit = self._view
+        if n >= limit:
+            return _is_prime(n)
+        if n < 3:
+            return n == 2
+        i = n >> 1
+        return n & 1 == 1 and bits[INDEX_HEADER_SIZE + (i >> 3)] >> (i & 7) & 1 == 1
+
+    def prime_count(self, x):
+        # pi(x): quantidade de primos <= x
+        bits, counts, limit = self._view
+        if x >= limit:
+            raise ValueError(f'{x} está além do índice de primos (até {limit})')
+        if x < 2:
+            return 0
+        i = (x - 1) >> 1  # último ímpar <= x
+        block = i // BLOCK_ODDS
+        before = int(counts[block - 1]) if block else 0
+        start = INDEX_HEADER_SIZE + block * BLOCK_BYTES
+        offset = i - block * BLOCK_ODDS
+        word = int.from_bytes(bits[start:start + (offset >> 3) + 1], 'little')
+        return 1 + before + (word & ((2 << offset) - 1)).bit_count()
+
+    def next_prime(self, n):
+        # Menor primo maior que n
+        bits, _, limit = self._view
+        if n < 2:
+            return 2
+        i = (n + 1) >> 1  # primeiro ímpar > n
+        end = (limit >> 1) - 1
+        while i <= end:
+            start = INDEX_HEADER_SIZE + (i >> 3)
+            stop = min(start + SCAN_BYTES, INDEX_HEADER_SIZE + (end >> 3) + 1)
+            word = int.from_bytes(bits[start:stop], 'little') >> (i & 7)
+            if word:
+                return 2 * (i + ((word & -word).bit_length() - 1)) + 1
+            i = ((stop - INDEX_HEADER_SIZE) << 3)
+        return _next_prime(max(n, limit - 1))
+
+    def prev_prime(self, n):
+        # Maior primo menor que n, ou None
+        bits, _, limit = self._view
+        if n <= 2:
+            return None
+        if n == 3:
+            return 2
+        if n > limit:
+            candidate = n - 1
+            while candidate >= limit:
+                if _is_prime(candidate):
+                    return candidate
+                candidate -= 1
+            n = limit
+        i = (n - 2) >> 1  # último ímpar < n
+        while i >= 0:
+            stop = INDEX_HEADER_SIZE + (i >> 3) + 1
+            start = max(INDEX_HEADER_SIZE, stop - SCAN_BYTES)
+            shift = ((stop - INDEX_HEADER_SIZE) << 3) - 1 - i
+            word = int.from_bytes(bits[start:stop], 'little') & ((1 << (((stop - start) << 3) - shift)) - 1)
+            if word:
+                return 2 * (((start - INDEX_HEADER_SIZE) << 3) + word.bit_length() - 1) + 1
+            i = ((start - INDEX_HEADER_SIZE) << 3) - 1
+        return 2
+
+    def next_primes(self, start, k):
+        # Os k primos seguintes a start
+        primes = []
+        for _ in range(k):
+            start = self.next_prime(start)
+            primes.append(start)
+        return primes
@@ -0,0 +1,126 @@
+import math
+
+# Divisão por tentativa em lote com árvores de produto e de restos.
+#
+# Em vez de reduzir N por cada primo, os primos de um intervalo são
+# multiplicados numa árvore de produto; N é reduzido uma única vez pelo
+# produto P da raiz e os resíduos individuais descem pela árvore de restos
+# (r_filho = r_pai mod produto_filho). No modo gcd nem isso: os primos que
+# dividem N são exatamente os que dividem gcd(N mod P, P).
+#
+# A divisão de inteiros do CPython é quadrática, então N mod P é calculado
+# por Horner sobre blocos de dígitos do tamanho de P, com redução de Barrett
+# (duas multiplicações, que usam Karatsuba) no lugar de cada divisão.
+
+INT_DIGITS_LEAF = 4000  # abaixo do limite de conversão int/str do CPython (4300)
+SMALL_MODULUS_BLOCK_BYTES = 2048  # bloco mínimo na redução de N em binário
+
+_POW10 = {}
+
+
+def _pow10(exponent):
+    value = _POW10.get(exponent)
+    if value is None:
+        value = _POW10[exponent] = 10 ** exponent
+    return value
+
+
+def digits_to_int(digits):
+    # Converte dígitos ASCII (bytes ou memoryview) em int por divisão e
+    # conquista: as folhas têm até INT_DIGITS_LEAF dígitos e as metades são
+    # combinadas com potências de 10 em cache, sem passar pelo int(str)
+    # quadrático (e limitado a 4300 dígitos).
+    if len(digits) <= INT_DIGITS_LEAF:
+        return int(bytes(digits)) if len(digits) else 0
+    # A metade baixa tem um número de folhas potência de 2, para reaproveitar
+    # as potências de 10
+    leaves = -(-len(digits) // INT_DIGITS_LEAF)
+    low_size = INT_DIGITS_LEAF << ((leaves - 1).bit_length() - 1)
+    high = digits_to_int(digits[:-low_size])
+    return high * _pow10(low_size) + digits_to_int(digits[-low_size:])
+
+
+def product_tree(values):
+    # Níveis da árvore, das folhas (values) até a raiz ([produto de todos])
+    levels = [list(values)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i]
+                       for i in range(0, len(level), 2)])
+    return levels
+
+
+def remainder_tree(value, levels):
+    # value mod cada folha, descendo a partir de value mod raiz
+    remainders = [value % levels[-1][0]]
+    for level in reversed(levels[:-1]):
+        remainders = [remainders[i // 2] % m for i, m in enumerate(level)]
+    return remainders
+
+
+class BarrettReducer:
+    # x mod m para x < 2**(2k), k = m.bit_length(), com duas multiplicações
+    def __init__(self, modulus):
+        self.modulus = modulus
+        self.bits = modulus.bit_length()
+        self.mu = (1 << (2 * self.bits)) // modulus
+
+    def reduce(self, x):
+        q = ((x >> (self.bits - 1)) * self.mu) >> (self.bits + 1)
+        r = x - q * self.modulus
+        while r >= self.modulus:
+            r -= self.modulus
+        return r
+
+
+def mod_digits(digits, modulus):
+    # Valor dos dígitos ASCII (bytes ou memoryview) mod modulus, por Horner
+    # sobre blocos com 10**bloco < modulus, de modo que cada passo fique
+    # abaixo de 2**(2k) e caiba numa redução de Barrett.
+    # Módulos pequenos usam blocos de INT_DIGITS_LEAF dígitos e o % comum,
+    # cujo custo com um divisor de poucos dígitos é linear no dividendo.
+    if modulus < 2:
+        raise ValueError('O módulo deve ser >= 2')
+    block = int((modulus.bit_length() - 1) * math.log10(2))
+    if block > INT_DIGITS_LEAF:
+        reduce = BarrettReducer(modulus).reduce
+    else:
+        block = INT_DIGITS_LEAF
+        reduce = modulus.__rmod__
+    factor = 10 ** block
+    total = len(digits)
+    head = total % block or block
+    r = digits_to_int(digits[:head]) % modulus
+    for offset in range(head, total, block):
+        r = reduce(r * factor + digits_to_int(digits[offset:offset + block]))
+    return r
+
+
+def mod_bytes(data, modulus):
+    # Valor de um inteiro em bytes little-endian (bytes ou memoryview) mod
+    # modulus; mesmo esquema de mod_digits, com blocos de bytes no lugar de
+    # dígitos (sem conversão decimal, cada bloco sai em tempo linear).
+    if modulus < 2:
+        raise ValueError('O módulo deve ser >= 2')
+    block = (modulus.bit_length() - 1) // 8
+    if block > SMALL_MODULUS_BLOCK_BYTES:
+        reduce = BarrettReducer(modulus).reduce
+    else:
+        block = SMALL_MODULUS_BLOCK_BYTES
+        reduce = modulus.__rmod__
+    shift = 8 * block
+    offset = len(data) - (len(data) % block or block)
+    r = int.from_bytes(data[offset:], 'little') % modulus
+    while offset > 0:
+        offset -= block
+        r = reduce((r << shift) | int.from_bytes(data[offset:offset + block], 'little'))
+    return r
+
+
+def gcd_divisors(value_mod_product, primes, product):
+    # Primos (distintos) que dividem N, a partir de N mod P: um único gcd e,
+    # só quando ele não é 1, a separação dos primos que o dividem
+    g = math.gcd(value_mod_product, product)
+    if g == 1:
+        return []
+    return [p for p in primes if g % p == 0]
@@ -0,0 +1,151 @@
+import bisect
+import json
+import os
+import tempfile
+from array import array
+from datetime import datetime
+
+from metrics import TimedLock
+
+# Histórico de divisores em disco, um objeto JSON por linha (NDJSON).
+#
+# Só o índice fica em memória, em arrays compactos (~24 bytes por entrada):
+# id, posição da linha no arquivo e instante de cada entrada, além das
+# posições de cada worker. As consultas devolvem as linhas como estão no
+# arquivo (lidas com pread, sem decodificar o JSON), então paginar ou
+# exportar o histórico inteiro usa memória constante.
+#
+# Os ids são crescentes e os instantes não decrescentes, o que permite
+# localizar cursores e janelas de tempo por busca binária.
+
+READ_CHUNK_BYTES = 256 * 1024  # maior leitura contígua numa exportação
+
+
+def parse_time(value):
+    # Segundos desde a época, a partir de ISO 8601 ou de um número
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(value).timestamp()
+
+
+class ResultsStore:
+    def __init__(self, path=None):
+        # Sem caminho, o histórico vai para um arquivo temporário anônimo
+        self.path = path
+        self._file = open(path, 'a+b') if path else tempfile.TemporaryFile()
+        self._fd = self._file.fileno()
+        self._ids = array('Q')
+        self._offsets = array('Q', [0])  # início de cada linha + fim do arquivo
+        self._times = array('d')
+        self._by_worker = {}  # worker_id -> array de posições
+        self._lock = TimedLock('results_store')
+        self._load()
+
+    def _load(self):
+        # Reconstrói o índice; uma última linha truncada (queda durante a
+        # escrita) é descartada
+        self._file.seek(0)
+        offset = 0
+        for line in self._file:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('linha incompleta')
+                entry = json.loads(line)
+            except ValueError:
+                print(f"Aviso: entrada inválida em {self.path} (byte {offset}); ignorando o restante")
+                self._file.truncate(offset)
+                break
+            offset += len(line)
+            self._index(entry, offset)
+        self._file.seek(0, os.SEEK_END)
+
+    def _index(self, entry, end):
+        # Leitores usam len(self._ids) como limite, sem a trava: _ids é
+        # estendido por último, depois de _offsets, _times e _by_worker
+        position = len(self._ids)
+        last_time = self._times[-1] if self._times else float('-inf')
+        self._offsets.append(end)
+        self._times.append(max(last_time, parse_time(entry.get('timestamp')) or last_time))
+        worker = entry.get('found_by')
+        if worker not in self._by_worker:
+            self._by_worker[worker] = array('Q')
+        self._by_worker[worker].append(position)
+        self._ids.append(entry['id'])
+
+    @property
+    def last_id(self):
+        return self._ids[-1] if self._ids else 0
+
+    def append(self, entries):
+        # Entradas com id <= last_id são ignoradas (replay idempotente)
+        with self._lock:
+            entries = [e for e in entries if e['id'] > self.last_id]
+            if not entries:
+                return 0
+            lines = [json.dumps(e, separators=(',', ':')).encode('utf-8') + b'\n' for e in entries]
+            self._file.write(b''.join(lines))
+            self._file.flush()
+            # O índice só é estendido depois que as linhas estão no arquivo
+            end = self._offsets[-1]
+            for entry, line in zip(entries, lines):
+                end += len(line)
+                self._index(entry, end)
+            return len(entries)
+
+    def sync(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._fd)
+
+    def positions(self, after=0, worker=None, since=None, until=None):
+        # Posições das entradas com id > after, do worker e na janela
+        # [since, until), em ordem crescente de id
+        count = len(self._ids)
+        low = bisect.bisect_right(self._ids, after, 0, count)
+        high = count
+        if since is not None:
+            low = max(low, bisect.bisect_left(self._times, since, 0, count))
+        if until is not None:
+            high = bisect.bisect_left(self._times, until, 0, count)
+        if low >= high:
+            return iter(())
+        if worker is None:
+            return iter(range(low, high))
+        owned = self._by_worker.get(worker, ())
+        first = bisect.bisect_left(owned, low)
+        last = bisect.bisect_left(owned, high)
+        return (owned[i] for i in range(first, last))
+
+    def read(self, positions):
+        # Linhas (sem o '\n') das posições dadas; posições consecutivas são
+        # lidas juntas, em blocos de até READ_CHUNK_BYTES
+        run_start = run_end = None
+        for position in positions:
+            if run_start is not None and position == run_end and \
+                    self._offsets[position] - self._offsets[run_start] < READ_CHUNK_BYTES:
+                run_end += 1
+                continue
+            if run_start is not None:
+                yield from self._read_run(run_start, run_end)
+            run_start, run_end = position, position + 1
+        if run_start is not None:
+            yield from self._read_run(run_start, run_end)
+
+    def _read_run(self, start, end):
+        base = self._offsets[start]
+        data = os.pread(self._fd, self._offsets[end] - base, base)
+        for position in range(start, end):
+            yield data[self._offsets[position] - base:self._offsets[position + 1] - base - 1]
+
+    def tail(self, count):
+        total = len(self._ids)
+        return self.read(range(max(0, total - count), total))
+
+    def close(self):
+        self._file.close()
+
+    def __len__(self):
+        return len(self._ids)
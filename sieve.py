@@ -0,0 +1,110 @@
+import math
+import threading
+
+import numpy as np
+
+# Crivo de Eratóstenes segmentado para intervalos de trabalho [start, end).
+#
+# Só os ímpares são representados: a posição i do segmento corresponde a
+# first_odd + 2*i. Os primos-base (até sqrt(end)) ficam numa tabela em cache
+# que cresce sob demanda. Cada segmento é crivado num buffer de um byte por
+# ímpar (onde a marcação por fatias é vetorizada) e exposto empacotado em
+# bits, 1 bit por ímpar, em ordem little-endian.
+
+DEFAULT_SEGMENT_ODDS = 1 << 18  # ímpares por segmento (~256 KB de trabalho)
+MAX_RANGE_WIDTH = 10_000_000  # largura máxima atendida por /primes
+SIEVE_LIMIT = 1 << 40  # maior número crivado (primos-base até 2**20)
+MAX_BASE_PRIME = math.isqrt(SIEVE_LIMIT)
+
+_BASE_PRIMES = np.array([], dtype=np.int64)
+_BASE_LIMIT = 1
+_BASE_LOCK = threading.Lock()
+
+
+def _simple_sieve(limit):
+    flags = np.ones(limit + 1, dtype=bool)
+    flags[:2] = False
+    flags[4::2] = False
+    for p in range(3, math.isqrt(limit) + 1, 2):
+        if flags[p]:
+            flags[p * p::2 * p] = False
+    return np.flatnonzero(flags).astype(np.int64)
+
+
+def base_primes(limit):
+    # Primos ímpares <= limit, a partir da tabela em cache. A tabela não
+    # passa de MAX_BASE_PRIME: além de SIEVE_LIMIT, ela custaria memória
+    # e tempo sem limite (e estouraria o int64 de first em sieve_segment).
+    global _BASE_PRIMES, _BASE_LIMIT
+    if limit > MAX_BASE_PRIME:
+        raise ValueError(f'Crivo limitado a números abaixo de {SIEVE_LIMIT}')
+    if limit > _BASE_LIMIT:
+        with _BASE_LOCK:
+            if limit > _BASE_LIMIT:
+                new_limit = min(max(limit, 2 * _BASE_LIMIT, 1 << 16), MAX_BASE_PRIME)
+                _BASE_PRIMES = _simple_sieve(new_limit)[1:]
+                _BASE_LIMIT = new_limit
+    primes = _BASE_PRIMES
+    return primes[:np.searchsorted(primes, limit, side='right')]
+
+
+def sieve_segment(first_odd, count):
+    # Crivo dos ímpares first_odd, first_odd + 2, ..., devolvendo um array
+    # booleano com True nas posições primas.
+    flags = np.ones(count, dtype=bool)
+    if count <= 0:
+        return flags
+    last = first_odd + 2 * (count - 1)
+    primes = base_primes(math.isqrt(last))
+
+    # Primeiro múltiplo ímpar de p que é >= max(p*p, first_odd).
+    first = np.maximum(primes * primes, (first_odd + primes - 1) // primes * primes)
+    first += np.where(first % 2 == 0, primes, 0)
+    index = (first - first_odd) // 2
+
+    dense = primes < count
+    for p, i in zip(primes[dense].tolist(), index[dense].tolist()):
+        flags[i::p] = False
+    # Primos maiores que o segmento atingem no máximo uma posição.
+    sparse_index = index[~dense]
+    flags[sparse_index[sparse_index < count]] = False
+
+    if first_odd == 1:
+        flags[0] = False
+    return flags
+
+
+def _odd_bounds(start, end):
+    first_odd = max(start, 3) | 1
+    count = max(0, (end - first_odd + 1) // 2)
+    return first_odd, count
+
+
+def segment_bitmap(start, end):
+    # Bitmap empacotado dos ímpares primos em [start, end).
+    first_odd, count = _odd_bounds(start, end)
+    flags = sieve_segment(first_odd, count)
+    return {
+        'includes_two': start <= 2 < end,
+        'first_odd': first_odd,
+        'count_odd': count,
+        'bitmap': np.packbits(flags, bitorder='little').tobytes()
+    }
+
+
+def iter_primes(start, end, segment_odds=DEFAULT_SEGMENT_ODDS):
+    # Gera todos os primos em [start, end) numa única passada segmentada.
+    if start <= 2 < end:
+        yield 2
+    first_odd, count = _odd_bounds(start, end)
+    offset = 0
+    while offset < count:
+        n = min(segment_odds, count - offset)
+        seg_start = first_odd + 2 * offset
+        flags = sieve_segment(seg_start, n)
+        yield from (seg_start + 2 * np.flatnonzero(flags)).tolist()
+        offset += n
+
+
+def primes_in_range(start, end):
+    return list(iter_primes(start, end))
@@ -0,0 +1,576 @@
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from allocator import LEASE_TIMEOUT, Lease, covered_end, lagging, split_point
+from results_store import parse_time
+from throughput import (DEFAULT_RANGE_SIZE, MAX_RANGE_SIZE, MIN_RANGE_SIZE, TARGET_LEASE_SECONDS,
+                        WorkerRate, summarize)
+from worker_registry import WORKER_INACTIVE_SECONDS
+
+# Estado do coordenador em SQLite (modo WAL), compartilhado entre processos.
+#
+# Com o estado em memória (allocator, coordinator.WorkerRegistry,
+# coordinator.ResultsLog, throughput) cada processo do servidor teria a sua
+# própria tabela de concessões e entregaria intervalos sobrepostos. Aqui as
+# mesmas interfaces operam sobre um banco único:
+#
+#   - cada thread usa a sua conexão, em autocommit; operações com mais de um
+#     comando rodam em BEGIN IMMEDIATE, que serializa os escritores;
+#   - a retirada de um intervalo é um único comando: DELETE ... RETURNING do
+#     menor intervalo a realocar, ou UPDATE ... RETURNING do início dos
+#     intervalos novos;
+#   - concessões, workers e divisores são buscados por índices (worker,
+#     prazo, última atividade, id).
+#
+# synchronous=NORMAL: uma queda de energia pode perder as últimas
+# transações, mas nunca corrompe o banco (o mesmo compromisso do commit em
+# grupo do WAL em memória).
+
+BUSY_TIMEOUT_MS = 30_000  # espera pela trava de escrita de outro processo
+QUERY_PAGE_SIZE = 1000  # linhas por consulta ao exportar divisores
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS allocator (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    frontier INTEGER NOT NULL,
+    next_start INTEGER NOT NULL,
+    issued INTEGER NOT NULL DEFAULT 0,
+    reissued INTEGER NOT NULL DEFAULT 0,
+    expired INTEGER NOT NULL DEFAULT 0,
+    split INTEGER NOT NULL DEFAULT 0,
+    reconciled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    lease_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    worker_id TEXT NOT NULL,
+    range_start INTEGER NOT NULL,
+    range_end INTEGER NOT NULL,
+    issued_at REAL NOT NULL,
+    deadline REAL NOT NULL,
+    reach INTEGER,
+    split_from INTEGER,
+    split_at REAL,
+    progress INTEGER,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS leases_worker ON leases (worker_id, range_start);
+CREATE INDEX IF NOT EXISTS leases_deadline ON leases (deadline);
+CREATE INDEX IF NOT EXISTS leases_start ON leases (range_start);
+CREATE INDEX IF NOT EXISTS leases_split ON leases (split_from) WHERE split_from IS NOT NULL;
+CREATE TABLE IF NOT EXISTS reclaim (
+    range_start INTEGER PRIMARY KEY,
+    range_end INTEGER NOT NULL,
+    origin_start INTEGER,
+    origin_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS reclaim_origin ON reclaim (origin_start, origin_end);
+CREATE TABLE IF NOT EXISTS completed (
+    range_start INTEGER PRIMARY KEY,
+    range_end INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL,
+    ip TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS workers_last_seen ON workers (last_seen);
+CREATE TABLE IF NOT EXISTS worker_rates (
+    worker_id TEXT PRIMARY KEY,
+    rate REAL,
+    lease_seconds REAL,
+    idle_seconds REAL,
+    completed INTEGER NOT NULL,
+    numbers INTEGER NOT NULL,
+    last_size INTEGER NOT NULL,
+    last_completed_at REAL,
+    last_submit_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS divisors (
+    id INTEGER PRIMARY KEY,
+    found_by TEXT,
+    time REAL,
+    line BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS divisors_worker ON divisors (found_by, id);
+CREATE INDEX IF NOT EXISTS divisors_time ON divisors (time);
+'''
+
+# Colunas acrescentadas depois da primeira versão do banco (ADD COLUMN ao abrir)
+MIGRATIONS = [
+    ('allocator', 'split', 'INTEGER NOT NULL DEFAULT 0'),
+    ('allocator', 'reconciled', 'INTEGER NOT NULL DEFAULT 0'),
+    ('leases', 'reach', 'INTEGER'),
+    ('leases', 'split_from', 'INTEGER'),
+    ('leases', 'split_at', 'REAL'),
+    ('leases', 'progress', 'INTEGER'),
+    ('leases', 'heartbeat_at', 'REAL'),
+    ('reclaim', 'origin_start', 'INTEGER'),
+    ('reclaim', 'origin_end', 'INTEGER'),
+]
+
+LEASE_COLUMNS = ('lease_id, worker_id, range_start, range_end, issued_at, deadline, '
+                 'reach, split_from, split_at, progress, heartbeat_at')
+RATE_COLUMNS = ', '.join(WorkerRate.__slots__)
+
+BEGIN_WAIT = metrics.counter('npp_lock_wait_seconds_total', 'Tempo de espera por travas disputadas',
+                             {'lock': 'sqlite'})
+COMMIT_SECONDS = metrics.histogram('npp_sqlite_commit_seconds', 'Duração dos commits no banco de estado')
+
+
+class SQLiteBackend:
+    def __init__(self, path, frontier=2, lease_timeout=LEASE_TIMEOUT):
+        # frontier só vale para um banco novo
+        self.path = path
+        self._local = threading.local()
+        self.connection().execute('PRAGMA journal_mode=WAL')  # persistente no arquivo
+        with self.transaction() as db:
+            for table, column, definition in MIGRATIONS:
+                exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+                columns = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+                if exists and column not in columns:
+                    db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    db.execute(statement)
+            db.execute('UPDATE leases SET reach = range_end, progress = range_start WHERE reach IS NULL')
+            db.execute('UPDATE reclaim SET origin_start = range_start, origin_end = range_end '
+                       'WHERE origin_start IS NULL')
+            db.execute('INSERT OR IGNORE INTO allocator (id, frontier, next_start) VALUES (1, ?, ?)',
+                       (frontier, frontier))
+        self.allocator = SQLiteAllocator(self, lease_timeout)
+        self.workers = SQLiteWorkers(self)
+        self.results = SQLiteResults(self)
+        self.rates = SQLiteRates(self)
+
+    def connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Trava de escrita desde o início: sem upgrade de leitura para escrita,
+        # que falharia com SQLITE_BUSY sem esperar
+        db = self.connection()
+        started = time.perf_counter()
+        db.execute('BEGIN IMMEDIATE')
+        BEGIN_WAIT.inc(time.perf_counter() - started)
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        started = time.perf_counter()
+        db.execute('COMMIT')
+        COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+    def data_version(self):
+        # Muda quando outra conexão (outra thread ou processo) grava no banco
+        return self.connection().execute('PRAGMA data_version').fetchone()[0]
+
+
+def _frontier(db):
+    return db.execute('SELECT frontier FROM allocator').fetchone()[0]
+
+
+class SQLiteAllocator:
+    # Mesma interface e invariantes de allocator.IntervalAllocator
+    def __init__(self, backend, lease_timeout=LEASE_TIMEOUT):
+        self.backend = backend
+        self.lease_timeout = lease_timeout
+
+    def lease(self, worker_id, size, now=None):
+        return self.lease_many(worker_id, size, 1, now)[0]
+
+    def lease_many(self, worker_id, size, count, now=None, stagger=0):
+        now = time.time() if now is None else now
+        with self.backend.transaction() as db:
+            self._expire(db, now)
+            return [self._lease(db, worker_id, size, now, i * stagger) for i in range(count)]
+
+    def steal(self, worker_id, size, now=None):
+        # A decisão é tomada antes numa leitura, para que os pedidos sem
+        # concessão atrasada não abram uma transação de escrita
+        now = time.time() if now is None else now
+        if self._steal_target(self.backend.connection(), worker_id, size, now) is None:
+            return None
+        with self.backend.transaction() as db:
+            target = self._steal_target(db, worker_id, size, now)
+            if target is None:
+                return None
+            lease, at = target
+            db.execute('UPDATE leases SET range_end = ?, progress = min(progress, ?), split_at = ? WHERE lease_id = ?',
+                       (at, at, now, lease.lease_id))
+            deadline = now + self.lease_timeout
+            lease_id = db.execute(
+                'INSERT INTO leases (worker_id, range_start, range_end, issued_at, deadline, reach, split_from, progress) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING lease_id',
+                (worker_id, at, lease.end, now, deadline, lease.end, lease.lease_id, at)
+            ).fetchone()[0]
+            db.execute('UPDATE allocator SET issued = issued + 1, split = split + 1')
+            return Lease(lease_id, worker_id, at, lease.end, now, deadline, split_from=lease.lease_id)
+
+    def heartbeat(self, worker_id, items, now=None):
+        now = time.time() if now is None else now
+        with self.backend.transaction() as db:
+            leases = []
+            for lease_id, position in items:
+                row = db.execute(
+                    f'UPDATE leases SET progress = max(progress, min(?, range_end)), heartbeat_at = ? '
+                    f'WHERE lease_id = ? AND worker_id = ? RETURNING {LEASE_COLUMNS}',
+                    (position, now, lease_id, worker_id)
+                ).fetchone()
+                leases.append(Lease(*row) if row is not None else None)
+            return leases
+
+    def complete(self, worker_id, start=None, end=None, lease_id=None):
+        return self.complete_many(worker_id, [(start, end, lease_id)])[0]
+
+    def complete_many(self, worker_id, ranges):
+        with self.backend.transaction() as db:
+            completed = [self._complete(db, worker_id, *item) for item in ranges]
+            if any(lease is not None for lease in completed):
+                self._advance(db)
+            return completed
+
+    def release(self, lease_id):
+        with self.backend.transaction() as db:
+            row = db.execute('DELETE FROM leases WHERE lease_id = ? RETURNING range_start, range_end',
+                             (lease_id,)).fetchone()
+            if row is None:
+                return False
+            self._push_reclaim(db, *row)
+            return True
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        with self.backend.transaction() as db:
+            return self._expire(db, now)
+
+    def leases_for(self, worker_id):
+        rows = self.backend.connection().execute(
+            f'SELECT {LEASE_COLUMNS} FROM leases WHERE worker_id = ?', (worker_id,))
+        return [Lease(*row) for row in rows]
+
+    def completable(self, worker_id, start=None, end=None, lease_id=None):
+        db = self.backend.connection()
+        if lease_id is not None:
+            row = db.execute('SELECT 1 FROM leases WHERE lease_id = ? AND worker_id = ?',
+                             (lease_id, worker_id)).fetchone()
+        else:
+            row = db.execute('SELECT 1 FROM leases WHERE worker_id = ? AND range_start = ? '
+                             'AND (range_end = ? OR reach = ?)', (worker_id, start, end, end)).fetchone()
+        return row is not None or db.execute('SELECT 1 FROM reclaim WHERE origin_start = ? AND origin_end = ?',
+                                             (start, end)).fetchone() is not None
+
+    @property
+    def frontier(self):
+        return _frontier(self.backend.connection())
+
+    @property
+    def next_start(self):
+        return self.backend.connection().execute('SELECT next_start FROM allocator').fetchone()[0]
+
+    @property
+    def active_count(self):
+        return self.backend.connection().execute('SELECT count(*) FROM leases').fetchone()[0]
+
+    @property
+    def reclaim_count(self):
+        return self.backend.connection().execute('SELECT count(*) FROM reclaim').fetchone()[0]
+
+    def lease_ages(self, now=None):
+        now = time.time() if now is None else now
+        oldest, mean = self.backend.connection().execute(
+            'SELECT min(issued_at), avg(issued_at) FROM leases').fetchone()
+        if oldest is None:
+            return None, None
+        return now - oldest, now - mean
+
+    def stats(self):
+        row = self.backend.connection().execute(
+            'SELECT frontier, next_start, (SELECT count(*) FROM leases), (SELECT count(*) FROM reclaim), '
+            '(SELECT count(*) FROM completed), issued, reissued, expired, split, reconciled FROM allocator'
+        ).fetchone()
+        return dict(zip(('safe_frontier', 'next_start', 'active_leases', 'reclaim_queue',
+                         'completed_pending', 'issued', 'reissued', 'expired', 'split', 'reconciled'), row))
+
+    def _lease(self, db, worker_id, size, now, extra_time=0):
+        row = self._pop_reclaim(db)
+        if row is None:
+            end = db.execute('UPDATE allocator SET next_start = next_start + ?, issued = issued + 1 '
+                             'RETURNING next_start', (size,)).fetchone()[0]
+            start = end - size
+        else:
+            start, end, origin = row
+            if end - start > size:
+                self._push_reclaim(db, start + size, end, origin)
+                end = start + size
+            db.execute('UPDATE allocator SET issued = issued + 1, reissued = reissued + 1')
+
+        deadline = now + self.lease_timeout + extra_time
+        lease_id = db.execute(
+            'INSERT INTO leases (worker_id, range_start, range_end, issued_at, deadline, reach, progress) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING lease_id',
+            (worker_id, start, end, now, deadline, end, start)
+        ).fetchone()[0]
+        return Lease(lease_id, worker_id, start, end, now, deadline)
+
+    def _complete(self, db, worker_id, start, end, lease_id):
+        if lease_id is not None:
+            row = db.execute(f'DELETE FROM leases WHERE lease_id = ? AND worker_id = ? RETURNING {LEASE_COLUMNS}',
+                             (lease_id, worker_id)).fetchone()
+        else:
+            row = db.execute(
+                f'DELETE FROM leases WHERE worker_id = ? AND range_start = ? AND (range_end = ? OR reach = ?) '
+                f'RETURNING {LEASE_COLUMNS}',
+                (worker_id, start, end, end)
+            ).fetchone()
+        if row is not None:
+            lease = Lease(*row)
+            covered_to = covered_end(lease, end)
+            self._reconcile(db, lease.lease_id, covered_to)
+        elif db.execute('DELETE FROM reclaim WHERE origin_start = ? AND origin_end = ?', (start, end)).rowcount:
+            # Concessão vencida concluída com atraso: evita reprocessar. Ver
+            # allocator: os pedaços dela ainda na fila saem dela
+            lease = Lease(None, worker_id, start, end, None, None)
+            covered_to = end
+        else:
+            return None
+
+        db.execute('INSERT INTO completed (range_start, range_end) VALUES (?, ?) '
+                   'ON CONFLICT (range_start) DO UPDATE SET range_end = max(range_end, excluded.range_end)',
+                   (lease.start, covered_to))
+        return lease
+
+    def _reconcile(self, db, lease_id, covered_to):
+        # Ver allocator: concessões roubadas já cobertas pela conclusão
+        stolen = db.execute('DELETE FROM leases WHERE split_from = ? AND reach <= ? RETURNING lease_id',
+                            (lease_id, covered_to)).fetchall()
+        for stolen_id, in stolen:
+            self._reconcile(db, stolen_id, covered_to)
+        if stolen:
+            db.execute('UPDATE allocator SET reconciled = reconciled + ?', (len(stolen),))
+
+    def _steal_target(self, db, worker_id, size, now):
+        # (concessão que segura a fronteira, ponto de divisão) ou None
+        if db.execute('SELECT 1 FROM reclaim LIMIT 1').fetchone() is not None:
+            return None
+        row = db.execute(f'SELECT {LEASE_COLUMNS} FROM leases ORDER BY range_start LIMIT 1').fetchone()
+        if row is None:
+            return None
+        lease = Lease(*row)
+        if lease.worker_id == worker_id or not lagging(lease, now, self.lease_timeout):
+            return None
+        at = split_point(lease, size)
+        return None if at is None else (lease, at)
+
+    def _pop_reclaim(self, db):
+        # Menor intervalo a realocar; o que a fronteira já cobre é descartado
+        frontier = None
+        while True:
+            row = db.execute(
+                'DELETE FROM reclaim WHERE range_start = (SELECT min(range_start) FROM reclaim) '
+                'RETURNING range_start, range_end, origin_start, origin_end'
+            ).fetchone()
+            if row is None:
+                return None
+            if frontier is None:
+                frontier = _frontier(db)
+            if row[1] > frontier:
+                return max(row[0], frontier), row[1], (row[2], row[3])
+
+    def _push_reclaim(self, db, start, end, origin=None):
+        # origin: intervalo da concessão vencida de que este é um pedaço
+        origin_start, origin_end = (start, end) if origin is None else origin
+        frontier = _frontier(db)
+        if end <= frontier:
+            return
+        db.execute('INSERT OR REPLACE INTO reclaim (range_start, range_end, origin_start, origin_end) '
+                   'VALUES (?, ?, ?, ?)', (max(start, frontier), end, origin_start, origin_end))
+
+    def _expire(self, db, now):
+        expired = [Lease(*row) for row in db.execute(
+            f'DELETE FROM leases WHERE deadline <= ? RETURNING {LEASE_COLUMNS}', (now,)).fetchall()]
+        for lease in expired:
+            self._push_reclaim(db, lease.start, lease.end)
+        if expired:
+            db.execute('UPDATE allocator SET expired = expired + ?', (len(expired),))
+        return expired
+
+    def _advance(self, db):
+        frontier = start = _frontier(db)
+        while True:
+            ends = db.execute('DELETE FROM completed WHERE range_start <= ? RETURNING range_end',
+                              (frontier,)).fetchall()
+            if not ends:
+                break
+            frontier = max(frontier, max(end for end, in ends))
+        if frontier > start:
+            db.execute('UPDATE allocator SET frontier = ?', (frontier,))
+        return frontier > start
+
+
+class SQLiteWorkers:
+    # Mesma interface de worker_registry.WorkerRegistry; as linhas ficam no
+    # banco, sem limite em memória, e anonymous é ignorado
+    def __init__(self, backend, max_idle=WORKER_INACTIVE_SECONDS):
+        self.backend = backend
+        self.max_idle = max_idle
+
+    def touch(self, worker_id, ip=None, now=None, create=True, anonymous=False):
+        now = time.time() if now is None else now
+        db = self.backend.connection()
+        if create:
+            db.execute('INSERT INTO workers (worker_id, last_seen, ip) VALUES (?, ?, ?) '
+                       'ON CONFLICT (worker_id) DO UPDATE SET last_seen = excluded.last_seen, '
+                       'ip = coalesce(excluded.ip, ip)', (worker_id, now, ip))
+            return True
+        return db.execute('UPDATE workers SET last_seen = ? WHERE worker_id = ?', (now, worker_id)).rowcount > 0
+
+    def reap(self, now=None):
+        now = time.time() if now is None else now
+        rows = self.backend.connection().execute(
+            'DELETE FROM workers WHERE last_seen < ? RETURNING worker_id', (now - self.max_idle,)).fetchall()
+        return [worker_id for worker_id, in rows]
+
+    def __len__(self):
+        return self.backend.connection().execute('SELECT count(*) FROM workers').fetchone()[0]
+
+
+class SQLiteResults:
+    # Mesma interface de coordinator.ResultsLog; cada linha guarda o JSON da
+    # entrada como no ResultsStore
+    def __init__(self, backend, on_append=None):
+        self.backend = backend
+        self.on_append = on_append
+
+    def add(self, divisors, worker_id, ip=None):
+        timestamp = datetime.now().isoformat()
+        seconds = parse_time(timestamp)
+        with self.backend.transaction() as db:
+            next_id = db.execute('SELECT coalesce(max(id), 0) + 1 FROM divisors').fetchone()[0]
+            entries = [{
+                'id': next_id + i,
+                'divisor': divisor,
+                'found_by': worker_id,
+                'timestamp': timestamp,
+                'ip': ip
+            } for i, divisor in enumerate(divisors)]
+            db.executemany('INSERT INTO divisors (id, found_by, time, line) VALUES (?, ?, ?, ?)', [
+                (entry['id'], worker_id, seconds, json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+                for entry in entries
+            ])
+        if self.on_append is not None:
+            self.on_append(entries)
+        return entries
+
+    def recent(self, count=5):
+        rows = self.backend.connection().execute(
+            'SELECT line FROM divisors ORDER BY id DESC LIMIT ?', (count,)).fetchall()
+        return [json.loads(line) for line, in reversed(rows)]
+
+    def after(self, entry_id, limit=None):
+        rows = self.backend.connection().execute(
+            'SELECT line FROM divisors WHERE id > ? ORDER BY id LIMIT ?',
+            (entry_id, -1 if limit is None else limit)).fetchall()
+        return [json.loads(line) for line, in rows]
+
+    def query(self, after=0, limit=None, worker=None, since=None, until=None):
+        # Linhas JSON (bytes), em páginas de QUERY_PAGE_SIZE: nenhuma consulta
+        # fica aberta entre um bloco e outro da exportação
+        where, params = ['id > ?'], []
+        if worker is not None:
+            where.append('found_by = ?')
+            params.append(worker)
+        if since is not None:
+            where.append('time >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('time < ?')
+            params.append(until)
+        sql = f'SELECT id, line FROM divisors WHERE {" AND ".join(where)} ORDER BY id LIMIT ?'
+        while limit is None or limit > 0:
+            page = QUERY_PAGE_SIZE if limit is None else min(limit, QUERY_PAGE_SIZE)
+            rows = self.backend.connection().execute(sql, [after, *params, page]).fetchall()
+            for entry_id, line in rows:
+                yield bytes(line)
+            if len(rows) < page:
+                return
+            after = rows[-1][0]
+            if limit is not None:
+                limit -= len(rows)
+
+    def sync(self):
+        pass
+
+    def __len__(self):
+        return self.backend.connection().execute('SELECT coalesce(max(id), 0) FROM divisors').fetchone()[0]
+
+
+class SQLiteRates:
+    # Mesma interface de throughput.WorkerRateTracker; as contas ficam em
+    # WorkerRate, lida e gravada a cada operação
+    def __init__(self, backend, target_seconds=TARGET_LEASE_SECONDS,
+                 min_size=MIN_RANGE_SIZE, max_size=MAX_RANGE_SIZE):
+        self.backend = backend
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def next_size(self, worker_id, now=None):
+        now = time.time() if now is None else now
+        with self.backend.transaction() as db:
+            stats = self._load(db, worker_id)
+            if stats is None:
+                return DEFAULT_RANGE_SIZE
+            size = stats.next_size(now, self.target_seconds, self.min_size, self.max_size)
+            self._store(db, worker_id, stats)
+            return size
+
+    def record_completion(self, lease, now=None):
+        self.record_completions(lease.worker_id, [lease], now)
+
+    def record_completions(self, worker_id, leases, now=None):
+        now = time.time() if now is None else now
+        leases = [lease for lease in leases if lease.issued_at is not None]
+        if not leases:
+            return
+        with self.backend.transaction() as db:
+            stats = self._load(db, worker_id) or WorkerRate()
+            stats.record(leases, now)
+            self._store(db, worker_id, stats)
+
+    def forget(self, worker_id):
+        self.backend.connection().execute('DELETE FROM worker_rates WHERE worker_id = ?', (worker_id,))
+
+    def stats(self):
+        rows = self.backend.connection().execute(f'SELECT worker_id, {RATE_COLUMNS} FROM worker_rates')
+        return summarize(self, {row[0]: self._rate(row[1:]).summary() for row in rows})
+
+    def _load(self, db, worker_id):
+        row = db.execute(f'SELECT {RATE_COLUMNS} FROM worker_rates WHERE worker_id = ?', (worker_id,)).fetchone()
+        return None if row is None else self._rate(row)
+
+    @staticmethod
+    def _rate(values):
+        stats = WorkerRate()
+        for name, value in zip(WorkerRate.__slots__, values):
+            setattr(stats, name, value)
+        return stats
+
+    @staticmethod
+    def _store(db, worker_id, stats):
+        values = [getattr(stats, name) for name in WorkerRate.__slots__]
+        db.execute(f'INSERT OR REPLACE INTO worker_rates (worker_id, {RATE_COLUMNS}) '
+                   f'VALUES (?{", ?" * len(values)})', (worker_id, *values))
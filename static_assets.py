@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só há as variantes gzip e sem compressão
+    brotli = None
+
+# Front-end estático renderizado uma única vez na inicialização.
+#
+# Cada arquivo é servido com um nome derivado do hash do conteúdo
+# (app.<hash>.js), de modo que pode ser guardado pelo navegador para sempre
+# (Cache-Control: immutable): uma versão nova muda a URL referenciada pela
+# página. As variantes gzip e brotli são geradas aqui, e não por requisição.
+# A página em si mantém a URL fixa e é revalidada com ETag/304.
+#
+# Pedidos com Range (downloads em partes ou retomados) são atendidos sobre a
+# variante sem compressão, para que os deslocamentos sejam os do conteúdo.
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+MIN_COMPRESS_BYTES = 256  # abaixo disso a compressão não compensa
+STREAM_CHUNK_BYTES = 1 << 20  # corpos maiores são enviados em partes
+
+
+def _accepts(request, encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+class StaticAsset:
+    __slots__ = ('name', 'mimetype', 'digest', 'variants', 'cache_control')
+
+    def __init__(self, name, content, mimetype, cache_control=IMMUTABLE_CACHE_CONTROL,
+                 digest=None, variants=None):
+        # digest e variants permitem servir conteúdo já comprimido e com hash
+        # calculados fora daqui (p.ex. arquivos grandes mapeados em memória)
+        body = content.encode('utf-8') if isinstance(content, str) else content
+        self.name = name
+        self.mimetype = mimetype
+        self.digest = digest or hashlib.blake2b(body, digest_size=8).hexdigest()
+        self.cache_control = cache_control
+        # codificação -> corpo; só mantém variantes menores que o original
+        self.variants = {'identity': body}
+        if variants is not None:
+            self.variants.update(variants)
+        elif len(body) >= MIN_COMPRESS_BYTES:
+            compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(body, quality=11)
+            for encoding, data in compressed.items():
+                if len(data) < len(body):
+                    self.variants[encoding] = data
+
+    @property
+    def hashed_name(self):
+        stem, dot, extension = self.name.rpartition('.')
+        return f'{stem}.{self.digest}.{extension}' if dot else f'{self.name}.{self.digest}'
+
+    def select(self, request):
+        # Melhor variante aceita pelo cliente: (codificação, corpo)
+        if request.range is not None:
+            return 'identity', self.variants['identity']
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and _accepts(request, encoding):
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+    def response(self, request):
+        encoding, body = self.select(request)
+        # ETag forte por variante, já que os bytes diferem
+        etag = self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = self._body_response(request, body, etag)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Cache-Control'] = self.cache_control
+        if len(self.variants) > 1:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _body_response(self, request, body, etag):
+        # 200 com o corpo inteiro, 206 com o intervalo pedido ou 416. Com
+        # If-Range de outra versão, o corpo inteiro é enviado.
+        length = len(body)
+        start, end, status = 0, length, 200
+        if request.range is not None and request.if_range.etag in (None, etag) and request.if_range.date is None:
+            byte_range = request.range.range_for_length(length)
+            if byte_range is None:
+                response = Response(status=416)
+                response.headers['Content-Range'] = f'bytes */{length}'
+                return response
+            start, end = byte_range
+            status = 206
+        if end - start > STREAM_CHUNK_BYTES:
+            response = Response(_stream(body, start, end), status=status, mimetype=self.mimetype)
+            response.headers['Content-Length'] = str(end - start)
+        else:
+            response = Response(bytes(body[start:end]), status=status, mimetype=self.mimetype)
+        if status == 206:
+            response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{length}'
+        return response
+
+
+def _stream(body, start, end):
+    for offset in range(start, end, STREAM_CHUNK_BYTES):
+        yield bytes(body[offset:min(offset + STREAM_CHUNK_BYTES, end)])
+
+
+class AssetBundle:
+    def __init__(self, url_prefix='/static/'):
+        self.url_prefix = url_prefix
+        self._by_hashed_name = {}
+
+    def add(self, name, content, mimetype):
+        asset = StaticAsset(name, content, mimetype)
+        self._by_hashed_name[asset.hashed_name] = asset
+        return asset
+
+    def url(self, asset):
+        return f'{self.url_prefix}{asset.hashed_name}'
+
+    def get(self, hashed_name):
+        return self._by_hashed_name.get(hashed_name)
+
+    def stats(self):
+        return {
+            asset.hashed_name: {encoding: len(body) for encoding, body in asset.variants.items()}
+            for asset in self._by_hashed_name.values()
+        }
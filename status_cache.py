@@ -0,0 +1,40 @@
+import hashlib
+import json
+import threading
+import time
+
+# Resposta de /status pré-serializada.
+#
+# O JSON só é reconstruído quando a versão do coordenador mudou, e no máximo
+# uma vez a cada min_interval segundos (sob carga o estado muda a cada
+# requisição). O ETag é derivado do conteúdo, de modo que uma reconstrução
+# que produz o mesmo JSON continua respondendo 304 a If-None-Match.
+
+STATUS_MIN_INTERVAL = 0.5  # segundos entre reconstruções
+
+
+class StatusCache:
+    def __init__(self, coordinator, min_interval=STATUS_MIN_INTERVAL):
+        self.coordinator = coordinator
+        self.min_interval = min_interval
+        self.rebuilds = 0
+        self._version = None
+        self._built_at = 0.0
+        self._snapshot = (b'', '')  # (corpo, etag), trocados numa única atribuição
+        self._lock = threading.Lock()
+
+    def get(self):
+        # Devolve (corpo, etag) atuais, reconstruindo se necessário
+        version = self.coordinator.version
+        if version != self._version and time.monotonic() - self._built_at >= self.min_interval:
+            with self._lock:
+                if version != self._version:
+                    self._rebuild(version)
+        return self._snapshot
+
+    def _rebuild(self, version):
+        body = json.dumps(self.coordinator.status(), separators=(',', ':')).encode('utf-8')
+        self._snapshot = (body, hashlib.blake2b(body, digest_size=8).hexdigest())
+        self._version = version
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
@@ -0,0 +1,151 @@
+import time
+
+from metrics import TimedLock
+
+# Dimensionamento adaptativo dos intervalos por worker.
+#
+# Para cada worker é mantida uma média móvel exponencial da vazão (números do
+# intervalo por segundo, medida do momento da concessão até o submit_result)
+# e do tempo ocioso entre um submit e a concessão seguinte (ida e volta de
+# rede). O próximo intervalo é dimensionado para durar TARGET_LEASE_SECONDS.
+# Em lotes, a janela de medição começa no submit anterior do worker, já que
+# concessões pré-buscadas ficam na fila do cliente antes de serem processadas.
+
+DEFAULT_RANGE_SIZE = 10000  # tamanho para workers ainda sem medição
+MIN_RANGE_SIZE = 2000
+MAX_RANGE_SIZE = 10_000_000  # mesma largura máxima atendida por /primes
+TARGET_LEASE_SECONDS = 60
+MAX_GROWTH = 4  # fator máximo de crescimento entre concessões seguidas
+EWMA_ALPHA = 0.3
+
+
+class WorkerRate:
+    __slots__ = ('rate', 'lease_seconds', 'idle_seconds', 'completed', 'numbers',
+                 'last_size', 'last_completed_at', 'last_submit_at')
+
+    def __init__(self):
+        self.rate = None
+        self.lease_seconds = None
+        self.idle_seconds = None
+        self.completed = 0
+        self.numbers = 0
+        self.last_size = DEFAULT_RANGE_SIZE
+        self.last_completed_at = None
+        self.last_submit_at = None
+
+    def next_size(self, now, target_seconds, min_size, max_size):
+        if self.last_completed_at is not None:
+            self.idle_seconds = _ewma(self.idle_seconds, max(0.0, now - self.last_completed_at))
+            self.last_completed_at = None
+        if self.rate is None:
+            return self.last_size
+
+        size = int(self.rate * target_seconds)
+        size = min(size, self.last_size * MAX_GROWTH)
+        size = max(min_size, min(max_size, size))
+        self.last_size = size
+        return size
+
+    def record(self, leases, now):
+        # leases: concluídas juntas, todas com issued_at
+        size = sum(lease.end - lease.start for lease in leases)
+        window_start = min(lease.issued_at for lease in leases)
+        if self.last_submit_at is not None:
+            window_start = max(window_start, self.last_submit_at)
+        elapsed = max(now - window_start, 1e-3)
+        self.rate = _ewma(self.rate, size / elapsed)
+        self.lease_seconds = _ewma(self.lease_seconds, elapsed / len(leases))
+        self.completed += len(leases)
+        self.numbers += size
+        self.last_completed_at = now
+        self.last_submit_at = now
+
+    def summary(self):
+        overhead = None
+        if self.idle_seconds is not None and self.lease_seconds:
+            overhead = self.idle_seconds / (self.idle_seconds + self.lease_seconds)
+        return {
+            'numbers_per_sec': self.rate,
+            'lease_seconds': self.lease_seconds,
+            'idle_seconds': self.idle_seconds,
+            'round_trip_overhead': overhead,
+            'completed': self.completed,
+            'numbers_tested': self.numbers,
+            'range_size': self.last_size
+        }
+
+
+def summarize(tracker, workers):
+    # Resposta de /worker_stats: workers é {worker_id: WorkerRate.summary()}
+    rates = [w['numbers_per_sec'] for w in workers.values() if w['numbers_per_sec']]
+    overheads = [w['round_trip_overhead'] for w in workers.values() if w['round_trip_overhead'] is not None]
+    return {
+        'target_lease_seconds': tracker.target_seconds,
+        'min_range_size': tracker.min_size,
+        'max_range_size': tracker.max_size,
+        'fleet_numbers_per_sec': sum(rates),
+        'mean_round_trip_overhead': sum(overheads) / len(overheads) if overheads else None,
+        'workers': workers
+    }
+
+
+def _ewma(previous, sample):
+    if previous is None:
+        return sample
+    return previous + EWMA_ALPHA * (sample - previous)
+
+
+class WorkerRateTracker:
+    def __init__(self, target_seconds=TARGET_LEASE_SECONDS,
+                 min_size=MIN_RANGE_SIZE, max_size=MAX_RANGE_SIZE):
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self._workers = {}
+        self._lock = TimedLock('rates')
+
+    def next_size(self, worker_id, now=None):
+        # Tamanho da próxima concessão; também registra o tempo ocioso desde
+        # o último submit deste worker.
+        now = time.time() if now is None else now
+        with self._lock:
+            stats = self._workers.get(worker_id)
+            if stats is None:
+                return DEFAULT_RANGE_SIZE
+            return stats.next_size(now, self.target_seconds, self.min_size, self.max_size)
+
+    def record_completion(self, lease, now=None):
+        self.record_completions(lease.worker_id, [lease], now)
+
+    def record_completions(self, worker_id, leases, now=None):
+        now = time.time() if now is None else now
+        leases = [lease for lease in leases if lease.issued_at is not None]
+        if not leases:
+            return
+        with self._lock:
+            stats = self._workers.get(worker_id)
+            if stats is None:
+                stats = self._workers[worker_id] = WorkerRate()
+            stats.record(leases, now)
+
+    def to_dict(self):
+        with self._lock:
+            return {worker_id: [getattr(stats, name) for name in WorkerRate.__slots__]
+                    for worker_id, stats in self._workers.items()}
+
+    def restore(self, data):
+        # Medições salvas por to_dict (snapshot do coordenador)
+        with self._lock:
+            for worker_id, values in data.items():
+                stats = self._workers[worker_id] = WorkerRate()
+                for name, value in zip(WorkerRate.__slots__, values):
+                    setattr(stats, name, value)
+
+    def forget(self, worker_id):
+        with self._lock:
+            self._workers.pop(worker_id, None)
+
+    def stats(self):
+        with self._lock:
+            workers = {worker_id: stats.summary() for worker_id, stats in self._workers.items()}
+        return summarize(self, workers)
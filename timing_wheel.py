@@ -0,0 +1,96 @@
+import time
+
+# Roda de tempo hierárquica, como a dos timers do kernel e do Kafka: itens
+# com prazo, inseridos e removidos em O(1) e devolvidos por advance() quando
+# o prazo passa, sem varrer os que ainda não venceram.
+#
+# O tempo é contado em ticks de `resolution` segundos. Há LEVELS níveis de
+# SLOTS posições; uma posição do nível k cobre SLOTS**k ticks alinhados. Um
+# item vai para o nível mais baixo que alcança seu prazo a partir do tick
+# atual (SLOTS**(k+1) ticks à frente) e, nos níveis acima do primeiro,
+# desce inteiro com sua posição (cascata) quando o tick atual chega ao
+# início dela. Prazos que cabem no primeiro nível nunca descem, então a roda
+# deve ter resolution * SLOTS maior que o prazo usual. Prazos além do nível
+# mais alto (~3 dias com ticks de 1s) ficam num excedente, revisto a cada
+# volta desse nível.
+
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 3
+
+
+class TimingWheel:
+    def __init__(self, resolution=1.0, now=None):
+        self.resolution = resolution
+        self._levels = [[{} for _ in range(SLOTS)] for _ in range(LEVELS)]  # item -> tick
+        self._overflow = {}
+        self._current = self.tick(time.time() if now is None else now)  # próximo tick a processar
+        self._count = 0
+
+    def tick(self, when):
+        return int(when // self.resolution)
+
+    def add(self, item, when):
+        # Devolve o tick do prazo, que remove() precisa; prazos já passados
+        # vencem no próximo advance()
+        tick = max(self.tick(when), self._current)
+        self._bucket(tick)[item] = tick
+        self._count += 1
+        return tick
+
+    def remove(self, item, tick):
+        # tick: o devolvido por add(). O item está numa das posições do seu
+        # prazo, conforme o nível em que foi posto
+        if tick < self._current:
+            return False  # já devolvido por advance()
+        for level in range(LEVELS):
+            if self._levels[level][(tick >> (BITS * level)) & MASK].pop(item, None) is not None:
+                break
+        else:
+            if self._overflow.pop(item, None) is None:
+                return False
+        self._count -= 1
+        return True
+
+    def advance(self, now):
+        # Processa os ticks até o de now, inclusive; devolve os itens vencidos
+        target = self.tick(now)
+        expired = []
+        while self._current <= target:
+            if not self._count:
+                self._current = target + 1
+                break
+            t = self._current
+            bucket = self._levels[0][t & MASK]
+            if bucket:
+                self._levels[0][t & MASK] = {}
+                self._count -= len(bucket)
+                expired.extend(bucket)
+            self._current = t = t + 1
+            for level in range(LEVELS, 0, -1):
+                if not t & ((1 << (BITS * level)) - 1):
+                    self._cascade(level, t)
+        return expired
+
+    def __len__(self):
+        return self._count
+
+    def _bucket(self, tick):
+        ahead = tick - self._current
+        for level in range(LEVELS):
+            if ahead < 1 << (BITS * (level + 1)):
+                return self._levels[level][(tick >> (BITS * level)) & MASK]
+        return self._overflow
+
+    def _cascade(self, level, t):
+        # O tick atual t é o início de uma posição do nível level (ou de uma
+        # volta do nível mais alto, para o excedente): seus itens descem
+        if level == LEVELS:
+            entries, self._overflow = self._overflow, {}
+        else:
+            slot = (t >> (BITS * level)) & MASK
+            entries = self._levels[level][slot]
+            self._levels[level][slot] = {}
+        for item, tick in entries.items():
+            self._bucket(tick)[item] = tick
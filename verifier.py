@@ -0,0 +1,250 @@
+import collections
+import threading
+import time
+from datetime import datetime
+
+# Verificação dos divisores declarados pelos clientes.
+#
+# Um divisor enviado em /submit_result ou /submit_batch não vai direto para o
+# histórico: entra numa fila e é conferido em segundo plano, em lotes. Um
+# lote de candidatos distintos custa uma única passada sobre N (árvore de
+# produto + árvore de restos, ver npp_residue.product_residues), em vez de
+# uma varredura de N por divisor.
+#
+#   - candidatos repetidos (na fila ou já conferidos) são verificados uma vez;
+#   - a concessão com divisores declarados só é concluída depois da
+#     verificação (numa queda, ela vence e é reentregue, sem perder o
+#     divisor); com algum divisor rejeitado, o intervalo volta para a fila de
+#     realocação, pois o cliente que errou também pode ter errado o teste;
+#   - um worker com REJECTION_LIMIT rejeições em REJECTION_WINDOW segundos
+#     fica bloqueado por THROTTLE_SECONDS (as rotas respondem 429); o mesmo
+#     vale para um IP com IP_REJECTION_LIMIT, pois o worker_id é escolhido
+#     pelo cliente e trocá-lo não deve escapar do bloqueio;
+#   - acima de MAX_PENDING_PER_WORKER divisores na fila do worker (ou
+#     MAX_PENDING_PER_IP do IP, ou MAX_PENDING no total), os demais são
+#     recusados sem verificação: não contam como rejeição, mas o intervalo
+#     também volta para a fila, para não perder um divisor real. Com a fila
+#     cheia, as rotas recusam novos divisores com 503 (ver full()).
+#
+# Sem o número carregado (modo simulação), nada pode ser conferido: os
+# divisores declarados são descartados e as concessões, concluídas.
+
+VERIFY_BATCH_SIZE = 1000  # candidatos distintos por passada sobre N
+VERIFY_INTERVAL = 1.0  # segundos entre lotes, para juntar candidatos
+MAX_DIVISOR_BITS = 4096  # candidatos maiores são rejeitados sem verificação
+MAX_PENDING_PER_WORKER = 100  # divisores na fila por worker; o excesso é recusado
+MAX_PENDING_PER_IP = 1000  # idem por IP
+MAX_PENDING = 10_000  # idem no total
+RETRY_AFTER_SECONDS = 5  # sugestão para o cliente com a fila cheia
+MAX_KNOWN_OUTCOMES = 100_000  # resultados lembrados para deduplicação
+REJECTION_LIMIT = 3
+IP_REJECTION_LIMIT = 10  # um IP pode ter vários workers (NAT)
+REJECTION_WINDOW = 600  # segundos
+THROTTLE_SECONDS = 600
+RECENT_REJECTIONS = 100  # rejeições recentes em stats()
+
+PENDING = 'pending'  # submit(): concessão à espera da verificação
+
+
+class VerificationFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Fila de verificação cheia; tente novamente em {retry_after}s')
+        self.retry_after = retry_after
+
+
+class Claim:
+    __slots__ = ('worker_id', 'ip', 'lease', 'outcomes', 'waiting', 'invalid', 'refused')
+
+    def __init__(self, worker_id, ip, lease):
+        self.worker_id = worker_id
+        self.ip = ip
+        self.lease = lease  # (start, end, lease_id) como enviado pelo cliente
+        self.outcomes = {}  # divisor -> True (divide N), False ou None (sem o número)
+        self.waiting = set()  # divisores ainda na fila
+        self.invalid = []  # valores rejeitados sem verificação
+        self.refused = []  # recusados com a fila do worker cheia (não são rejeições)
+
+
+def _sources(worker_id, ip):
+    # Chaves de rejeições e bloqueios: o worker e, se conhecido, o IP
+    return [('worker', worker_id)] if ip is None else [('worker', worker_id), ('ip', ip)]
+
+
+def _valid(divisor):
+    return type(divisor) is int and 2 <= divisor and divisor.bit_length() <= MAX_DIVISOR_BITS
+
+
+class DivisorVerifier:
+    def __init__(self, residues, on_result, batch_size=VERIFY_BATCH_SIZE, interval=VERIFY_INTERVAL):
+        # residues(candidatos) -> {d: N mod d}, ou None sem o número.
+        # on_result(claim, verified, rejected) roda fora da trava; verified
+        # traz só os divisores ainda não entregues antes (deduplicação).
+        self._residues = residues
+        self._on_result = on_result
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending = {}  # divisor -> [Claim] aguardando
+        self._queue = collections.deque()  # divisores na ordem de chegada
+        self._outcomes = collections.OrderedDict()  # divisor -> bool (LRU)
+        self._recorded = set()  # divisores verificados já entregues a on_result
+        self._pending_by_worker = collections.Counter()
+        self._pending_by_ip = collections.Counter()
+        self._pending_count = 0  # divisores à espera, somando todas as declarações
+        self._rejections = {}  # ('worker', worker_id) ou ('ip', ip) -> deque de instantes das rejeições
+        self._throttled = {}  # ('worker', worker_id) ou ('ip', ip) -> bloqueado até
+        self._recent = collections.deque(maxlen=RECENT_REJECTIONS)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+        self.unverifiable = 0
+        self.refused = 0
+        self.batches = 0
+
+    def submit(self, worker_id, ip, divisors, lease):
+        # Enfileira os divisores declarados para uma concessão; resultados já
+        # conhecidos valem na hora. Devolve PENDING se a concessão ficou à
+        # espera da verificação; senão, o que on_result devolveu.
+        claim = Claim(worker_id, ip, lease)
+        with self._lock:
+            for divisor in divisors:
+                if not _valid(divisor):
+                    claim.invalid.append(divisor)
+                elif divisor in claim.outcomes or divisor in claim.waiting:
+                    continue
+                elif divisor not in self._outcomes and self._full_locked(worker_id, ip):
+                    claim.refused.append(divisor)
+                elif divisor in self._outcomes:
+                    self._outcomes.move_to_end(divisor)
+                    claim.outcomes[divisor] = self._outcomes[divisor]
+                else:
+                    claim.waiting.add(divisor)
+                    self._pending_by_worker[worker_id] += 1
+                    self._pending_by_ip[ip] += 1
+                    self._pending_count += 1
+                    if divisor not in self._pending:
+                        self._pending[divisor] = []
+                        self._queue.append(divisor)
+                    self._pending[divisor].append(claim)
+            waiting = bool(claim.waiting)
+        if not waiting:
+            return self._finish(claim)
+        self._wakeup.set()
+        return PENDING
+
+    def verify_pending(self):
+        # Confere um lote da fila; devolve o número de candidatos
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return 0
+        try:
+            residues = self._residues(batch)
+        except Exception as e:
+            print(f"Erro ao verificar {len(batch)} divisores: {e}")
+            with self._lock:
+                self._queue.extendleft(reversed(batch))
+            return 0
+
+        done = []
+        with self._lock:
+            for divisor in batch:
+                ok = None if residues is None else residues[divisor] == 0
+                if ok is not None:
+                    self._outcomes[divisor] = ok
+                    if len(self._outcomes) > MAX_KNOWN_OUTCOMES:
+                        self._outcomes.popitem(last=False)
+                for claim in self._pending.pop(divisor):
+                    claim.waiting.discard(divisor)
+                    claim.outcomes[divisor] = ok
+                    self._pending_count -= 1
+                    for counter, key in ((self._pending_by_worker, claim.worker_id), (self._pending_by_ip, claim.ip)):
+                        counter[key] -= 1
+                        if not counter[key]:
+                            del counter[key]
+                    if not claim.waiting:
+                        done.append(claim)
+            self.batches += 1
+        for claim in done:
+            self._finish(claim)
+        return len(batch)
+
+    def run(self, stop=None):
+        # Laço da thread de verificação: espera candidatos, junta os que
+        # chegarem em interval segundos e esvazia a fila
+        while not (stop is not None and stop.is_set()):
+            if not self._wakeup.wait(1):
+                continue
+            self._wakeup.clear()
+            time.sleep(self.interval)
+            while self.verify_pending():
+                pass
+
+    def throttled(self, worker_id, ip=None, now=None):
+        # Segundos restantes de bloqueio do worker ou do seu IP (0 se liberado)
+        now = time.time() if now is None else now
+        remaining = 0
+        with self._lock:
+            for key in _sources(worker_id, ip):
+                until = self._throttled.get(key)
+                if until is None:
+                    continue
+                if until <= now:
+                    del self._throttled[key]
+                else:
+                    remaining = max(remaining, until - now)
+        return remaining
+
+    def full(self):
+        # Fila total cheia: as rotas recusam novos divisores (VerificationFull)
+        with self._lock:
+            return self._pending_count >= MAX_PENDING
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._queue),
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'unverifiable': self.unverifiable,
+                'refused': self.refused,
+                'batches': self.batches,
+                'throttled_workers': sum(1 for kind, _ in self._throttled if kind == 'worker'),
+                'throttled_ips': sum(1 for kind, _ in self._throttled if kind == 'ip'),
+                'recent_rejections': list(self._recent)
+            }
+
+    def _finish(self, claim):
+        verified = [d for d, ok in claim.outcomes.items() if ok]
+        rejected = [d for d, ok in claim.outcomes.items() if ok is False] + claim.invalid
+        now = time.time()
+        with self._lock:
+            new = [d for d in verified if d not in self._recorded]
+            self._recorded.update(new)
+            self.verified += len(verified)
+            self.rejected += len(rejected)
+            self.unverifiable += sum(1 for ok in claim.outcomes.values() if ok is None)
+            self.refused += len(claim.refused)
+            if rejected:
+                self._reject_locked(claim, rejected, now)
+        return self._on_result(claim, new, rejected)
+
+    def _reject_locked(self, claim, rejected, now):
+        timestamp = datetime.fromtimestamp(now).isoformat()
+        self._recent.extend({'divisor': d, 'found_by': claim.worker_id, 'timestamp': timestamp, 'ip': claim.ip}
+                            for d in rejected)
+        for key in _sources(claim.worker_id, claim.ip):
+            history = self._rejections.setdefault(key, collections.deque())
+            history.extend([now] * len(rejected))
+            while history and history[0] <= now - REJECTION_WINDOW:
+                history.popleft()
+            if len(history) >= (REJECTION_LIMIT if key[0] == 'worker' else IP_REJECTION_LIMIT):
+                self._throttled[key] = now + THROTTLE_SECONDS
+                del self._rejections[key]
+                print(f"{'Worker' if key[0] == 'worker' else 'IP'} {key[1]} bloqueado por {THROTTLE_SECONDS}s "
+                      f"após {len(history)} divisores rejeitados")
+
+    def _full_locked(self, worker_id, ip):
+        return (self._pending_count >= MAX_PENDING
+                or self._pending_by_worker[worker_id] >= MAX_PENDING_PER_WORKER
+                or (ip is not None and self._pending_by_ip[ip] >= MAX_PENDING_PER_IP))
@@ -0,0 +1,215 @@
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+import metrics
+
+# Log de escrita antecipada (WAL) só de acréscimo, com commit em grupo.
+#
+# Cada registro é um objeto JSON precedido de um cabeçalho com o tamanho e o
+# CRC32 do conteúdo. append() apenas enfileira o registro em memória; uma
+# thread grava os registros pendentes em lote e faz um único fsync a cada
+# flush_interval segundos, tirando o disco do caminho das requisições.
+#
+# A compactação grava um snapshot do estado completo (arquivo temporário +
+# rename) e descarta os segmentos antigos do log. Na inicialização o estado é
+# o snapshot mais os registros dos segmentos restantes, em ordem.
+
+RECORD_HEADER = struct.Struct('<II')  # tamanho, crc32
+DEFAULT_FLUSH_INTERVAL = 0.05  # segundos entre commits em grupo
+
+FLUSH_SECONDS = metrics.histogram('npp_wal_flush_seconds', 'Duração dos commits em grupo do WAL (escrita + fsync)')
+FLUSH_RECORDS = metrics.counter('npp_wal_records_total', 'Registros gravados no WAL')
+COMPACTION_SECONDS = metrics.histogram('npp_snapshot_seconds', 'Duração das compactações (snapshot)',
+                                       buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+
+
+def _encode(record):
+    payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path):
+    # Lê registros até o fim do arquivo ou até o primeiro registro truncado
+    # ou corrompido (escrita interrompida por uma queda). O restante é
+    # cortado do arquivo, para que novos registros não fiquem depois dele.
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        size, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + size]
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            break
+        yield json.loads(payload)
+        offset = start + size
+    if offset < len(data):
+        print(f"Aviso: registro inválido em {path} (byte {offset}); ignorando o restante")
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def wal_segments(path):
+    # Segmentos antigos (de rotações ainda não compactadas) e o atual, em ordem
+    return sorted(glob.glob(f'{glob.escape(path)}.[0-9]*')) + [path]
+
+
+def write_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class WriteAheadLog:
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, fsync=True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.records_written = 0
+        self.bytes_written = 0  # desde a última rotação
+        self.flushes = 0
+        self._pending = []
+        self._appended = 0  # número de registros enfileirados
+        self._durable = 0  # número de registros já gravados com fsync
+        self._lock = threading.Lock()  # fila pendente
+        self._io_lock = threading.Lock()  # arquivo do segmento atual
+        self._flushed = threading.Condition(self._lock)
+        self._file = open(path, 'ab')
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def append(self, record):
+        data = _encode(record)
+        with self._lock:
+            self._pending.append(data)
+            self._appended += 1
+            return self._appended
+
+    def sync(self, timeout=None):
+        # Espera até que tudo o que já foi enfileirado esteja em disco
+        with self._lock:
+            target = self._appended
+        self.flush()
+        with self._lock:
+            return self._flushed.wait_for(lambda: self._durable >= target, timeout)
+
+    def flush(self):
+        with self._io_lock:
+            self._flush_locked_io()
+
+    def rotate(self):
+        # Fecha o segmento atual e abre um novo; devolve o caminho do segmento
+        # fechado, que passa a conter tudo o que foi enfileirado até aqui.
+        with self._io_lock:
+            self._flush_locked_io()
+            self._file.close()
+            rotated = f'{self.path}.{time.time_ns()}'
+            os.replace(self.path, rotated)
+            self._file = open(self.path, 'ab')
+            self.bytes_written = 0
+            return rotated
+
+    def segments(self):
+        return wal_segments(self.path)
+
+    def close(self):
+        self._closed = True
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+
+    def _flush_locked_io(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            count = self._appended
+        if batch:
+            started = time.perf_counter()
+            data = b''.join(batch)
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSH_RECORDS.inc(len(batch))
+            self.records_written += len(batch)
+            self.bytes_written += len(data)
+            self.flushes += 1
+        with self._lock:
+            self._durable = max(self._durable, count)
+            self._flushed.notify_all()
+
+    def _flush_loop(self):
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            if self._pending:
+                self.flush()
+
+
+class DurableState:
+    # Snapshot + WAL de um estado JSON. apply(state, record) aplica um
+    # registro ao estado e deve ser idempotente: após uma queda no meio da
+    # compactação, registros já incluídos no snapshot podem ser reaplicados.
+    def __init__(self, snapshot_path, wal_path, apply, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.snapshot_path = snapshot_path
+        self.wal_path = wal_path
+        self.apply = apply
+        self.flush_interval = flush_interval
+        self.wal = None
+        self.compactions = 0
+
+    def exists(self):
+        return os.path.exists(self.snapshot_path) or bool(glob.glob(f'{glob.escape(self.wal_path)}*'))
+
+    def load(self, initial):
+        # Reconstrói o estado (snapshot + replay) e abre o WAL para escrita
+        state = initial
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = json.loads(f.read())
+        except FileNotFoundError:
+            pass
+
+        replayed = 0
+        for path in wal_segments(self.wal_path):
+            for record in read_records(path):
+                state = self.apply(state, record)
+                replayed += 1
+
+        self.wal = WriteAheadLog(self.wal_path, self.flush_interval)
+        return state, replayed
+
+    def append(self, record):
+        return self.wal.append(record)
+
+    def compact(self, snapshot_provider):
+        # 1. Rotaciona o WAL: tudo até aqui fica nos segmentos antigos.
+        # 2. Captura o estado atual (inclui ao menos esses registros).
+        # 3. Grava o snapshot atomicamente e remove os segmentos antigos.
+        started = time.perf_counter()
+        old_segments = [p for p in self.wal.segments() if p != self.wal_path]
+        old_segments.append(self.wal.rotate())
+        state = snapshot_provider()
+        write_atomic(self.snapshot_path, json.dumps(state, separators=(',', ':')).encode('utf-8'))
+        for path in old_segments:
+            os.remove(path)
+        self.compactions += 1
+        COMPACTION_SECONDS.observe(time.perf_counter() - started)
+        return state
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
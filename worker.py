@@ -0,0 +1,252 @@
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from npp_cache import load_npp_number
+from product_tree import gcd_divisors, mod_bytes, product_tree
+from sieve import primes_in_range
+
+# Worker de linha de comando para máquinas servidoras.
+#
+# Um processo por núcleo, cada um com seu worker_id, falando o mesmo
+# protocolo do navegador (/get_work e /submit_result). Em cada processo uma
+# thread pede concessões com antecedência e outra envia os resultados, de
+# modo que o cálculo não espera pela rede. Cada intervalo é testado de uma
+# vez: crivo segmentado para os primos e um único gcd contra o produto deles
+# (ver product_tree). O número vem de /npp (baixado uma vez, com retomada)
+# ou de um NPP.txt local.
+#
+# Uso: python worker.py --server http://127.0.0.1:5000
+
+DEFAULT_SERVER = 'http://127.0.0.1:5000'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'npp-worker')
+DOWNLOAD_CHUNK_BYTES = 4 * 1024 * 1024
+HTTP_TIMEOUT = 60
+RETRY_SECONDS = 5
+
+
+def http_json(url, payload=None):
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+        return json.loads(response.read())
+
+
+def download_number(server, cache_dir):
+    # Baixa os limbs de /npp para cache_dir/<hash>.bin, em partes com Range;
+    # um download interrompido continua do ponto em que parou
+    info = http_json(f'{server}/npp/info')
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{info["hash"]}.bin')
+    if os.path.exists(path):
+        return path, info
+
+    partial = f'{path}.part'
+    with open(partial, 'ab') as f:
+        while f.tell() < info['bytes']:
+            start = f.tell()
+            end = min(start + DOWNLOAD_CHUNK_BYTES, info['bytes']) - 1
+            request = urllib.request.Request(f'{server}{info["url"]}', headers={'Range': f'bytes={start}-{end}'})
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                if response.status != 206:
+                    raise RuntimeError(f'Resposta inesperada ao baixar o número: {response.status}')
+                f.write(response.read())
+            print(f'Número NPP: {f.tell() * 100 // info["bytes"]}% baixado', flush=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    return path, info
+
+
+class NumberFile:
+    # Bytes little-endian do número, mapeados em memória (download de /npp)
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def data(self):
+        return memoryview(self._mm)
+
+
+def open_number(args):
+    if args.npp:
+        number, built = load_npp_number(args.npp, os.path.join(args.cache_dir, 'NPP.bin'))
+        if built is not None:
+            print(f'Cache binário de {args.npp} gerado em {built:.1f}s', flush=True)
+        return number
+    return NumberFile(args.number_path)
+
+
+def test_range(data, start, end):
+    # Primos de [start, end) que dividem N: (divisores, quantidade de primos)
+    primes = primes_in_range(start, end)
+    if not primes:
+        return [], 0
+    levels = product_tree(primes)
+    product = levels[-1][0]
+    return gcd_divisors(mod_bytes(data, product), primes, product), len(primes)
+
+
+def fetch_leases(server, worker_id, leases, stop):
+    while not stop.is_set():
+        try:
+            lease = http_json(f'{server}/get_work?worker_id={worker_id}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f'{worker_id}: erro ao pedir trabalho ({e}); nova tentativa em {RETRY_SECONDS}s', flush=True)
+            stop.wait(RETRY_SECONDS)
+            continue
+        # Bloqueia enquanto a fila de pré-busca estiver cheia
+        while not stop.is_set():
+            try:
+                leases.put(lease, timeout=1)
+                break
+            except queue.Full:
+                pass
+
+
+def submit_results(server, worker_id, results):
+    while True:
+        result = results.get()
+        if result is None:
+            return
+        while True:
+            try:
+                http_json(f'{server}/submit_result', result)
+                break
+            except urllib.error.HTTPError as e:
+                # 503: fila de ingestão do servidor cheia; o reenvio é seguro
+                # (o servidor deduplica pelo lease_id)
+                delay = float(e.headers.get('Retry-After') or RETRY_SECONDS) if e.code in (429, 503) else RETRY_SECONDS
+                print(f'{worker_id}: servidor recusou o resultado ({e.code}); nova tentativa em {delay:g}s', flush=True)
+                time.sleep(delay)
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                print(f'{worker_id}: erro ao enviar resultado ({e}); nova tentativa em {RETRY_SECONDS}s', flush=True)
+                time.sleep(RETRY_SECONDS)
+
+
+def run_process(index, args, stats, stop):
+    worker_id = f'{args.worker_id}_{index}'
+    number = open_number(args)
+    leases = queue.Queue(maxsize=args.prefetch)
+    results = queue.Queue()
+    fetcher = threading.Thread(target=fetch_leases, args=(args.server, worker_id, leases, stop), daemon=True)
+    submitter = threading.Thread(target=submit_results, args=(args.server, worker_id, results))
+    fetcher.start()
+    submitter.start()
+    try:
+        while not stop.is_set():
+            try:
+                lease = leases.get(timeout=1)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            divisors, count = test_range(number.data, lease['start_range'], lease['end_range'])
+            elapsed = time.perf_counter() - started
+            if divisors:
+                print(f'{worker_id}: divisores encontrados: {divisors}', flush=True)
+            results.put({
+                'worker_id': worker_id,
+                'lease_id': lease['lease_id'],
+                'divisors': divisors,
+                'range_completed': {'start': lease['start_range'], 'end': lease['end_range']}
+            })
+            stats.put((index, count, elapsed))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Resultados já calculados ainda são enviados
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        results.put(None)
+        submitter.join()
+
+
+def report(stats, processes, interval, stop):
+    # Por núcleo: primos por segundo de cálculo, acumulado. Total: primos
+    # concluídos por segundo de relógio na última janela.
+    totals = [[0, 0.0] for _ in range(processes)]  # primos, segundos de cálculo
+    last = time.perf_counter()
+    while not stop.is_set():
+        window = 0
+        deadline = last + interval
+        while time.perf_counter() < deadline:
+            try:
+                index, count, elapsed = stats.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            totals[index][0] += count
+            totals[index][1] += elapsed
+            window += count
+        now = time.perf_counter()
+        per_core = ' '.join(f'{primes / seconds:,.0f}' if seconds else '-' for primes, seconds in totals)
+        print(f'primos/s por núcleo: [{per_core}]  total: {window / (now - last):,.0f}/s  '
+              f'testados: {sum(t[0] for t in totals):,}', flush=True)
+        last = now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker de linha de comando, um processo por núcleo')
+    parser.add_argument('--server', default=DEFAULT_SERVER, help='URL do coordenador (app.py)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='processos de cálculo')
+    parser.add_argument('--prefetch', type=int, default=2, help='concessões pedidas com antecedência por processo')
+    parser.add_argument('--worker-id', default=f'cli_{socket.gethostname()}_{os.getpid()}')
+    parser.add_argument('--npp', help='NPP.txt local, no lugar do download de /npp')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='onde guardar o número baixado')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='segundos entre relatórios')
+    args = parser.parse_args()
+    args.server = args.server.rstrip('/')
+
+    if not args.npp:
+        try:
+            args.number_path, info = download_number(args.server, args.cache_dir)
+        except (urllib.error.URLError, OSError, ValueError, RuntimeError) as e:
+            sys.exit(f'Não foi possível obter o número NPP de {args.server}: {e}')
+        print(f'Número NPP com {info["digits"]:,} dígitos ({info["bytes"]:,} bytes)', flush=True)
+    else:
+        # Gera o cache local uma vez, antes de os processos o mapearem
+        os.makedirs(args.cache_dir, exist_ok=True)
+        open_number(args)
+
+    stats = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=run_process, args=(i, args, stats, stop), daemon=True)
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    print(f'{args.processes} processos trabalhando para {args.server}', flush=True)
+
+    reporter_stop = threading.Event()
+    reporter = threading.Thread(target=report, args=(stats, args.processes, args.report_interval, reporter_stop), daemon=True)
+    reporter.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Os processos também recebem o Ctrl-C: abandonam o intervalo em
+        # curso e enviam o que já foi calculado
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        print('Parando: enviando os resultados já calculados...', flush=True)
+        stop.set()
+        for process in processes:
+            process.join()
+    reporter_stop.set()
+
+
+if __name__ == '__main__':
+    main()
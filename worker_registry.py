@@ -0,0 +1,137 @@
+import collections
+import sys
+import time
+
+import metrics
+from timing_wheel import TimingWheel
+
+# Registro dos workers ativos (última atividade e IP), consultado por
+# /status e pela remoção de inativos.
+#
+#   - cada worker é um WorkerRecord com __slots__; worker_id e IP são
+#     internados, então o mesmo texto vindo em cada requisição não é
+#     guardado de novo;
+#   - o prazo de inatividade fica numa roda de tempo (ver timing_wheel), em
+#     ticks de EXPIRY_RESOLUTION segundos: touch() move o worker para a
+#     posição do novo prazo só quando ele muda de tick, em O(1), e reap()
+#     visita apenas os prazos vencidos, sem varrer os demais workers. Um
+#     prazo que vence antes do fim do seu tick volta para a roda e o worker
+#     sai na remoção seguinte;
+#   - o registro guarda no máximo max_workers workers. Cheio, despeja o
+#     anônimo (id gerado pelo servidor, sem worker_id no pedido) visto há
+#     mais tempo; sem anônimos, o novo worker não é registrado (suas
+#     concessões são entregues normalmente).
+
+WORKER_INACTIVE_SECONDS = 300
+MAX_WORKERS = 100_000
+EXPIRY_RESOLUTION = 10  # segundos por tick da roda de prazos
+
+EVICTED = metrics.counter('npp_workers_evicted_total', 'Workers anônimos despejados com o registro cheio')
+REFUSED = metrics.counter('npp_workers_refused_total', 'Workers não registrados com o registro cheio')
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class WorkerRecord:
+    __slots__ = ('worker_id', 'ip', 'last_seen', 'expires', 'anonymous')
+
+    def __init__(self, worker_id, ip, last_seen, anonymous=False):
+        self.worker_id = worker_id
+        self.ip = ip
+        self.last_seen = last_seen
+        self.expires = None  # tick do prazo na roda
+        self.anonymous = anonymous
+
+
+class WorkerRegistry:
+    def __init__(self, max_idle=WORKER_INACTIVE_SECONDS, max_workers=MAX_WORKERS, now=None):
+        self.max_idle = max_idle
+        self.max_workers = max_workers
+        self._workers = {}  # worker_id -> WorkerRecord
+        self._anonymous = collections.OrderedDict()  # worker_id -> WorkerRecord, do visto há mais tempo
+        self._expiry = TimingWheel(EXPIRY_RESOLUTION, now)
+        self._evicted = []  # despejados desde o último reap() (até max_workers)
+        self._lock = metrics.TimedLock('workers')
+
+    def touch(self, worker_id, ip=None, now=None, create=True, anonymous=False):
+        now = time.time() if now is None else now
+        with self._lock:
+            record = self._workers.get(worker_id)
+            if record is None:
+                if not create:
+                    return False
+                return self._add_locked(worker_id, ip, now, anonymous)
+            record.last_seen = now
+            if self._expiry.tick(now + self.max_idle) != record.expires:
+                self._expiry.remove(record, record.expires)
+                record.expires = self._expiry.add(record, now + self.max_idle)
+            if ip is not None and ip != record.ip:
+                record.ip = intern(ip)
+            if record.anonymous:
+                if anonymous:
+                    self._anonymous.move_to_end(worker_id)
+                else:
+                    # O cliente passou a se identificar com o id recebido
+                    record.anonymous = False
+                    del self._anonymous[worker_id]
+            return True
+
+    def reap(self, now=None):
+        # Remove e devolve os workers sem atividade há mais de max_idle, junto
+        # com os despejados desde a última chamada
+        now = time.time() if now is None else now
+        with self._lock:
+            inactive, self._evicted = self._evicted, []
+            for record in self._expiry.advance(now):
+                deadline = record.last_seen + self.max_idle
+                if deadline >= now:
+                    record.expires = self._expiry.add(record, deadline)
+                else:
+                    self._remove_locked(record)
+                    inactive.append(record.worker_id)
+        return inactive
+
+    def to_dict(self):
+        with self._lock:
+            data = {}
+            for worker_id, record in self._workers.items():
+                info = data[worker_id] = {'last_seen': record.last_seen, 'ip': record.ip}
+                if record.anonymous:
+                    info['anonymous'] = True
+            return data
+
+    def restore(self, data):
+        with self._lock:
+            for worker_id, info in data.items():
+                record = self._workers.get(worker_id)
+                if record is not None:
+                    self._remove_locked(record)
+                self._add_locked(worker_id, info.get('ip'), info['last_seen'], info.get('anonymous', False))
+
+    def __len__(self):
+        return len(self._workers)
+
+    def _add_locked(self, worker_id, ip, now, anonymous):
+        if len(self._workers) >= self.max_workers:
+            if not self._anonymous:
+                REFUSED.inc()
+                return False
+            _, oldest = self._anonymous.popitem(last=False)
+            self._remove_locked(oldest)
+            if len(self._evicted) < self.max_workers:
+                self._evicted.append(oldest.worker_id)
+            EVICTED.inc()
+        record = WorkerRecord(intern(worker_id), intern(ip), now, anonymous)
+        record.expires = self._expiry.add(record, now + self.max_idle)
+        self._workers[record.worker_id] = record
+        if anonymous:
+            self._anonymous[record.worker_id] = record
+        return True
+
+    def _remove_locked(self, record):
+        del self._workers[record.worker_id]
+        self._expiry.remove(record, record.expires)
+        if record.anonymous:
+            self._anonymous.pop(record.worker_id, None)